@@ -0,0 +1,62 @@
+"""
+bench_permapeople_parallel.py
+-----------------------------
+Sequential ``last_id`` pull versus parallel id-range cursors
+(``sync_to_csv(..., workers=N)``) against the local stand-in API, with
+per-request latency and a server-side rate limit. Exits non-zero unless
+every parallel CSV is byte-identical to the sequential one.
+
+Run:
+    python benchmarks/bench_permapeople_parallel.py --plants 9000 --latency 0.15 --rate-limit 30 --workers 1 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from permapeople_data import flatten_plant  # noqa: E402
+from permapeople_standin import serve  # noqa: E402
+from permapeople_sync import PermapeopleClient, sync_to_csv  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--rate-limit", type=int, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server, url = serve(args.plants, args.latency, args.rate_limit)
+    hits = server.RequestHandlerClass.hits
+    tmp = tempfile.mkdtemp()
+    print(f"stand-in: {url}  {args.plants} plants  latency {args.latency * 1000:.0f} ms  "
+          f"limit {args.rate_limit} req/s\n")
+    reference, ok = None, True
+    try:
+        for workers in args.workers:
+            out = os.path.join(tmp, f"pp_{workers}.csv")
+            hits.update(requests=0, throttled=0)
+            client = PermapeopleClient(url, pool_size=workers)
+            started = time.perf_counter()
+            rows = sync_to_csv(client, out, flatten_plant, resume=False, workers=workers)
+            elapsed = time.perf_counter() - started
+            with open(out, encoding="utf-8") as f:
+                content = f.read()
+            reference = reference or content
+            same = content == reference
+            ok = ok and same
+            print(f"workers {workers:>2}: {rows} rows in {elapsed:5.1f}s ({rows / elapsed:5.0f} rec/s)  "
+                  f"{hits['requests']} requests, {hits['throttled']} throttled  "
+                  f"{'identical' if same else 'DIFFERENT'}")
+    finally:
+        server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+bench_permapeople_store.py
+--------------------------
+The local Permapeople mirror (permapeople_store) against the stand-in API:
+
+1. initial sync into an empty store (a full, parallel refresh),
+2. new plants appear above the old max id → incremental sync from the
+   watermark, which should only cost a few requests,
+3. some old plants are edited or deleted → forced refresh,
+4. the expanded CSV is regenerated from the store with no network and
+   compared with a fresh full pull of the API.
+
+Run:
+    python benchmarks/bench_permapeople_store.py --plants 9000 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from permapeople_data import flatten_plant  # noqa: E402
+from permapeople_standin import make_plant, serve  # noqa: E402
+from permapeople_store import PlantStore, export_csv, sync_store  # noqa: E402
+from permapeople_sync import PermapeopleClient, sync_to_csv  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server, url = serve(args.plants, args.latency)
+    api = server.RequestHandlerClass
+    tmp = tempfile.mkdtemp()
+    store = PlantStore(os.path.join(tmp, "store.sqlite"))
+
+    def step(label, **kwargs):
+        api.hits["requests"] = 0
+        started = time.perf_counter()
+        summary = sync_store(PermapeopleClient(url, pool_size=args.workers), store, args.workers, **kwargs)
+        print(f"→ {label}: {api.hits['requests']} requests, {time.perf_counter() - started:.1f}s, "
+              f"{summary['added']} added / {summary['changed']} changed / {summary['removed']} removed\n")
+
+    try:
+        step("initial sync")
+
+        top = api.ids[-1]
+        for new_id in range(top + 1, top + 251):
+            api.ids.append(new_id)
+            api.plants[new_id] = make_plant(new_id)
+        step("250 new plants, incremental")
+
+        for old_id in api.ids[100:140]:
+            api.plants[old_id] = make_plant(old_id, version=1)
+        for old_id in api.ids[200:210]:
+            del api.plants[old_id]
+        api.ids[200:210] = []
+        step("40 edited + 10 deleted, forced refresh", refresh=True)
+
+        started = time.perf_counter()
+        rows = export_csv(store, os.path.join(tmp, "from_store.csv"), flatten_plant)
+        print(f"export from store: {rows} rows in {time.perf_counter() - started:.2f}s (no network)")
+
+        sync_to_csv(PermapeopleClient(url), os.path.join(tmp, "from_api.csv"), flatten_plant, resume=False)
+        with open(os.path.join(tmp, "from_store.csv"), encoding="utf-8") as a, \
+                open(os.path.join(tmp, "from_api.csv"), encoding="utf-8") as b:
+            same = a.read() == b.read()
+        print(f"store export vs full API pull: {'identical' if same else 'DIFFERENT'}")
+    finally:
+        store.close()
+        server.shutdown()
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+bench_pfaf_distributed.py
+-------------------------
+Runs the queue-coordinated PFAF crawl (pfaf_queue) end to end on one
+machine. A stand-in server runs in this process, N worker processes are
+started with ``pfaf_generator.py --queue ... --worker``, and the coordinator
+seeds the queue, waits and merges.
+
+With ``--kill-one`` the first worker is SIGKILLed part-way through, so its
+leased names only come back after the lease expires. Exits non-zero unless
+every catalog name ends up in the merged output exactly once.
+
+Run:
+    python benchmarks/bench_pfaf_distributed.py --workers 4 --per-letter 20 --kill-one
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pfaf_generator  # noqa: E402
+from pfaf_standin import serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--per-letter", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--lease-seconds", type=float, default=3)
+    parser.add_argument("--kill-one", action="store_true", help="SIGKILL one worker mid-crawl")
+    args = parser.parse_args()
+
+    server, base = serve(args.per_letter, args.latency)
+    pfaf_generator.PFAF_BASE = base
+    tmp = tempfile.mkdtemp()
+    queue_path, output = os.path.join(tmp, "queue.sqlite"), os.path.join(tmp, "plants.csv")
+    expected = {n for names in server.RequestHandlerClass.plants.values() for n in names}
+    print(f"stand-in: {base}  {len(expected)} plants  {args.workers} workers  queue {queue_path}")
+
+    env = dict(os.environ, PFAF_BASE_URL=base)
+    command = [sys.executable, os.path.join(ROOT, "pfaf_generator.py"), "--queue", queue_path, "--worker",
+               "--no-cache", "--concurrency", "4", "--parse-workers", "0", "--batch", "8",
+               "--lease-seconds", str(args.lease_seconds)]
+    workers = [subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL) for _ in range(args.workers)]
+    if args.kill_one:
+        threading.Timer(1.5, workers[0].kill).start()
+
+    started = time.perf_counter()
+    try:
+        counts = pfaf_generator.coordinate_crawl(queue_path, output=output, cache=False,
+                                                 lease_seconds=args.lease_seconds)
+        for w in workers:
+            w.wait(timeout=60)
+    finally:
+        for w in workers:
+            if w.poll() is None:
+                w.kill()
+        server.shutdown()
+    elapsed = time.perf_counter() - started
+
+    with open(output, newline="", encoding="utf-8") as f:
+        merged = [f"{row['Genus']} {row['Species']}" for row in csv.DictReader(f)]
+    ok = len(merged) == len(set(merged)) and set(merged) == expected
+    print(f"{len(merged)} rows merged, {len(set(merged))} distinct, {len(expected)} expected, "
+          f"{counts['failed']} failed, {elapsed:.1f}s  →  {'OK' if ok else 'MISMATCH'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
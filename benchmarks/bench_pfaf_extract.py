@@ -0,0 +1,254 @@
+"""
+bench_pfaf_extract.py
+---------------------
+Records/sec of ``pfaf_extract.extract_description`` against the original
+index-scanning description parser from ``get_plant_info``, over the PFAF
+pages in benchmarks/fixtures/pfaf/, plus a field-by-field parity check of
+the full ``parse_plant_info`` row.
+
+The fixtures are not captures: they were written without network access,
+after the element ids and description sentences the scraper reads, with
+filler text in the long sections. ``--archive`` runs the same check on the
+real pages a crawl archived (pfaf_archive.py), which is the parity check
+to trust before changing the parser.
+
+Exits non-zero if any field differs on a page the original parser could
+handle.
+
+Run:
+    python benchmarks/bench_pfaf_extract.py --repeat 2000
+    python benchmarks/bench_pfaf_extract.py --archive .cache/pfaf_archive --limit 500
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from pfaf_archive import PageArchive  # noqa: E402
+from pfaf_extract import extract_description  # noqa: E402
+from pfaf_generator import attributes, parse_plant_info  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pfaf")
+
+
+# ── reference: the description parser as it was before pfaf_extract ──────────
+
+def legacy_description(description):
+    description_list = description.split()
+
+    plant_type, foliage, height, width, growth_rate = None, None, None, None, ""
+    try:
+        type_idx = description_list.index("is") + 2
+        growing_idx = description_list.index("growing")
+        plant_type = " ".join(description_list[type_idx:growing_idx]).title()
+        foliage = plant_type.split(' ')[0] if len(plant_type.split(' ')) == 2 else None
+    except ValueError:
+        pass
+
+    try:
+        height_idx = description_list.index("growing") + 2
+        height = float(description_list[height_idx])
+    except (ValueError, IndexError):
+        pass
+
+    if "rate." in description_list:
+        growth_rate = description_list[description_list.index("rate.") - 1]
+
+    try:
+        width_idx = description_list.index("by") + 1
+        width = float(description_list[width_idx])
+    except (ValueError, IndexError):
+        pass
+
+    pollinators, leaf, flower, ripen_date, soils, ph, ph_split, reproduction, preferences, tolerances = '', '', '', '', '', '', [], '', '', ''
+    if "pollinated by" in description:
+        pollinators_start = description.index("pollinated by") + len("pollinated by") + 1
+        pollinators_end = description.index(".", pollinators_start)
+        pollinators = [p.strip().capitalize() for p in description[pollinators_start:pollinators_end].split(',')]
+
+    if "leaf" in description_list:
+        leaf_idx = description_list.index("leaf")
+        if description_list[leaf_idx + 1] == "from":
+            leaf = " ".join(description_list[leaf_idx + 2: leaf_idx + 5]).strip(",")
+
+    if "flower" in description_list:
+        flower_idx = description_list.index("flower")
+        if description_list[flower_idx + 1] == "in":
+            flower = description_list[flower_idx + 2].strip(",")
+        elif description_list[flower_idx + 1] == "from":
+            flower = " ".join(description_list[flower_idx + 2: flower_idx + 5]).strip(",")
+
+    if "ripen" in description_list:
+        tmp_idx = description_list.index("ripen")
+        if description_list[tmp_idx + 1] == "in":
+            ripen_date = description_list[tmp_idx + 2].strip(".")
+        elif description_list[tmp_idx + 1] == "from":
+            ripen_date = " ".join(description_list[tmp_idx + 2: tmp_idx + 5]).strip(".")
+
+    soil_idx = description.find("Suitable for:")
+    if soil_idx != -1:
+        soil_text = description[soil_idx:description.find(".", soil_idx)]
+        soils = re.findall(r"(light|medium|heavy)", soil_text)
+
+    if "pH:" in description_list:
+        ph_idx = description_list.index("pH:") + 1
+        ph_list = description_list[ph_idx:]
+        end_idx = next((i for i, x in enumerate(ph_list) if 'soil' in x), len(ph_list))
+        ph = " ".join(ph_list[:end_idx]).replace(r' (mildly alkaline)', '').capitalize()
+        ph_split = re.split(',| and ', ph.replace(' soils', '').replace(' can grow in', ''))
+
+    reproduction_match = re.findall(r"The species is\s(\w+)", description)
+    if reproduction_match:
+        reproduction = reproduction_match[0].capitalize()
+
+    preferences_match = re.findall(r"prefers (.*?) and", description)
+    if preferences_match:
+        preferences = preferences_match[0].strip().capitalize()
+
+    tolerances_match = re.findall(r"can tolerate (.*?)\.", description)
+    if tolerances_match:
+        tolerances = tolerances_match[0].capitalize()
+
+    return (plant_type, foliage, height, width, growth_rate, pollinators, leaf, flower,
+            ripen_date, reproduction, soils, ph, ph_split, preferences, tolerances)
+
+
+def legacy_plant_info(content, genus, species, pfaf_url):
+    soup = BeautifulSoup(content, 'html.parser')
+    description = soup.find("meta", id="description")['content']
+    (plant_type, foliage, height, width, growth_rate, pollinators, leaf, flower, ripen_date,
+     reproduction, soils, ph, ph_split, preferences, tolerances) = legacy_description(description)
+
+    table = soup.find("table", class_="table table-hover table-striped")
+    common_name = table.find("span", id="ContentPlaceHolder1_lblCommanName").text
+    family = table.find("span", id="ContentPlaceHolder1_lblFamily").text
+    hardiness_range = table.find("span", id="ContentPlaceHolder1_lblUSDAhardiness").text
+    zone_min, zone_max = None, None
+    match = re.search(r'(\d+)\-(\d+)', hardiness_range)
+    if match:
+        zone_min, zone_max = match.groups()
+    habitats = re.sub(r"\[\d+\]", "", table.find("span", id="ContentPlaceHolder1_txtHabitats").text)
+    habitat_range = table.find("span", id="ContentPlaceHolder1_lblRange").text
+    edibility = table.find("span", id="ContentPlaceHolder1_txtEdrating").text.strip()[1]
+    other_uses = table.find("span", id="ContentPlaceHolder1_txtOtherUseRating").text.strip()[1]
+    medicinal_rating = table.find("span", id="ContentPlaceHolder1_txtMedRating").text.strip()[1]
+    img_url = ''
+    details_table = soup.find('table', id='ContentPlaceHolder1_tblPlantImges')
+    if details_table:
+        img_tag = details_table.find('img')
+        if img_tag:
+            img_url = 'https://pfaf.org' + img_tag['src'][2:]
+    return [
+        family, genus, species, common_name, growth_rate, f"{zone_min} to {zone_max}", height, width,
+        plant_type, foliage, pollinators, leaf, flower, ripen_date, reproduction, soils, ph, ph_split, preferences,
+        tolerances, habitats, habitat_range, edibility, medicinal_rating, other_uses, pfaf_url, img_url
+    ]
+
+
+# ── benchmark ─────────────────────────────────────────────────────────────────
+
+def _page(genus, species, content):
+    meta = BeautifulSoup(content, "html.parser").find("meta", id="description")
+    return genus, species, content, meta.get("content", "") if meta is not None else ""
+
+
+def load_fixtures():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        latin = os.path.basename(path)[:-5].replace("_", " ")
+        genus, species = latin.split(" ", 1)
+        with open(path, "rb") as f:
+            pages.append(_page(genus, species, f.read()))
+    return pages
+
+
+def load_archive(directory, limit=None):
+    """The latest archived copy of up to *limit* pages of a real crawl."""
+    with PageArchive(directory) as archive:
+        entries = sorted(archive.index.values(), key=lambda e: e["offset"])[:limit]
+        return [_page(e["genus"], e["species"], archive.read(e["name"])) for e in entries]
+
+
+def rate(fn, items, repeat, rounds=3):
+    """Best-of-*rounds* items/sec."""
+    best = 0.0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for item in items:
+                fn(item)
+        best = max(best, repeat * len(items) / (time.perf_counter() - started))
+    return best
+
+
+def legacy_parses(content, genus, species):
+    """Whether the original parser handles this page (the sparse fixture it can't)."""
+    try:
+        legacy_plant_info(content, genus, species, "")
+    except Exception:
+        return False
+    return True
+
+
+def check_parity(pages):
+    mismatches = 0
+    for genus, species, content, _ in pages:
+        url = f"https://pfaf.org/user/Plant.aspx?LatinName={genus}+{species}"
+        new = parse_plant_info(content, genus, species, url)
+        try:
+            old = legacy_plant_info(content, genus, species, url)
+        except Exception as e:
+            print(f"  {genus} {species}: original parser failed ({type(e).__name__}: {e}); "
+                  f"extractor returned a row")
+            continue
+        diffs = [(name, o, n) for name, o, n in zip(attributes, old, new) if o != n]
+        for name, o, n in diffs:
+            print(f"  {genus} {species}: {name}: {o!r} != {n!r}")
+        mismatches += len(diffs)
+        if not diffs:
+            print(f"  {genus} {species}: all {len(attributes)} fields match")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the description corpus")
+    parser.add_argument("--page-repeat", type=int, default=20, help="Passes over the full pages")
+    parser.add_argument("--archive", metavar="DIR", help="Use the pages archived by a crawl instead of the fixtures")
+    parser.add_argument("--limit", type=int, default=None, help="Archived pages to use (default all)")
+    args = parser.parse_args()
+
+    if args.archive:
+        pages = load_archive(args.archive, args.limit)
+        print(f"{len(pages)} archived pages from {args.archive}\n")
+    else:
+        pages = load_fixtures()
+        print(f"{len(pages)} fixtures from {FIXTURES} (reconstructed, not captured)\n")
+
+    print("parity (parse_plant_info vs original):")
+    mismatches = check_parity(pages)
+
+    descriptions = [d for *_, d in pages]
+    old = rate(legacy_description, descriptions, args.repeat)
+    new = rate(extract_description, descriptions, args.repeat)
+    print(f"\ndescription only   original {old:>10,.0f} rec/s   extractor {new:>10,.0f} rec/s   "
+          f"({new / old:.2f}x)")
+
+    full = [(g, s, c) for g, s, c, _ in pages if legacy_parses(c, g, s)]
+    old = rate(lambda p: legacy_plant_info(p[2], p[0], p[1], ""), full, args.page_repeat)
+    new = rate(lambda p: parse_plant_info(p[2], p[0], p[1], ""), full, args.page_repeat)
+    print(f"full page          original {old:>10,.0f} pages/s  extractor {new:>10,.0f} pages/s  "
+          f"({new / old:.2f}x)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+bench_pfaf_fetch.py
+-------------------
+Pages/sec of the PFAF scraper against the local stand-in server as the
+fetch engine's in-flight limit grows.
+
+Run:
+    python benchmarks/bench_pfaf_fetch.py --per-letter 40 --latency 0.05 --concurrency 1 4 16 32
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pfaf_generator  # noqa: E402
+from pfaf_standin import serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--per-letter", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    server, base = serve(args.per_letter, args.latency)
+    pfaf_generator.PFAF_BASE = base
+    out = os.path.join(tempfile.mkdtemp(), "bench.csv")
+    print(f"stand-in: {base}  {args.per_letter * 26} plants  latency {args.latency * 1000:.0f} ms")
+    print(f"{'in-flight':>10} {'seconds':>9} {'pages':>7} {'pages/s':>9}")
+    try:
+        for n in args.concurrency:
+            server.RequestHandlerClass.hits.clear()
+            started = time.perf_counter()
+            pfaf_generator.scrape_plant_data(concurrency=n, output=out, cache=False, archive=False)
+            elapsed = time.perf_counter() - started
+            pages = sum(server.RequestHandlerClass.hits.values())
+            print(f"{n:>10} {elapsed:>9.2f} {pages:>7} {pages / elapsed:>9.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+bench_pfaf_listing.py
+---------------------
+Wall-clock time of the PFAF listing crawl on a skewed catalog (a few huge
+letters, a few nearly empty ones), with each letter walked as one chain
+versus split into Latin-name prefixes once it runs past a few pages.
+
+Only the listing walk is timed; detail pages are not fetched.
+
+Run:
+    python benchmarks/bench_pfaf_listing.py --per-letter 40 --latency 0.1 --listing-workers 16 --split-after 0 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pfaf_generator  # noqa: E402
+from pfaf_fetch import FetchEngine  # noqa: E402
+from pfaf_pipeline import log_partitions, walk_partitions  # noqa: E402
+from pfaf_standin import serve  # noqa: E402
+
+# Roughly the shape of the real site: S and C dwarf X, Y and Z
+SKEW = {"S": 8, "C": 6, "A": 4, "P": 4, "X": 0.1, "Y": 0.2, "Z": 0.2, "Q": 0.3}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--per-letter", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--listing-workers", type=int, default=16)
+    parser.add_argument("--split-after", type=int, nargs="+", default=[0, 3])
+    args = parser.parse_args()
+
+    server, base = serve(args.per_letter, args.latency, skew=SKEW)
+    pfaf_generator.PFAF_BASE = base
+    expected = sum(len(v) for v in server.RequestHandlerClass.plants.values())
+    print(f"stand-in: {base}  {expected} plants  latency {args.latency * 1000:.0f} ms")
+    try:
+        for split_after in args.split_after:
+            server.RequestHandlerClass.hits.clear()
+            names = set()
+            with FetchEngine(max_in_flight=args.listing_workers) as engine:
+                started = time.perf_counter()
+                timings = walk_partitions(
+                    pfaf_generator.LATIN_ALPHABET,
+                    lambda prefix: pfaf_generator.walk_listing(prefix, engine, split_after),
+                    lambda genus, species: names.add(f"{genus} {species}"),
+                    args.listing_workers,
+                )
+                elapsed = time.perf_counter() - started
+            pages = sum(server.RequestHandlerClass.hits.values())
+            print(f"\nsplit after {split_after or 'never'}: {len(names)}/{expected} names, "
+                  f"{pages} listing pages, {elapsed:.2f}s")
+            log_partitions(timings, elapsed)
+            if len(names) != expected:
+                sys.exit(1)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
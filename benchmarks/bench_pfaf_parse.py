@@ -0,0 +1,64 @@
+"""
+bench_pfaf_parse.py
+-------------------
+Pages/sec of the PFAF parse stage over the fixtures (see bench_pfaf_extract.py):
+
+- full ``html.parser`` DOM (how every page used to be parsed) vs the targeted
+  ``SoupStrainer`` parse in ``pfaf_extract.parse_plant_info``;
+- ``ParseStage`` with 0 (inline), 1, 2, ... worker processes.
+
+Run:
+    python benchmarks/bench_pfaf_parse.py --pages 400
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from bench_pfaf_extract import load_fixtures  # noqa: E402
+from pfaf_extract import PARSER, ParseStage, parse_plant_info  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({0, 1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    pages = [fixtures[i % len(fixtures)][:3] for i in range(args.pages)]
+    print(f"{args.pages} pages, parser backend: {PARSER}, {os.cpu_count()} cores\n")
+
+    started = time.perf_counter()
+    for _, _, content in pages:
+        BeautifulSoup(content, "html.parser")
+    full = args.pages / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for genus, species, content in pages:
+        parse_plant_info(content, genus, species, "")
+    targeted = args.pages / (time.perf_counter() - started)
+    print(f"full html.parser DOM      {full:>8.0f} pages/s")
+    print(f"targeted parse_plant_info {targeted:>8.0f} pages/s  ({targeted / full:.1f}x)\n")
+
+    print(f"{'workers':>8} {'pages/s':>9}")
+    for workers in args.workers:
+        with ParseStage(workers) as stage:
+            if workers:
+                stage.submit(*pages[0], "").result()  # spin the pool up
+            started = time.perf_counter()
+            futures = [stage.submit(content, genus, species, "") for genus, species, content in pages]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - started
+        print(f"{workers:>8} {args.pages / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
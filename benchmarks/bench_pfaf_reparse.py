@@ -0,0 +1,47 @@
+"""
+bench_pfaf_reparse.py
+---------------------
+Offline reparse throughput: archives a full-size catalog of stand-in species
+pages (~7,400, the size of PFAF) with ``PageArchive`` and times
+``pfaf_archive.reparse`` with each number of parse processes.
+
+Run:
+    python benchmarks/bench_pfaf_reparse.py --per-letter 285 --workers 0 2 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pfaf_archive import PageArchive, reparse  # noqa: E402
+from pfaf_generator import attributes  # noqa: E402
+from pfaf_standin import catalog, plant_page  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--per-letter", type=int, default=285)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    started = time.perf_counter()
+    with PageArchive(os.path.join(tmp, "archive")) as archive:
+        for names in catalog(args.per_letter).values():
+            for name in names:
+                genus, species = name.split(" ", 1)
+                archive.add(genus, species, f"https://pfaf.org/user/Plant.aspx?LatinName={genus}+{species}",
+                            plant_page(name).encode("utf-8"))
+        archive.report()
+        print(f"archived in {time.perf_counter() - started:.1f}s\n")
+
+        for workers in args.workers:
+            reparse(archive, os.path.join(tmp, f"reparse_{workers}.csv"), attributes, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+bench_plant_dataset.py
+----------------------
+End-to-end I/O of the merge stages on a synthetic catalog, before and after
+the canonical dataset store (plant_dataset.py):
+
+- csv:      every stage reads all of plant_data.csv, copies it to a backup
+            and rewrites it (merge → zenodo → kew), then the translator
+            parses it twice.
+- dataset:  every stage reads only Genus/Species (the translator also
+            CommonName) from the store, writes only its own cells, and the
+            CSV is exported once at the end.
+
+Then the Kew stage alone is re-run on both, as after a new WCVP release.
+
+Bytes read and written are taken from /proc/self/io (``rchar``/``wchar``),
+so they include SQLite's own reads and writes. Both paths must export the
+same CSV.
+
+Run:
+    python benchmarks/bench_plant_dataset.py --plants 7400
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merge_plant_data import PFAF_COLUMNS  # noqa: E402
+from plant_dataset import PlantDataset, add_source, make_key  # noqa: E402
+
+PP_COLUMNS = [f"pp_field_{i:02d}" for i in range(60)]
+ZN_COLUMNS = [f"zn_field_{i:02d}" for i in range(40)]
+KEW_COLUMNS = [f"kew_field_{i}" for i in range(8)]
+FAMILIES = ["Rosaceae", "Lamiaceae", "Fabaceae", "Asteraceae", "Apiaceae", "Poaceae"]
+
+
+def make_catalog(n, seed=7):
+    """Base rows (PFAF columns plus sparse pp_*), Zenodo and Kew patches."""
+    rnd = random.Random(seed)
+    base = []
+    for i in range(n):
+        row = {col: f"{col.lower()} {rnd.randrange(40)}" for col in PFAF_COLUMNS}
+        row.update(Family=rnd.choice(FAMILIES), Genus=f"Genus{i % 900}", Species=f"species{i}")
+        pp = rnd.random() < 0.4
+        row["sources"] = "pfaf+permapeople" if pp else "pfaf"
+        for col in PP_COLUMNS:
+            row[col] = f"value {rnd.randrange(100)}" if pp and rnd.random() < 0.5 else ""
+        base.append(row)
+    zenodo = {}
+    for i in rnd.sample(range(n + n // 10), n // 4):   # some are new plants
+        zenodo[f"genus{i % 900} species{i}"] = {col: f"zn {rnd.randrange(50)}" for col in ZN_COLUMNS
+                                                if rnd.random() < 0.7}
+    kew = {make_key(row["Genus"], row["Species"]): {col: f"kew {rnd.randrange(30)}" for col in KEW_COLUMNS}
+           for row in base if rnd.random() < 0.6}
+    return base, zenodo, kew
+
+
+def io_counters():
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except OSError:
+        return 0, 0
+
+
+def csv_stage(path, backup, enrich):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields, rows = list(reader.fieldnames), list(reader)
+    shutil.copy2(path, backup)
+    fields = enrich(fields, rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_csv(base, zenodo, kew, tmp):
+    path = os.path.join(tmp, "plant_data.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PFAF_COLUMNS + PP_COLUMNS)
+        writer.writeheader()
+        writer.writerows(base)
+
+    def enrich_zenodo(fields, rows):
+        index = {}
+        for idx, row in enumerate(rows):
+            index.setdefault(make_key(row["Genus"], row["Species"]), idx)
+        for key, data in zenodo.items():
+            record = {col: data.get(col, "") for col in ZN_COLUMNS}
+            if key in index:
+                rows[index[key]].update(record)
+                rows[index[key]]["sources"] = add_source(rows[index[key]]["sources"], "zenodo")
+            else:
+                genus, species = key.split(" ", 1)
+                rows.append(dict(record, Genus=genus, Species=species, sources="zenodo"))
+        return fields + ZN_COLUMNS
+
+    csv_stage(path, os.path.join(tmp, "pre_zenodo.csv"), enrich_zenodo)
+    csv_kew(kew, tmp)
+    for _ in range(2):   # translate_plant_names: scientific names, then common names
+        with open(path, newline="", encoding="utf-8") as f:
+            sum(1 for _ in csv.DictReader(f))
+    return path
+
+
+def csv_kew(kew, tmp):
+    def enrich_kew(fields, rows):
+        for row in rows:
+            data = kew.get(make_key(row["Genus"], row["Species"]))
+            if data:
+                row.update(data)
+                row["sources"] = add_source(row["sources"], "kew")
+        return fields + [c for c in KEW_COLUMNS if c not in fields]
+
+    path = os.path.join(tmp, "plant_data.csv")
+    csv_stage(path, os.path.join(tmp, "pre_kew.csv"), enrich_kew)
+    return path
+
+
+def dataset_kew(dataset, kew):
+    patch = []
+    for row_key, row in dataset.read(["Genus", "Species"]):
+        data = kew.get(make_key(row.get("Genus", ""), row.get("Species", "")))
+        if data:
+            patch.append((row_key, dict(data, sources="kew")))
+    dataset.write("kew", patch, KEW_COLUMNS)
+
+
+def rerun_kew(kew, tmp):
+    with PlantDataset(os.path.join(tmp, "dataset.sqlite")) as dataset:
+        dataset_kew(dataset, kew)
+
+
+def run_dataset(base, zenodo, kew, tmp):
+    path = os.path.join(tmp, "plant_data.csv")
+    with PlantDataset(os.path.join(tmp, "dataset.sqlite")) as dataset:
+        dataset.write("merge", ((make_key(r["Genus"], r["Species"]), r) for r in base),
+                      PFAF_COLUMNS + PP_COLUMNS)
+
+        index = {}
+        for row_key, row in dataset.read(["Genus", "Species"], exclude_stage="zenodo"):
+            index.setdefault(make_key(row.get("Genus", ""), row.get("Species", "")), row_key)
+        patch = []
+        for key, data in zenodo.items():
+            if key in index:
+                patch.append((index[key], dict(data, sources="zenodo")))
+            else:
+                genus, species = key.split(" ", 1)
+                patch.append((key, dict(data, Genus=genus, Species=species, sources="zenodo")))
+        dataset.write("zenodo", patch, ZN_COLUMNS)
+
+        dataset_kew(dataset, kew)
+
+        sum(1 for _ in dataset.read(["Genus", "Species", "CommonName"]))
+        dataset.export_csv(path)
+    return path
+
+
+def measure(label, run, *args):
+    read0, written0 = io_counters()
+    started = time.time()
+    path = run(*args)
+    elapsed = time.time() - started
+    read1, written1 = io_counters()
+    print(f"{label:<8} {elapsed:6.2f}s   read {(read1 - read0) / 1_048_576:7.1f} MB   "
+          f"written {(written1 - written0) / 1_048_576:7.1f} MB")
+    return path, elapsed, read1 - read0 + written1 - written0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=7400)
+    args = parser.parse_args()
+
+    base, zenodo, kew = make_catalog(args.plants)
+    print(f"{args.plants} plants, {len(PFAF_COLUMNS) + len(PP_COLUMNS) + len(ZN_COLUMNS) + len(KEW_COLUMNS)} "
+          f"columns, {len(zenodo)} Zenodo and {len(kew)} Kew matches\n")
+    csv_dir, dataset_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        old_path, old_time, old_io = measure("csv", run_csv, base, zenodo, kew, csv_dir)
+        new_path, new_time, new_io = measure("dataset", run_dataset, base, zenodo, kew, dataset_dir)
+        same = filecmp.cmp(old_path, new_path, shallow=False)
+        print(f"\n{old_io / max(new_io, 1):.1f}x less I/O, {old_time / max(new_time, 1e-9):.1f}x faster; "
+              f"exports identical: {same}\n\nKew stage re-run:")
+        _, old_time, old_io = measure("csv", csv_kew, kew, csv_dir)
+        _, new_time, new_io = measure("dataset", rerun_kew, kew, dataset_dir)
+        print(f"\n{old_io / max(new_io, 1):.1f}x less I/O, {old_time / max(new_time, 1e-9):.1f}x faster")
+    finally:
+        shutil.rmtree(csv_dir)
+        shutil.rmtree(dataset_dir)
+
+
+if __name__ == "__main__":
+    main()
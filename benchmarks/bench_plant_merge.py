@@ -0,0 +1,219 @@
+"""
+bench_plant_merge.py
+--------------------
+The PFAF ⨝ Permapeople merge stage (merge_plant_data.build_base) on a
+synthetic catalog, before and after the columnar merge:
+
+- rows:     csv.DictReader into a dict per plant, a merged dict per output
+            row, and the dataset store regrouping the dicts into columns.
+- columns:  csv.reader transposed a column at a time into a PlantTable
+            (plant_table.py), the join kept as a list of row positions,
+            every output column built in one pass over it and handed to
+            the store as is.
+
+About half of the PFAF plants are in Permapeople too (some with author
+strings, so the name matcher is exercised), and a third of Permapeople is
+not in PFAF. Both paths load, merge and write a fresh dataset store; peak
+memory is traced with tracemalloc in a second run, and the two stores must
+export the same CSV.
+
+Run:
+    python benchmarks/bench_plant_merge.py --plants 200000
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merge_plant_data import (PFAF_COLUMNS, PP_EXTRA, PP_TO_PFAF, load_permapeople, load_pfaf,  # noqa: E402
+                              merge, norm, write_dataset)
+from plant_dataset import SOURCES, PlantDataset  # noqa: E402
+from plant_names import NameMatcher, match_unique  # noqa: E402
+from wcvp_standin import species_key  # noqa: E402
+
+PP_COLUMNS = sorted(set(PP_TO_PFAF) | set(PP_EXTRA) | {"growth", "propagation_method"})
+AUTHORS = ["L.", "Mill.", "(L.) Mill.", "Borkh."]
+VARIETIES = ["alba", "minor", "major", "edulis"]
+
+
+def write_sources(folder, n, seed=11, messy=0.0):
+    """PFAF and Permapeople CSVs for *n* PFAF plants. With *messy*, about
+    that share of the shared plants are written as a variety on the PFAF
+    side or with a typo in the epithet on the Permapeople side."""
+    rnd = random.Random(seed)
+    mess = random.Random(seed + 1)
+    pfaf_path = os.path.join(folder, "plant_data.csv")
+    pp_path = os.path.join(folder, "permapeople.csv")
+    with open(pfaf_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PFAF_COLUMNS)
+        for i in range(n):
+            genus, epithet = species_key(i)
+            if messy and i % 2 == 0 and mess.random() < messy / 2:
+                epithet += f" var. {mess.choice(VARIETIES)}"
+            writer.writerow([genus if col == "Genus" else epithet if col == "Species" else "pfaf" if col == SOURCES
+                             else f"{col.lower()} {rnd.randrange(40)}" if rnd.random() < 0.6 else ""
+                             for col in PFAF_COLUMNS])
+    with open(pp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PP_COLUMNS)
+        for i in list(range(0, n, 2)) + list(range(n, n + n // 4)):
+            genus, epithet = species_key(i)
+            if messy and i < n and mess.random() < messy / 2:
+                at = mess.randrange(1, len(epithet))
+                epithet = epithet[:at] + epithet[at + 1:]
+            scientific = f"{genus} {epithet}"
+            if rnd.random() < 0.1:
+                scientific += f" {rnd.choice(AUTHORS)}"
+            writer.writerow([scientific if col == "scientific_name" else genus if col == "genus"
+                             else f"{col} {rnd.randrange(60)}" if rnd.random() < 0.5 else ""
+                             for col in PP_COLUMNS])
+    return pfaf_path, pp_path
+
+
+# ── the dict-per-row merge, as merge_plant_data.py had it ─────────────────────
+
+def rows_load_pfaf(path):
+    records = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(SOURCES) and "pfaf" not in row[SOURCES].split("+"):
+                continue
+            latin = norm(f"{row.get('Genus', '').strip()} {row.get('Species', '').strip()}")
+            if latin and latin != " ":
+                records[latin] = {col: row.get(col, "") for col in PFAF_COLUMNS if col != SOURCES}
+    return records
+
+
+def rows_load_permapeople(path):
+    records = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            latin = norm(row.get("scientific_name") or row.get("name") or "")
+            if latin:
+                records[latin] = dict(row)
+    return records
+
+
+def rows_merge(pfaf, pp):
+    combined = []
+    joined = match_unique(NameMatcher(pp), pfaf)
+    for latin, prow in pfaf.items():
+        merged = dict(prow)
+        merged["sources"] = "pfaf"
+        pp_record = pp[joined[latin].target] if latin in joined else None
+        if pp_record:
+            merged["sources"] = "pfaf+permapeople"
+            for pp_col, pfaf_col in PP_TO_PFAF.items():
+                if not merged.get(pfaf_col) and pp_record.get(pp_col):
+                    merged[pfaf_col] = pp_record[pp_col]
+            for col in PP_EXTRA:
+                merged[f"pp_{col}"] = pp_record.get(col, "")
+        else:
+            for col in PP_EXTRA:
+                merged[f"pp_{col}"] = ""
+        combined.append(merged)
+
+    pp_matched = {m.target for m in joined.values()}
+    pp_only = {k: v for k, v in pp.items() if k not in pp_matched and k not in pfaf}
+    for latin, r in pp_only.items():
+        row = {
+            "Family": r.get("family", ""), "Genus": r.get("genus", ""),
+            "Species": " ".join(norm(r.get("scientific_name", "")).split()[1:]),
+            "CommonName": r.get("name", ""), "GrowthRate": r.get("growth", ""),
+            "HardinessZones": r.get("usda_hardiness_zone", ""), "Height": r.get("height", ""),
+            "Width": r.get("width", ""), "Type": r.get("life_cycle", ""), "Foliage": "",
+            "Pollinators": r.get("pollination", ""), "Leaf": "", "Flower": "", "Ripen": "",
+            "Reproduction": r.get("propagation_method", ""), "Soils": r.get("soil_type", ""),
+            "pH": r.get("soil_ph", ""), "pH_split": "", "Preferences": "",
+            "Tolerances": r.get("drought_resistant", ""), "Habitat": r.get("habitat", ""),
+            "HabitatRange": "", "Edibility": r.get("edible_uses", "") or r.get("edible", ""),
+            "Medicinal": r.get("medicinal", ""), "OtherUses": r.get("utility", ""),
+            "PFAF": r.get("plants_for_a_future", ""), "Image URL": r.get("images", ""),
+            "sources": "permapeople",
+        }
+        for col in PP_EXTRA:
+            row[f"pp_{col}"] = r.get(col, "")
+        combined.append(row)
+    return list(pfaf) + list(pp_only), combined
+
+
+def rows_write(keys, rows, dataset):
+    pp_cols = sorted({k for row in rows for k in row if k and k.startswith("pp_")})
+    dataset.write("merge", zip(keys, rows), PFAF_COLUMNS + pp_cols)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_rows(pfaf_path, pp_path, store):
+    keys, rows = rows_merge(rows_load_pfaf(pfaf_path), rows_load_permapeople(pp_path))
+    with PlantDataset(store) as dataset:
+        rows_write(keys, rows, dataset)
+
+
+def run_columns(pfaf_path, pp_path, store):
+    merged = merge(load_pfaf(pfaf_path), load_permapeople(pp_path))
+    with PlantDataset(store) as dataset:
+        write_dataset(merged, dataset)
+
+
+def measure(label, run, pfaf_path, pp_path, store):
+    """Time *run* on a fresh store, then trace a second run for its peak
+    memory (tracing slows it down too much to time it in the same run)."""
+    timings = []
+    for traced in (False, True):
+        if os.path.exists(store):
+            os.remove(store)
+        if traced:
+            tracemalloc.start()
+        started = time.time()
+        run(pfaf_path, pp_path, store)
+        timings.append(time.time() - started)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<8} {timings[0]:7.2f}s   peak {peak / 1_048_576:8.1f} MB\n")
+    return timings[0], peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=200_000, help="PFAF plants")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        pfaf_path, pp_path = write_sources(tmp, args.plants)
+        print(f"{args.plants} PFAF plants ({os.path.getsize(pfaf_path) / 1_048_576:.0f} MB), "
+              f"Permapeople {os.path.getsize(pp_path) / 1_048_576:.0f} MB\n")
+
+        results, exports = {}, {}
+        for label, run in (("rows", run_rows), ("columns", run_columns)):
+            store = os.path.join(tmp, f"{label}.sqlite")
+            results[label] = measure(label, run, pfaf_path, pp_path, store)
+            exports[label] = os.path.join(tmp, f"{label}.csv")
+            with PlantDataset(store) as dataset:
+                dataset.export_csv(exports[label])
+                sources = Counter(record.get(SOURCES, "") for _, record in dataset.read([SOURCES]))
+
+        (rows_time, rows_peak), (cols_time, cols_peak) = results["rows"], results["columns"]
+        same = filecmp.cmp(exports["rows"], exports["columns"], shallow=False)
+        print(f"{sum(sources.values())} rows ({dict(sources)})")
+        print(f"columns {rows_time / cols_time:.1f}x faster, peak memory {rows_peak / cols_peak:.1f}x "
+              f"lower; same export: {same}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
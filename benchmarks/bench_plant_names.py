@@ -0,0 +1,155 @@
+"""
+bench_plant_names.py
+--------------------
+Joins 100k synthetic plant names against a WCVP backbone (wcvp_standin.py)
+with plant_names.NameMatcher, and compares the time against comparing every
+pair.
+
+The names are backbone species written the way other sources write them:
+as is, with author strings, with a hybrid sign, as a variety, with a typo
+in the genus or epithet, plus names the backbone does not have. Real
+sibling species (SIBLINGS) are negative cases: one of each pair is in the
+backbone, and the other must not be joined to it. Each result is checked
+against the name it was made from; species and fuzzy matches (the
+varieties, hybrid signs and typos) are counted as suggestions, since
+match_unique only joins JOIN_TIERS.
+
+- indexed:    NameMatcher (exact / canonical / species tiers by dict, fuzzy
+              through the genus BK-tree and per-genus epithet trigrams).
+- all pairs:  edit distance from a sample of names to every backbone name,
+              extrapolated to all of them.
+
+Run:
+    python benchmarks/bench_plant_names.py --names 100000 --backbone 1400000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plant_names import JOIN_TIERS, MAX_DISTANCE, NameMatcher, canonical_key, edit_distance, parse_name  # noqa: E402
+from wcvp_standin import write_wcvp  # noqa: E402
+
+AUTHORS = ["L.", "Mill.", "(L.) Mill.", "Borkh.", "Thunb. ex Murray", "DC.", "Hook.f. & Thomson"]
+LETTERS = "abcdefghilmnoprstuvy"
+SIBLINGS = [   # (in the backbone, a distinct species written like it)
+    ("vinca minor", "Vinca major"), ("ulmus minor", "Ulmus major"),
+    ("carex flava", "Carex flacca"), ("viola odorata", "Viola adorata"),
+    ("quercus robur", "Quercus rubra"), ("salix alba", "Salix alpina"),
+    ("rosa canina", "Rosa carolina"),
+]
+
+
+def typo(word, rnd):
+    i = rnd.randrange(1, len(word))
+    kind = rnd.randrange(3)
+    if kind == 0:
+        return word[:i] + rnd.choice(LETTERS) + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rnd.choice(LETTERS) + word[i:]
+    return word[:i] + word[i + 1:]
+
+
+def make_names(backbone, n, seed=5):
+    """``[(name, expected target or None, variant)]``."""
+    rnd = random.Random(seed)
+    names = []
+    for _ in range(n):
+        key = rnd.choice(backbone)
+        genus, epithet = key.split(" ", 1)
+        roll = rnd.random()
+        if roll < 0.4:
+            names.append((key, key, "as is"))
+        elif roll < 0.55:
+            names.append((f"{genus.capitalize()} {epithet} {rnd.choice(AUTHORS)}", key, "authors"))
+        elif roll < 0.65:
+            names.append((f"{genus.capitalize()} × {epithet}", key, "hybrid"))
+        elif roll < 0.75:
+            names.append((f"{genus.capitalize()} {epithet} var. {typo(epithet, rnd)}", key, "variety"))
+        elif roll < 0.9:
+            if rnd.random() < 0.3:
+                genus = typo(genus, rnd)
+            else:
+                epithet = typo(epithet, rnd)
+            names.append((f"{genus.capitalize()} {epithet}", key, "typo"))
+        else:
+            names.append((f"Nothus{rnd.randrange(10**6)} ignotus", None, "unknown"))
+    names += [(sibling, None, "sibling") for _, sibling in SIBLINGS]
+    return names
+
+
+def all_pairs(names, backbone):
+    """Best match by comparing every pair (canonical names, same edit budget)."""
+    targets = [(key, key.replace(" ", "")) for key in backbone]
+    for name in names:
+        query = canonical_key(parse_name(name), infraspecific=False).replace(" ", "")
+        best = min(((edit_distance(query, target, MAX_DISTANCE), key) for key, target in targets),
+                   default=None)
+        yield best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--backbone", type=int, default=300_000, help="WCVP stand-in names")
+    parser.add_argument("--sample", type=int, default=50, help="Names timed for all pairs")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        _, _, kinds = write_wcvp(tmp, args.backbone)
+    finally:
+        shutil.rmtree(tmp)
+    backbone = sorted(set(kinds) | {key for key, _ in SIBLINGS})
+    names = make_names(backbone, args.names)
+    print(f"{len(names)} names against {len(backbone)} backbone species\n")
+
+    started = time.time()
+    matcher = NameMatcher(backbone)
+    build_time = time.time() - started
+    started = time.time()
+    matches = [matcher.match(name) for name, _, _ in names]
+    match_time = time.time() - started
+    print(f"indexed    build {build_time:6.2f}s   match {match_time:6.2f}s   "
+          f"({len(names) / match_time:,.0f} names/s)")
+
+    sample = [name for name, _, _ in names[:args.sample]]
+    started = time.time()
+    for _ in all_pairs(sample, backbone):
+        pass
+    pair_time = (time.time() - started) / len(sample) * len(names)
+    print(f"all pairs  {pair_time:,.0f}s estimated from {len(sample)} names "
+          f"({pair_time / (build_time + match_time):,.0f}x slower)\n")
+
+    print(f"{'variant':<10} {'names':>7} {'joined':>8} {'correct':>8} {'suggested':>10}   tiers")
+    by_variant = {}
+    for (name, expected, variant), match in zip(names, matches):
+        stats = by_variant.setdefault(variant, [0, 0, 0, 0, Counter()])
+        stats[0] += 1
+        if match is None:
+            continue
+        if match.tier in JOIN_TIERS:
+            stats[1] += 1
+            stats[2] += match.target == expected
+        else:
+            stats[3] += 1
+        stats[4][match.tier] += 1
+    for variant, (count, joined, correct, suggested, tiers) in by_variant.items():
+        print(f"{variant:<10} {count:>7} {joined:>8} {correct:>8} {suggested:>10}   "
+              f"{', '.join(f'{tier} {n}' for tier, n in tiers.most_common())}")
+    joins = [(e, m) for (_, e, _), m in zip(names, matches) if m is not None and m.tier in JOIN_TIERS]
+    wrong = sum(m.target != e for e, m in joins)
+    print(f"\n{len(joins)} joined, {wrong} to the wrong name, "
+          f"{by_variant['sibling'][1]} sibling species joined")
+
+
+if __name__ == "__main__":
+    main()
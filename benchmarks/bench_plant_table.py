@@ -0,0 +1,197 @@
+"""
+bench_plant_table.py
+--------------------
+Peak RSS of the PFAF ⨝ Permapeople merge holding its records as
+``list[dict]`` against the compact PlantTable (plant_table.py), on a
+synthetic catalog ten times the size of the real one:
+
+- rows:   csv.DictReader into a dict per plant, a merged dict per output row
+          (bench_plant_merge.py keeps that merge as the reference).
+- table:  merge_plant_data.merge: columns dictionary-encoded or stored
+          sparsely, row keys and column names interned.
+
+The catalog is shaped like the real data: categorical columns drawn from
+small pools (``Family``, ``GrowthRate``, ``Type``, ``Soils`` …), free-text
+columns unique per plant (``Edibility``, ``Habitat`` …), and Permapeople
+fields that are mostly empty.
+
+Each variant runs in its own process, so its peak RSS (``VmHWM`` in
+/proc/self/status) is its own; RSS is also taken once the merge is done
+(what the merged records hold) and after writing a dataset store. Both
+stores must export the same CSV.
+
+Run:
+    python benchmarks/bench_plant_table.py --plants 74000
+"""
+
+import argparse
+import csv
+import filecmp
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_plant_merge import (PP_COLUMNS, rows_load_permapeople, rows_load_pfaf, rows_merge,  # noqa: E402
+                               rows_write)
+from merge_plant_data import PFAF_COLUMNS, load_permapeople, load_pfaf, merge, write_dataset  # noqa: E402
+from pfaf_standin import MONTHS, POLLINATORS, RATES, TYPES, description_for  # noqa: E402
+from plant_dataset import SOURCES, PlantDataset  # noqa: E402
+from wcvp_standin import species_key  # noqa: E402
+
+TEXT = None     # a column of free text, different for every plant
+
+
+def _pool(n, make):
+    return [make(i) for i in range(n)]
+
+
+# column → (share of plants with a value, pool of values or TEXT)
+PFAF_SHAPE = {
+    "Family":          (0.98, _pool(300, lambda i: f"Famil{i}aceae")),
+    "CommonName":      (0.90, TEXT),
+    "GrowthRate":      (0.80, RATES),
+    "HardinessZones":  (0.85, [f"{a}-{b}" for a in range(1, 11) for b in range(a, 12)]),
+    "Height":          (0.85, _pool(60, lambda i: f"{0.1 + i * 0.5:g}")),
+    "Width":           (0.80, _pool(40, lambda i: f"{0.1 + i * 0.5:g}")),
+    "Type":            (0.95, TYPES),
+    "Foliage":         (0.50, ["Deciduous", "Evergreen"]),
+    "Pollinators":     (0.60, [f"{a}, {b}" for a in POLLINATORS for b in POLLINATORS if a < b]),
+    "Leaf":            (0.60, [f"{a}-{b}" for a in MONTHS for b in MONTHS]),
+    "Flower":          (0.70, [f"{a}-{b}" for a in MONTHS for b in MONTHS]),
+    "Ripen":           (0.40, [f"{a}-{b}" for a in MONTHS for b in MONTHS]),
+    "Reproduction":    (0.40, ["Hermaphrodite", "Monoecious", "Dioecious"]),
+    "Soils":           (0.85, ["L", "M", "H", "L;M", "M;H", "L;H", "L;M;H"]),
+    "pH":              (0.85, ["A", "N", "B", "A;N", "N;B", "A;B", "A;N;B"]),
+    "pH_split":        (0.10, ["acid", "neutral", "basic"]),
+    "Preferences":     (0.70, _pool(20, lambda i: f"SN;M{';We' * (i % 2)};{'FS' if i % 3 else 'SN'}{i}")),
+    "Tolerances":      (0.30, _pool(15, lambda i: f"Wind;{'Maritime' if i % 2 else 'Drought'}{i}")),
+    "Habitat":         (0.70, TEXT),
+    "HabitatRange":    (0.70, _pool(500, lambda i: f"Region {i}, subregion {i % 17}")),
+    "Edibility":       (0.50, TEXT),
+    "Medicinal":       (0.40, TEXT),
+    "OtherUses":       (0.45, TEXT),
+    "PFAF":            (0.90, ["1", "2", "3", "4", "5"]),
+    "Image URL":       (0.60, TEXT),
+}
+PP_TEXT = {"id", "slug", "description", "link", "name", "wikipedia", "plants_for_a_future",
+           "plants_of_the_world_online", "native_to", "edible_uses"}
+PP_FILL = 0.3
+
+
+def _cell(rnd, share, pool, i, col, latin):
+    if rnd.random() >= share:
+        return ""
+    if pool is TEXT:
+        return f"{col} {i}: {description_for(latin)[:rnd.randrange(40, 400)]}"
+    return rnd.choice(pool)
+
+
+def write_catalog(folder, n, seed=7, shape=None):
+    """PFAF and Permapeople CSVs for *n* PFAF plants: half of them in
+    Permapeople too, plus a quarter as many Permapeople-only plants.
+    *shape* replaces ``PFAF_SHAPE``."""
+    shape = shape or PFAF_SHAPE
+    rnd = random.Random(seed)
+    pfaf_path = os.path.join(folder, "plant_data.csv")
+    pp_path = os.path.join(folder, "permapeople.csv")
+    with open(pfaf_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PFAF_COLUMNS)
+        for i in range(n):
+            genus, epithet = species_key(i)
+            latin = f"{genus} {epithet}"
+            writer.writerow([genus if col == "Genus" else epithet if col == "Species" else "pfaf" if col == SOURCES
+                             else _cell(rnd, *shape[col], i, col, latin) for col in PFAF_COLUMNS])
+    pools = {col: _pool(20, lambda k, col=col: f"{col.replace('_', ' ')} {k}") for col in PP_COLUMNS}
+    with open(pp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PP_COLUMNS)
+        for i in list(range(0, n, 2)) + list(range(n, n + n // 4)):
+            genus, epithet = species_key(i)
+            latin = f"{genus} {epithet}"
+            writer.writerow([latin if col == "scientific_name" else genus if col == "genus"
+                             else _cell(rnd, PP_FILL, TEXT if col in PP_TEXT else pools[col], i, col, latin)
+                             for col in PP_COLUMNS])
+    return pfaf_path, pp_path
+
+
+def _status(field):
+    """*field* of /proc/self/status in bytes."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def run_variant(variant, pfaf_path, pp_path, store):
+    """One variant in this process; prints its timings and RSS as JSON."""
+    base = _status("VmRSS")
+    started = time.time()
+    if variant == "rows":
+        merged = rows_merge(rows_load_pfaf(pfaf_path), rows_load_permapeople(pp_path))
+    else:
+        merged = merge(load_pfaf(pfaf_path), load_permapeople(pp_path))
+    merge_time = time.time() - started
+    held, merge_peak = _status("VmRSS") - base, _status("VmHWM")
+    with PlantDataset(store) as dataset:
+        if variant == "rows":
+            rows_write(*merged, dataset)
+        else:
+            write_dataset(merged, dataset)
+    print(json.dumps({"merge_time": merge_time, "time": time.time() - started, "held": held,
+                      "merge_peak": merge_peak, "peak": _status("VmHWM"),
+                      "layouts": merged.layouts() if variant == "table" else None}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=74_000, help="PFAF plants (the real catalog has ~7400)")
+    parser.add_argument("--run", choices=["rows", "table"], help=argparse.SUPPRESS)
+    parser.add_argument("--paths", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_variant(args.run, *args.paths)
+        return
+
+    tmp = tempfile.mkdtemp()
+    try:
+        pfaf_path, pp_path = write_catalog(tmp, args.plants)
+        print(f"{args.plants} PFAF plants ({os.path.getsize(pfaf_path) / 1_048_576:.0f} MB), "
+              f"Permapeople {os.path.getsize(pp_path) / 1_048_576:.0f} MB\n")
+
+        results, exports = {}, {}
+        for variant in ("rows", "table"):
+            store = os.path.join(tmp, f"{variant}.sqlite")
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", variant,
+                                  "--paths", pfaf_path, pp_path, store],
+                                 check=True, capture_output=True, text=True).stdout
+            results[variant] = json.loads(out.strip().splitlines()[-1])
+            exports[variant] = os.path.join(tmp, f"{variant}.csv")
+            with PlantDataset(store) as dataset:
+                dataset.export_csv(exports[variant])
+
+        mb = 1_048_576
+        print(f"\n{'':<6} {'merge':>8} {'total':>8} {'held':>10} {'merge peak':>11} {'peak':>10}")
+        for variant, r in results.items():
+            print(f"{variant:<6} {r['merge_time']:7.2f}s {r['time']:7.2f}s {r['held'] / mb:7.0f} MB "
+                  f"{r['merge_peak'] / mb:8.0f} MB {r['peak'] / mb:7.0f} MB")
+        rows, table = results["rows"], results["table"]
+        print(f"\ntable columns: {', '.join(f'{n} {layout}' for layout, n in table['layouts'].items())}")
+        print(f"\nmerged records {rows['held'] / table['held']:.1f}x smaller, merge peak RSS "
+              f"{rows['merge_peak'] / table['merge_peak']:.1f}x lower; "
+              f"same export: {filecmp.cmp(exports['rows'], exports['table'], shallow=False)}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+bench_site_data.py
+------------------
+What each page of the site downloads and parses at startup, before and
+after the per-page column artifacts (publish_plant_data.py):
+
+- csv:       all of docs/plant_data.csv, every column, parsed into a row
+             object per plant.
+- unsplit:   one artifact per page with every column the page uses, its
+             ``plant-data-detail`` columns included.
+- hot:       the page's artifact from docs/data/manifest.json: only its
+             ``plant-data-columns``, the detail columns left to the shards.
+
+Artifacts are JSON.parse-d and decoded by docs/plant_data.js
+(``decodePlantColumns``). Then the detail shards are published at each
+``--shard-kb``, with what opening one plant costs: the shard's bytes and
+its decode time.
+
+The dataset is a synthetic catalog (bench_plant_table.write_catalog) merged,
+typed (normalise_plant_data.py) and given Zenodo / Kew columns, and the
+column declarations are the real pages' in docs/. Sizes are raw and
+gzipped (what a static host sends). Parse times are taken in node, the
+median of ``--repeat`` runs; PapaParse is not vendored here, so the CSV
+side uses a minimal quoted-CSV parser, which is if anything faster than
+Papa.
+
+Run:
+    python benchmarks/bench_site_data.py --plants 7400
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_plant_table import TEXT, _cell, _pool, write_catalog  # noqa: E402
+from merge_plant_data import load_permapeople, load_pfaf, merge, write_dataset  # noqa: E402
+from normalise_plant_data import normalise  # noqa: E402
+from plant_dataset import PlantDataset  # noqa: E402
+from bench_plant_table import PFAF_SHAPE  # noqa: E402
+from publish_plant_data import COLUMNS_META, DETAIL_META, DOCS_DIR, PAGES, _page_meta, publish  # noqa: E402
+
+# As the site sees them: Edibility / Medicinal / OtherUses are PFAF's 1-5
+# ratings, common names a few words, images a URL per plant
+RATINGS = ["1", "2", "3", "4", "5"]
+SITE_SHAPE = dict(PFAF_SHAPE,
+                  CommonName=(0.90, _pool(20000, lambda i: f"Common name {i}, other name {i % 97}")),
+                  Edibility=(0.90, RATINGS), Medicinal=(0.70, RATINGS), OtherUses=(0.70, RATINGS),
+                  **{"Image URL": (0.60, _pool(20000, lambda i: f"https://pfaf.org/Admin/PlantImages/Plant{i}.jpg"))})
+
+REGIONS = _pool(370, lambda i: f"Region {i}")
+RANGES  = _pool(4000, lambda i: ", ".join(random.Random(i).sample(REGIONS, 1 + i % 12)))
+
+# Enrichment columns: (stage, share of plants with a value, pool or TEXT)
+ENRICHED_SHAPE = {
+    "zn_Toxicity":               ("zenodo", 0.30, ["Non-toxic", "Toxic to pets", "Toxic to humans"]),
+    "zn_brightness":             ("zenodo", 0.30, _pool(8, lambda i: f"Light level {i}")),
+    "zn_temperature":            ("zenodo", 0.30, _pool(12, lambda i: f"{10 + i}-{20 + i}°C")),
+    "zn_solHumidity":            ("zenodo", 0.30, ["Low", "Medium", "High"]),
+    "zn_watering":               ("zenodo", 0.30, _pool(6, lambda i: f"Water every {i + 3} days")),
+    "zn_suggestedSoilMix":       ("zenodo", 0.30, _pool(30, lambda i: f"Soil mix {i}: peat, perlite, bark")),
+    "zn_description":            ("zenodo", 0.30, TEXT),
+    "kew_taxon_authors":         ("kew", 0.90, _pool(3000, lambda i: f"Author{i}")),
+    "kew_first_published":       ("kew", 0.90, _pool(20000, lambda i: f"Fl. Reg. {i % 300}: {i % 700} ({1753 + i % 270})")),
+    "kew_powo_id":               ("kew", 0.90, _pool(90000, lambda i: f"{i}-{1 + i % 3}")),
+    "kew_lifeform_description":  ("kew", 0.80, _pool(40, lambda i: f"lifeform {i}")),
+    "kew_climate_description":   ("kew", 0.80, ["tropical", "temperate", "subtropical", "desert", "wet tropical"]),
+    "kew_geographic_area":       ("kew", 0.80, _pool(500, lambda i: f"Area {i}")),
+    "kew_native_range":          ("kew", 0.85, RANGES),
+    "kew_introduced_range":      ("kew", 0.40, RANGES),
+}
+
+PARSE_JS = r"""
+const fs = require('fs');
+eval(fs.readFileSync(process.argv[2], 'utf8') + ';globalThis.decodePlantColumns = decodePlantColumns;');
+const [kind, path, repeat] = process.argv.slice(3);
+
+// Slices whole unquoted cells at once, as Papa's fast path does
+function parseCsv(text) {
+  const rows = [];
+  let row = [], i = 0;
+  const n = text.length;
+  while (i < n) {
+    let cell;
+    if (text[i] === '"') {
+      cell = '';
+      let j = i + 1;
+      for (;;) {
+        const q = text.indexOf('"', j);
+        if (q < 0) { cell += text.slice(j); i = n; break; }
+        cell += text.slice(j, q);
+        if (text[q + 1] === '"') { cell += '"'; j = q + 2; } else { i = q + 1; break; }
+      }
+    } else {
+      let end = i;
+      while (end < n && text[end] !== ',' && text[end] !== '\n' && text[end] !== '\r') end++;
+      cell = text.slice(i, end);
+      i = end;
+    }
+    row.push(cell);
+    if (text[i] === ',') { i++; continue; }
+    if (text[i] === '\r') i++;
+    if (text[i] === '\n') i++;
+    if (row.length > 1 || row[0] !== '') rows.push(row);
+    row = [];
+  }
+  if (row.length) rows.push(row);
+  const header = rows.shift();
+  return rows.map(cells => {
+    const obj = {};
+    for (let c = 0; c < header.length; c++) obj[header[c]] = cells[c] === undefined ? '' : cells[c];
+    return obj;
+  });
+}
+
+const text = fs.readFileSync(path, 'utf8');
+const times = [];
+let rows = 0;
+for (let i = 0; i < Number(repeat); i++) {
+  const started = process.hrtime.bigint();
+  const data = kind === 'csv' ? parseCsv(text) : decodePlantColumns(JSON.parse(text));
+  times.push(Number(process.hrtime.bigint() - started) / 1e6);
+  rows = data.length;
+}
+times.sort((a, b) => a - b);
+console.log(JSON.stringify({ ms: times[times.length >> 1], rows }));
+"""
+
+
+def build_store(folder, plants, seed=11):
+    """A merged, typed and enriched dataset store of *plants* PFAF plants."""
+    pfaf_path, pp_path = write_catalog(folder, plants, shape=SITE_SHAPE)
+    store = os.path.join(folder, "plant_dataset.sqlite")
+    rnd = random.Random(seed)
+    with PlantDataset(store) as dataset:
+        write_dataset(merge(load_pfaf(pfaf_path), load_permapeople(pp_path)), dataset)
+        normalise(dataset)
+        keys, names = [], []
+        for key, record in dataset.read(["Genus", "Species"], stage="merge"):
+            keys.append(key)
+            names.append(f"{record.get('Genus', '')} {record.get('Species', '')}")
+        for stage in ("zenodo", "kew"):
+            columns = {col: [_cell(rnd, share, pool, i, col, name) for i, name in enumerate(names)]
+                       for col, (col_stage, share, pool) in ENRICHED_SHAPE.items() if col_stage == stage}
+            dataset.write_columns(stage, keys, columns, patch=True)
+        dataset.export_csv(os.path.join(folder, "plant_data.csv"))
+    return store
+
+
+def parse_time(kind, path, repeat):
+    script = os.path.join(os.path.dirname(path), "parse.js")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(PARSE_JS)
+    out = subprocess.run(["node", script, os.path.join(DOCS_DIR, "plant_data.js"), kind, path, str(repeat)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def _gzip_size(path):
+    with open(path, "rb") as f:
+        return len(gzip.compress(f.read()))
+
+
+def unsplit_pages(folder):
+    """Copies of the pages declaring their detail columns as startup ones."""
+    paths = []
+    for path in PAGES:
+        meta = _page_meta(path)
+        with open(os.path.join(folder, os.path.basename(path)), "w", encoding="utf-8") as f:
+            f.write(f'<meta name="{COLUMNS_META}" content="{",".join(meta[COLUMNS_META] + meta.get(DETAIL_META, []))}">')
+        paths.append(f.name)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=7_400, help="PFAF plants (the real catalog has ~7400)")
+    parser.add_argument("--repeat", type=int, default=5, help="parse runs per file (the median is shown)")
+    parser.add_argument("--shard-kb", default="8,32,128", help="detail shard sizes to compare (KB, comma-separated)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        store = build_store(tmp, args.plants)
+        os.makedirs(os.path.join(tmp, "pages"))
+        shard_sizes = [int(kb) for kb in args.shard_kb.split(",")]
+        with PlantDataset(store) as dataset:
+            unsplit = publish(dataset, unsplit_pages(os.path.join(tmp, "pages")), os.path.join(tmp, "unsplit"))
+            split = {kb: publish(dataset, PAGES, os.path.join(tmp, f"shards-{kb}"), shard_kb=kb) for kb in shard_sizes}
+        csv_path = os.path.join(tmp, "plant_data.csv")
+        csv_bytes, csv_gzip = os.path.getsize(csv_path), _gzip_size(csv_path)
+        csv_parse = parse_time("csv", csv_path, args.repeat)
+        manifest = split[shard_sizes[0]]
+        print(f"\n{manifest['rows']} rows, {len(manifest['fields'])} columns; plant_data.csv "
+              f"{csv_bytes / 1024:.0f} KB ({csv_gzip / 1024:.0f} KB gzipped), parsed in {csv_parse['ms']:.0f} ms\n")
+
+        kb = 1024
+        print(f"{'page':<14} {'':<8} {'columns':>7} {'KB':>7} {'gzip KB':>8} {'parse':>9}   "
+              f"{'bytes':>6} {'gzip':>6} {'parse':>6}")
+        for page, entry in manifest["pages"].items():
+            for variant, variant_entry in (("unsplit", unsplit["pages"][page]), ("hot", entry)):
+                # artifact paths are relative to the folder above the published one
+                parsed = parse_time("artifact", os.path.join(tmp, variant_entry["artifact"]), args.repeat)
+                assert parsed["rows"] == manifest["rows"], (page, parsed["rows"])
+                print(f"{page if variant == 'unsplit' else '':<14} {variant:<8} {len(variant_entry['columns']):>7} "
+                      f"{variant_entry['bytes'] / kb:>7.0f} {variant_entry['gzip_bytes'] / kb:>8.0f} "
+                      f"{parsed['ms']:>6.0f} ms   {csv_bytes / variant_entry['bytes']:>5.1f}x "
+                      f"{csv_gzip / variant_entry['gzip_bytes']:>5.1f}x {csv_parse['ms'] / parsed['ms']:>5.1f}x")
+        print("\n(last three columns: how many times smaller / faster than the full CSV)")
+
+        detail = manifest["detail"]
+        if detail:
+            print(f"\ndetail: {len(detail['columns'])} columns; opening a plant fetches one shard\n")
+            print(f"{'shard KB':>8} {'shards':>7} {'plants':>7} {'KB':>6} {'gzip KB':>8} {'decode':>9}")
+            for shard_kb, published in split.items():
+                shards = published["detail"]["shards"]
+                middle = sorted(shards, key=lambda shard: shard["bytes"])[len(shards) // 2]
+                decoded = parse_time("artifact", os.path.join(tmp, middle["artifact"]), args.repeat)
+                print(f"{shard_kb:>8} {len(shards):>7} {statistics.median(s['rows'] for s in shards):>7.0f} "
+                      f"{middle['bytes'] / kb:>6.1f} {middle['gzip_bytes'] / kb:>8.1f} {decoded['ms']:>6.1f} ms")
+            print("\n(plants: per shard; KB, gzip KB, decode: the median shard)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
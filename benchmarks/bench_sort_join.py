@@ -0,0 +1,133 @@
+"""
+bench_sort_join.py
+------------------
+The PFAF ⨝ Permapeople merge in memory (merge_plant_data.merge) against the
+out-of-core merge (merge_plant_data.merge_external, sort_join.py) at a few
+memory budgets, on the synthetic sources of bench_plant_merge.py.
+
+- memory:    both CSVs loaded as columns, joined with NameMatcher.
+- external:  both CSVs sorted by name in runs of --budget MB on disk, joined
+             in one streaming pass and sorted back into source order.
+
+Peak memory is traced with tracemalloc, for the merge alone and with the
+dataset store written too (the store's own buffers hold the written
+columns).
+
+Each budget runs on two catalogs: clean names, and one where --messy of
+the shared plants are varieties on the PFAF side or have an epithet typo
+on the Permapeople side. Every run must export the same CSV as the
+in-memory merge on both: varieties (species tier) and typos (fuzzy tier)
+are suggestions, joined by neither, so the table shows the joined count
+dropping by the messy share.
+
+Run:
+    python benchmarks/bench_sort_join.py --plants 200000 --budget 8 --budget 64
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_plant_merge import write_sources  # noqa: E402
+from merge_plant_data import (PFAF_COLUMNS, PP_EXTRA, load_permapeople, load_pfaf, merge,  # noqa: E402
+                              merge_external, write_dataset)
+from plant_dataset import SOURCES, PlantDataset  # noqa: E402
+
+
+def run_memory(pfaf_path, pp_path, store, folder):
+    merged = merge(load_pfaf(pfaf_path), load_permapeople(pp_path))
+    if store:
+        with PlantDataset(store) as dataset:
+            write_dataset(merged, dataset)
+
+
+def run_external(budget):
+    def run(pfaf_path, pp_path, store, folder):
+        rows = merge_external(pfaf_path, pp_path, budget << 20, folder)
+        if not store:
+            for _ in rows:
+                pass
+            return
+        with PlantDataset(store) as dataset:
+            dataset.write("merge", rows, PFAF_COLUMNS + [f"pp_{col}" for col in sorted(PP_EXTRA)])
+    return run
+
+
+def measure(run, pfaf_path, pp_path, store, folder):
+    """Time *run* on a fresh store, then trace a second run for its peak
+    memory (tracing slows it down too much to time it in the same run).
+    Without a *store*, only the merge itself runs."""
+    timings = []
+    for traced in (False, True):
+        if store and os.path.exists(store):
+            os.remove(store)
+        if traced:
+            tracemalloc.start()
+        started = time.time()
+        run(pfaf_path, pp_path, store, folder)
+        timings.append(time.time() - started)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings[0], peak
+
+
+def joined_rows(export):
+    """Rows of an export that joined PFAF and Permapeople."""
+    with open(export, newline="", encoding="utf-8") as f:
+        return sum(row[SOURCES] == "pfaf+permapeople" for row in csv.DictReader(f))
+
+
+def compare(args, tmp, messy):
+    pfaf_path, pp_path = write_sources(tmp, args.plants, messy=messy)
+    source_mb = (os.path.getsize(pfaf_path) + os.path.getsize(pp_path)) / 1_048_576
+    print(f"{args.plants} PFAF plants, {source_mb:.0f} MB of source CSVs"
+          + (f", {messy:.0%} of the shared plants as varieties or with typos" if messy else "") + "\n")
+
+    runs = [("memory", run_memory)] + [(f"{mb} MB", run_external(mb)) for mb in args.budget or [8, 64]]
+    reference = None
+    results = []
+    for label, run in runs:
+        store = os.path.join(tmp, "store.sqlite")
+        _, merge_peak = measure(run, pfaf_path, pp_path, None, tmp)
+        elapsed, peak = measure(run, pfaf_path, pp_path, store, tmp)
+        export = os.path.join(tmp, f"export_{len(results)}.csv")
+        with PlantDataset(store) as dataset:
+            dataset.export_csv(export)
+        reference = reference or export
+        results.append((label, elapsed, merge_peak, peak, joined_rows(export),
+                        filecmp.cmp(reference, export, shallow=False)))
+
+    print(f"\n{'merge':<10} {'time':>8} {'merge peak':>11} {'with store':>11} {'joined':>8}   same export")
+    for label, elapsed, merge_peak, peak, joined, same in results:
+        print(f"{label:<10} {elapsed:7.2f}s {merge_peak / 1_048_576:8.1f} MB "
+              f"{peak / 1_048_576:8.1f} MB {joined:>8}   {same}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--plants", type=int, default=200_000, help="PFAF plants")
+    parser.add_argument("--budget", type=int, action="append", help="Out-of-core budgets in MB")
+    parser.add_argument("--messy", type=float, default=0.1,
+                        help="Share of the shared plants written as varieties or with typos")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for messy in (0.0, args.messy):
+            compare(args, tmp, messy)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_wcvp_index.py
+-------------------
+The Kew enrichment before and after the prebuilt WCVP index (wcvp_index.py),
+on a synthetic WCVP download (wcvp_standin.py):
+
+- scan:    the old per-run scan — csv.DictReader over every name, then over
+           the whole distribution file, for the dataset's keys.
+- build:   building the index once (only when the download changes).
+- reopen:  ``open_index`` on an unchanged download (size/mtime check only).
+- lookup:  ``WcvpIndex.lookup`` for the same keys.
+
+The probe keys are a catalog-sized mix of accepted names, synonyms and
+names WCVP does not know. Every accepted match of the scan must come back
+identical from the index; synonym matches are what the index adds.
+
+Run:
+    python benchmarks/bench_wcvp_index.py --names 1400000 --plants 7400
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wcvp_index import NAME_FIELDS, make_key, open_index  # noqa: E402
+from wcvp_standin import write_wcvp  # noqa: E402
+
+
+def scan(needed_keys, names_path, dist_path):
+    """The scan merge_wcvp_data.py did on every run before the index."""
+    matches, matched_ids = {}, set()
+    with open(names_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="|"):
+            if row["taxon_rank"] != "Species" or row["taxon_status"] != "Accepted":
+                continue
+            key = make_key(row["genus"], row["species"])
+            if key in needed_keys and key not in matches:
+                matches[key] = dict({field: row.get(field, "") for field in NAME_FIELDS},
+                                    plant_name_id=row["plant_name_id"])
+                matched_ids.add(row["plant_name_id"])
+    native, introduced = defaultdict(set), defaultdict(set)
+    with open(dist_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="|"):
+            pid = row["plant_name_id"]
+            area = row.get("area", "").strip()
+            if pid not in matched_ids or not area or row.get("extinct", "0") == "1":
+                continue
+            (introduced if row.get("introduced", "0") == "1" else native)[pid].add(area)
+    for data in matches.values():
+        data["native_range"] = "; ".join(sorted(native.get(data["plant_name_id"], ())))
+        data["introduced_range"] = "; ".join(sorted(introduced.get(data["plant_name_id"], ())))
+    return matches
+
+
+def timed(label, run, *args):
+    started = time.time()
+    result = run(*args)
+    elapsed = time.time() - started
+    print(f"{label:<8} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=300_000)
+    parser.add_argument("--plants", type=int, default=7400)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        names_path, dist_path, known = write_wcvp(tmp, args.names)
+        rnd = random.Random(3)
+        accepted = [k for k, kind in known.items() if kind == "accepted"]
+        synonyms = [k for k, kind in known.items() if kind == "synonym"]
+        probes = set(rnd.sample(accepted, min(len(accepted), args.plants * 6 // 10)))
+        probes |= set(rnd.sample(synonyms, min(len(synonyms), args.plants // 10)))
+        probes |= {f"unknown{i} plant{i}" for i in range(args.plants - len(probes))}
+        print(f"{args.names} WCVP names, {len(probes)} dataset keys\n")
+
+        index_path = os.path.join(tmp, "wcvp_index.sqlite")
+        old, scan_time = timed("scan", scan, probes, names_path, dist_path)
+        _, build_time = timed("build", lambda: open_index(names_path, dist_path, index_path).close())
+        index, reopen_time = timed("reopen", open_index, names_path, dist_path, index_path)
+        with index:
+            hits, lookup_time = timed("lookup", index.lookup, probes)
+
+        same = all(hits.get(key, {}).get(field) == data[field]
+                   for key, data in old.items() for field in data)
+        via_synonym = sum(1 for hit in hits.values() if hit["match"] == "synonym")
+        print(f"\nscan matched {len(old)}; index matched {len(hits)} ({via_synonym} through a synonym); "
+              f"accepted matches identical: {same}")
+        print(f"per run: {scan_time / max(reopen_time + lookup_time, 1e-9):.0f}x faster "
+              f"({scan_time:.2f}s → {reopen_time + lookup_time:.3f}s); "
+              f"the build pays for itself after {build_time / max(scan_time, 1e-9):.1f} runs")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
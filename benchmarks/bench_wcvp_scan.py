@@ -0,0 +1,88 @@
+"""
+bench_wcvp_scan.py
+------------------
+Scan throughput over a synthetic WCVP download (wcvp_standin.py), for the
+reductions the index build does (wcvp_index.py):
+
+- dictreader:  one csv.DictReader pass per file — a dict per row, all columns.
+- chunked:     wcvp_scan.scan — memory-mapped, newline-aligned byte ranges,
+               only the needed columns, on 1, 2, 4 … up to --workers cores.
+
+Both must produce the same names/taxa rows and distribution ranges.
+
+Run:
+    python benchmarks/bench_wcvp_scan.py --names 1400000 --workers 8
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wcvp_index import DIST_COLUMNS, NAMES_COLUMNS, _reduce_distribution, _reduce_names  # noqa: E402
+from wcvp_scan import scan  # noqa: E402
+from wcvp_standin import write_wcvp  # noqa: E402
+
+
+def dictreader(path, columns, reduce):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = [tuple(row[c] for c in columns) for row in csv.DictReader(f, delimiter="|")]
+    return [reduce(rows)], len(rows)
+
+
+def merged(names_parts, dist_parts):
+    names = [row for part, _ in names_parts for row in part]
+    taxa = [row for _, part in names_parts for row in part]
+    ranges = {}
+    for part in dist_parts:
+        for pid, (native, introduced) in part.items():
+            entry = ranges.setdefault(pid, (set(), set()))
+            entry[0].update(native)
+            entry[1].update(introduced)
+    return names, taxa, ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=300_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        names_path, dist_path, _ = write_wcvp(tmp, args.names)
+        print(f"{args.names} WCVP names, {os.path.getsize(names_path) / 1_048_576:.0f} MB + "
+              f"{os.path.getsize(dist_path) / 1_048_576:.0f} MB distribution\n")
+
+        started = time.time()
+        names_parts, names_rows = dictreader(names_path, NAMES_COLUMNS, _reduce_names)
+        dist_parts, dist_rows = dictreader(dist_path, DIST_COLUMNS, _reduce_distribution)
+        base_time = time.time() - started
+        expected = merged(names_parts, dist_parts)
+        rows = names_rows + dist_rows
+        print(f"{'dictreader':<12} {base_time:7.2f}s  {rows / base_time:>12,.0f} rows/s\n")
+
+        workers = 1
+        while True:
+            started = time.time()
+            names_parts = scan(names_path, NAMES_COLUMNS, _reduce_names, workers)
+            dist_parts = scan(dist_path, DIST_COLUMNS, _reduce_distribution, workers)
+            elapsed = time.time() - started
+            got = merged(names_parts, dist_parts)
+            print(f"{'chunked':<12} {elapsed:7.2f}s  {rows / elapsed:>12,.0f} rows/s on {workers} core(s), "
+                  f"{base_time / elapsed:.1f}x faster, same result: {got == expected}\n")
+            if workers >= args.workers:
+                break
+            workers = min(workers * 2, args.workers)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
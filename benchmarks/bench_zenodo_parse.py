@@ -0,0 +1,111 @@
+"""
+bench_zenodo_parse.py
+---------------------
+Parsing the Zenodo "Plants database" HTML export, before and after the
+streaming reader in merge_zenodo_data.py, on the real export with its rows
+repeated ``--copies`` times (names made unique):
+
+- soup:     BeautifulSoup DOM of the whole file, get_text on every cell.
+- stream:   HTMLParser event callbacks fed in blocks, rows written to the
+            JSONL sidecar as they complete (``parse_to_cache``).
+- cached:   ``load_zenodo`` on an unchanged export: hash, read the sidecar.
+
+Peak memory is traced with tracemalloc (Python allocations only). All three
+must return the same records.
+
+Run:
+    python benchmarks/bench_zenodo_parse.py --copies 40
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merge_zenodo_data import ZENODO_HTML, load_zenodo, parse_to_cache, read_cached  # noqa: E402
+
+
+def soup_parse(path):
+    """The parser merge_zenodo_data.py used before streaming."""
+    with open(path, "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    rows = soup.find("table").find_all("tr")
+    field_names = [c.get_text(strip=True) for c in rows[1].find_all("td")]
+    plants = []
+    for row in rows[2:]:
+        cells = [c.get_text(strip=True) for c in row.find_all("td")]
+        record = {fname: val for fname, val in zip(field_names, cells) if fname}
+        if record.get("name"):
+            plants.append(record)
+    return field_names, plants
+
+
+def make_export(path, copies):
+    """The real export with its plant rows repeated *copies* times."""
+    with open(ZENODO_HTML, encoding="utf-8") as f:
+        html = f.read()
+    body_start = html.index("<tbody>") + len("<tbody>")
+    body_end = html.index("</tbody>")
+    rows = re.findall(r"<tr.*?</tr>", html[body_start:body_end], flags=re.S)
+    header, plants = rows[0], rows[1:]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html[:body_start] + header)
+        for copy in range(copies):
+            for row in plants:
+                # The first <td> is the plant name: keep it unique per copy
+                f.write(re.sub(r'(<td[^>]*>)([^<]+)', lambda m: f"{m[1]}{m[2]} c{copy}", row, count=1)
+                        if copy else row)
+        f.write(html[body_end:])
+
+
+def measure(label, run, *args, reset=None):
+    """Time *run*, then run it again under tracemalloc for its peak memory
+    (tracing slows it down too much to time it in the same run)."""
+    if reset:
+        reset()
+    started = time.time()
+    result = run(*args)
+    elapsed = time.time() - started
+    if reset:
+        reset()
+    tracemalloc.start()
+    run(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<8} {elapsed:7.2f}s   peak {peak / 1_048_576:7.1f} MB")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--copies", type=int, default=40)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        html = os.path.join(tmp, "export.html")
+        sidecar = os.path.join(tmp, "zenodo_plants.jsonl")
+        make_export(html, args.copies)
+        print(f"{os.path.getsize(html) / 1_048_576:.1f} MB export\n")
+
+        old, soup_time = measure("soup", soup_parse, html)
+        _, stream_time = measure("stream", parse_to_cache, html, sidecar,
+                                 reset=lambda: os.path.exists(sidecar) and os.remove(sidecar))
+        cached, cached_time = measure("cached", load_zenodo, html, sidecar)
+        same = old == read_cached(sidecar) == cached
+        print(f"\n{len(old[1])} plants; stream {soup_time / stream_time:.1f}x faster than soup, "
+              f"cached load {soup_time / cached_time:.0f}x; same records: {same}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
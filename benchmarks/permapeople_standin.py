@@ -0,0 +1,141 @@
+"""
+permapeople_standin.py
+----------------------
+Local stand-in for the Permapeople plants API, so the sync can be driven
+(and timed) without credentials or touching the real service.
+
+Serves:
+    /api/plants[?last_id=N]   the next PAGE_SIZE plants with id > N, by id
+
+Ids are unevenly spread (dense at the start, sparse gaps later), like a
+long-lived database. With ``rate_limit`` set, requests beyond that many per
+second get a 429 with ``Retry-After``.
+
+Run on its own:
+    python benchmarks/permapeople_standin.py --port 8766 --plants 9000 --rate-limit 20
+"""
+
+import argparse
+import bisect
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGE_SIZE = 100
+
+LAYERS = ["Canopy", "Low tree", "Shrubs", "Herbaceous", "Ground cover", "Climbers"]
+WATER = ["Dry", "Moist", "Wet"]
+
+
+def make_ids(n):
+    """*n* increasing ids: contiguous for the first third, then widening gaps."""
+    ids, current = [], 0
+    for i in range(n):
+        current += 1 if i < n // 3 else 1 + zlib.crc32(str(i).encode()) % (2 + 8 * i // n)
+        ids.append(current)
+    return ids
+
+
+def make_plant(plant_id, version=0):
+    h = zlib.crc32(f"{plant_id}".encode())
+    low = h % 5 + 1
+    return {
+        "id": plant_id,
+        "type": "Plant",
+        "name": f"Stand-in plant {plant_id}",
+        "scientific_name": f"Standinus {['alba', 'rubra', 'edulis', 'major'][h % 4]}{plant_id}",
+        "slug": f"standinus-{plant_id}",
+        "updated_at": f"2024-01-{1 + version % 28:02d}T00:00:00.000Z",
+        "data": [
+            {"key": "Layer", "value": LAYERS[h % len(LAYERS)]},
+            {"key": "Water requirement", "value": WATER[(h >> 3) % len(WATER)]},
+            {"key": "Height", "value": f"{low}-{low + (h >> 5) % 4 + 1}"},
+            {"key": "Soil pH", "value": f"{5 + (h >> 7) % 2}-{7 + (h >> 9) % 2}"},
+            {"key": "Edible", "value": "true" if h % 3 else "false"},
+        ][:3 + (h >> 11) % 3],
+    }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ids = []
+    plants = {}
+    latency = 0.0
+    rate_limit = 0
+    hits = None
+    window = None   # [second, count]
+    lock = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.hits["requests"] += 1
+            second = int(time.monotonic())
+            if self.window[0] != second:
+                self.window[:] = [second, 0]
+            self.window[1] += 1
+            limited = self.rate_limit and self.window[1] > self.rate_limit
+            if limited:
+                self.hits["throttled"] += 1
+        if limited:
+            self._send(429, {"error": "Too many requests"}, {"Retry-After": "1"})
+            return
+        if url.path != "/api/plants":
+            self._send(404, {"error": "not found"})
+            return
+        last_id = int(parse_qs(url.query).get("last_id", ["0"])[0] or 0)
+        start = bisect.bisect_right(self.ids, last_id)
+        page = [self.plants[i] for i in self.ids[start:start + PAGE_SIZE]]
+        self._send(200, {"plants": page})
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(plants=9000, latency=0.0, rate_limit=0, port=0):
+    """Start the stand-in in a background thread. Returns ``(server, api_url)``.
+    ``server.RequestHandlerClass.plants`` can be edited to simulate updates."""
+    ids = make_ids(plants)
+    handler = type("Handler", (StandinHandler,), {
+        "ids": ids,
+        "plants": {i: make_plant(i) for i in ids},
+        "latency": latency,
+        "rate_limit": rate_limit,
+        "hits": {"requests": 0, "throttled": 0},
+        "window": [0, 0],
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/plants"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Permapeople API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--plants", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument("--rate-limit", type=int, default=20, help="Requests per second before 429s (0 = none)")
+    args = parser.parse_args()
+    server, url = serve(args.plants, args.latency, args.rate_limit, args.port)
+    print(f"Stand-in Permapeople API at {url}  (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
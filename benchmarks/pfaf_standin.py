@@ -0,0 +1,188 @@
+"""
+pfaf_standin.py
+---------------
+Local stand-in for the pfaf.org listing and species pages, so the scraper can
+be driven (and timed) without touching the real site.
+
+Serves:
+    /user/DatabaseSearhResult.aspx?LatinName=<prefix>[&page=N]
+    /user/Plant.aspx?LatinName=<Genus>+<species>
+
+Run on its own:
+    python benchmarks/pfaf_standin.py --port 8765 --per-letter 200 --latency 0.05
+then point the scraper at it:
+    PFAF_BASE_URL=http://127.0.0.1:8765/user/ python pfaf_generator.py
+"""
+
+import argparse
+import html
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGE_SIZE = 20
+
+GENUS_STEMS = ["cer", "llium", "rtemisia", "uxus", "ornus", "alium", "ex", "ris", "ilium", "entha"]
+EPITHETS = ["alba", "rubra", "officinalis", "vulgaris", "montana", "sylvestris", "edulis", "major"]
+TYPES = ["deciduous Tree", "evergreen Shrub", "perennial", "annual", "bulb", "deciduous Climber"]
+RATES = ["slow", "medium", "fast"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+POLLINATORS = ["Bees", "Flies", "Moths", "Insects", "Wind", "Butterflies"]
+
+
+def catalog(per_letter=200, skew=None):
+    """Deterministic, sorted ``{letter: [latin names]}``. *skew* maps letters to a
+    multiplier of *per_letter* so uneven letter sizes can be simulated."""
+    skew = skew or {}
+    plants = {}
+    for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        n = int(per_letter * skew.get(letter, 1))
+        plants[letter] = sorted((
+            f"{letter}{GENUS_STEMS[i % len(GENUS_STEMS)]} {EPITHETS[(i // len(GENUS_STEMS)) % len(EPITHETS)]}{i}"
+            for i in range(n)
+        ), key=str.lower)   # listings are alphabetical, like the real site
+    return plants
+
+
+def description_for(latin_name):
+    """A PFAF-shaped ``meta#description`` sentence block for *latin_name*."""
+    h = zlib.crc32(latin_name.encode())
+    plant_type = TYPES[h % len(TYPES)]
+    height = 0.5 + (h >> 3) % 30
+    width = 0.5 + (h >> 7) % 15
+    leaf = (h >> 11) % 4 + 1
+    flower = (h >> 13) % 6 + 2
+    ripen = min(flower + 2 + (h >> 17) % 3, 11)
+    pollinators = ", ".join(POLLINATORS[(h >> i) % len(POLLINATORS)] for i in (19, 23))
+    return (
+        f"{latin_name} is a {plant_type} growing to {height:g} m ({int(height * 3.28)}ft) "
+        f"by {width:g} m ({int(width * 3.28)}ft) at a {RATES[h % 3]} rate. "
+        f"It is hardy to zone (UK) {h % 9 + 2}. "
+        f"It is in leaf from {MONTHS[leaf]} to {MONTHS[10]}, in flower from {MONTHS[flower]} to {MONTHS[flower + 1]}, "
+        f"and the seeds ripen from {MONTHS[ripen - 1]} to {MONTHS[ripen]}. "
+        f"The species is hermaphrodite (has both male and female organs) and is pollinated by {pollinators}. "
+        f"Suitable for: light (sandy), medium (loamy) and heavy (clay) soils and prefers well-drained soil. "
+        f"Suitable pH: acid, neutral and basic (mildly alkaline) soils. "
+        f"It can grow in semi-shade (light woodland) or no shade. It prefers moist soil. "
+        f"The plant can tolerate strong winds but not maritime exposure."
+    )
+
+
+def plant_page(latin_name):
+    h = zlib.crc32(latin_name.encode())
+    zone_min = h % 6 + 3
+    desc = html.escape(description_for(latin_name), quote=True)
+    img = f"../Admin/PlantImages/{latin_name.replace(' ', '')}.jpg"
+    return f"""<!DOCTYPE html>
+<html><head><title>{html.escape(latin_name)} - Plants For A Future</title>
+<meta name="description" id="description" content="{desc}" /></head>
+<body><form>
+<table class="table table-hover table-striped"><tbody>
+<tr><td>Common Name</td><td><span id="ContentPlaceHolder1_lblCommanName">Stand-in {html.escape(latin_name)}</span></td></tr>
+<tr><td>Family</td><td><span id="ContentPlaceHolder1_lblFamily">Standinaceae</span></td></tr>
+<tr><td>USDA hardiness</td><td><span id="ContentPlaceHolder1_lblUSDAhardiness">{zone_min}-{zone_min + 4}</span></td></tr>
+<tr><td>Known Hazards</td><td><span id="ContentPlaceHolder1_lblKnownHazards">None known</span></td></tr>
+<tr><td>Habitats</td><td><span id="ContentPlaceHolder1_txtHabitats">Woodland edges and hedgerows[17, 200].</span></td></tr>
+<tr><td>Range</td><td><span id="ContentPlaceHolder1_lblRange">Europe to W. Asia.</span></td></tr>
+<tr><td>Edibility Rating</td><td><span id="ContentPlaceHolder1_txtEdrating"> ({h % 6} of 5)</span></td></tr>
+<tr><td>Other Uses</td><td><span id="ContentPlaceHolder1_txtOtherUseRating"> ({(h >> 4) % 6} of 5)</span></td></tr>
+<tr><td>Medicinal Rating</td><td><span id="ContentPlaceHolder1_txtMedRating"> ({(h >> 8) % 6} of 5)</span></td></tr>
+</tbody></table>
+<table id="ContentPlaceHolder1_tblPlantImges"><tr><td><img src="{img}" /></td></tr></table>
+<div>{"Lorem ipsum dolor sit amet. " * 120}</div>
+</form></body></html>"""
+
+
+def listing_page(prefix, names, page):
+    start = page * PAGE_SIZE
+    rows = "".join(
+        f"<tr><td><a href=\"Plant.aspx?LatinName={n.replace(' ', '+')}\">{html.escape(n)}</a></td>"
+        f"<td>Stand-in {html.escape(n)}</td></tr>"
+        for n in names[start:start + PAGE_SIZE]
+    )
+    next_link = ""
+    if start + PAGE_SIZE < len(names):
+        next_link = (f'<a id="ContentPlaceHolder1_gvresults_ctl23_LinkButtonNext" '
+                     f'href="DatabaseSearhResult.aspx?LatinName={prefix}&amp;page={page + 1}">Next</a>')
+    return f"""<!DOCTYPE html><html><body>
+<table id="ContentPlaceHolder1_gvresults"><tr><th>Latin Name</th><th>Common Name</th></tr>{rows}</table>
+{next_link}</body></html>"""
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real site
+    plants = {}
+    latency = 0.0
+    hits = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if self.latency:
+            time.sleep(self.latency)
+        self.hits[url.path] = self.hits.get(url.path, 0) + 1
+
+        prefix = query.get("LatinName", [""])[0]
+        if url.path.endswith("/DatabaseSearhResult.aspx"):
+            names = [n for n in self.plants.get(prefix[:1].upper(), [])
+                     if n.lower().startswith(prefix.lower())]
+            body = listing_page(prefix, names, int(query.get("page", ["0"])[0]))
+        elif url.path.endswith("/Plant.aspx"):
+            if prefix not in self.all_names:
+                self._send(404, b"not found")
+                return
+            body = plant_page(prefix)
+        else:
+            self._send(404, b"not found")
+            return
+        payload = body.encode("utf-8")
+        etag = f'"{zlib.crc32(payload):08x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", etag)
+        else:
+            self._send(200, payload, etag)
+
+    def _send(self, status, payload, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(per_letter=200, latency=0.0, port=0, skew=None):
+    """Start the stand-in in a background thread. Returns ``(server, base_url)``;
+    call ``server.shutdown()`` when done."""
+    plants = catalog(per_letter, skew)
+    handler = type("Handler", (StandinHandler,), {
+        "plants": plants,
+        "all_names": {n for names in plants.values() for n in names},
+        "latency": latency,
+        "hits": {},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/user/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for pfaf.org")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--per-letter", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    args = parser.parse_args()
+    server, base = serve(args.per_letter, args.latency, args.port)
+    print(f"Stand-in PFAF serving at {base}  (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,115 @@
+"""
+wcvp_standin.py
+---------------
+Synthetic WCVP download (``wcvp_names.csv`` and ``wcvp_distribution.csv``,
+pipe-delimited, same columns as the Kew release), so the WCVP stages can be
+timed without the ~1.4M-row files.
+
+About a third of the species names are synonyms pointing at an accepted
+species, a few are accepted varieties, and accepted species get a handful
+of distribution rows, some introduced or extinct.
+
+Run on its own:
+    python benchmarks/wcvp_standin.py --names 1400000 --output /tmp/wcvp
+"""
+
+import argparse
+import os
+import random
+
+NAMES_HEADER = [
+    "plant_name_id", "ipni_id", "taxon_rank", "taxon_status", "family", "genus_hybrid", "genus",
+    "species_hybrid", "species", "infraspecific_rank", "infraspecies", "parenthetical_author",
+    "primary_author", "publication_author", "place_of_publication", "volume_and_page",
+    "first_published", "nomenclatural_remarks", "geographic_area", "lifeform_description",
+    "climate_description", "taxon_name", "taxon_authors", "accepted_plant_name_id",
+    "basionym_plant_name_id", "replaced_synonym_author", "homotypic_synonym",
+    "parent_plant_name_id", "powo_id", "hybrid_formula", "reviewed",
+]
+DIST_HEADER = [
+    "plant_locality_id", "plant_name_id", "continent_code_l1", "continent", "region_code_l2",
+    "region", "area_code_l3", "area", "introduced", "extinct", "location_doubtful",
+]
+FAMILIES = ["Rosaceae", "Lamiaceae", "Fabaceae", "Asteraceae", "Apiaceae", "Poaceae", "Liliaceae"]
+LIFEFORMS = ["tree", "shrub", "perennial", "annual", "climber", "bulbous geophyte"]
+CLIMATES = ["temperate", "subtropical", "tropical", "desert or dry shrubland"]
+AREAS = ["France", "Spain", "Italy", "China", "Japan", "India", "Brazil", "Peru", "Kenya", "Texas",
+         "Mexico", "Chile", "Turkey", "Iran", "Kazakhstan", "New Zealand", "Tasmania", "Morocco"]
+
+
+SYLLABLES = ["ca", "ro", "mi", "tu", "le", "pha", "no", "vi", "sa", "de",
+             "lo", "ri", "bu", "gra", "fi", "me", "cy", "ne", "po", "thy"]
+GENUS_ENDINGS = ["a", "us", "um", "ia", "is"]
+EPITHET_ENDINGS = ["us", "a", "um", "is", "ensis", "oides", "iana", "ata"]
+
+
+def _word(n, syllables):
+    parts = []
+    for _ in range(syllables):
+        n, i = divmod(n, len(SYLLABLES))
+        parts.append(SYLLABLES[i])
+    return "".join(parts)
+
+
+def species_key(i):
+    """Pseudo-Latin genus (4,000 of them) and epithet, unique for every *i*."""
+    g, j = i % 4000, i // 4000
+    genus = (_word(g, 3) + GENUS_ENDINGS[g % len(GENUS_ENDINGS)]).capitalize()
+    epithet = _word((j * 7919 + g * 31) % 8000, 3) + EPITHET_ENDINGS[j % len(EPITHET_ENDINGS)]
+    return genus, epithet
+
+
+def write_wcvp(directory, names=300_000, seed=11):
+    """Write both files into *directory*. Returns ``(names_path, dist_path,
+    keys)``, where *keys* maps some normalised names to ``"accepted"`` or
+    ``"synonym"`` for use as lookup probes."""
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    names_path = os.path.join(directory, "wcvp_names.csv")
+    dist_path = os.path.join(directory, "wcvp_distribution.csv")
+    accepted, keys = [], {}
+    locality = 0
+    with open(names_path, "w", encoding="utf-8", newline="") as names_f, \
+            open(dist_path, "w", encoding="utf-8", newline="") as dist_f:
+        names_f.write("|".join(NAMES_HEADER) + "\n")
+        dist_f.write("|".join(DIST_HEADER) + "\n")
+        for i in range(names):
+            genus, species = species_key(i)
+            row = dict.fromkeys(NAMES_HEADER, "")
+            row.update(plant_name_id=str(i + 1), family=rnd.choice(FAMILIES), genus=genus, species=species,
+                       taxon_rank="Species", taxon_name=f"{genus} {species}", powo_id=f"{100000 + i}-1",
+                       taxon_authors=f"Auth{i % 97}.", first_published=f"({1753 + i % 260})")
+            roll = rnd.random()
+            if accepted and roll < 0.33:
+                row.update(taxon_status="Synonym", accepted_plant_name_id=rnd.choice(accepted))
+                keys.setdefault(f"{genus} {species}".lower(), "synonym")
+            elif roll < 0.36:
+                row.update(taxon_status=rnd.choice(["Illegitimate", "Unplaced", "Misapplied"]))
+            else:
+                if roll < 0.38:
+                    row.update(taxon_rank="Variety", infraspecific_rank="var.", infraspecies=f"v{i}",
+                               taxon_name=f"{genus} {species} var. v{i}")
+                row.update(taxon_status="Accepted", accepted_plant_name_id=str(i + 1),
+                           lifeform_description=rnd.choice(LIFEFORMS), climate_description=rnd.choice(CLIMATES),
+                           geographic_area=rnd.choice(AREAS))
+                accepted.append(str(i + 1))
+                if row["taxon_rank"] == "Species":
+                    keys.setdefault(f"{genus} {species}".lower(), "accepted")
+                for area in rnd.sample(AREAS, rnd.randrange(1, 6)):
+                    locality += 1
+                    dist = dict.fromkeys(DIST_HEADER, "")
+                    dist.update(plant_locality_id=str(locality), plant_name_id=str(i + 1), area=area,
+                                introduced="1" if rnd.random() < 0.2 else "0",
+                                extinct="1" if rnd.random() < 0.02 else "0", location_doubtful="0")
+                    dist_f.write("|".join(dist[c] for c in DIST_HEADER) + "\n")
+            names_f.write("|".join(row[c] for c in NAMES_HEADER) + "\n")
+    return names_path, dist_path, keys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic WCVP download")
+    parser.add_argument("--names", type=int, default=300_000)
+    parser.add_argument("--output", default="wcvp_standin")
+    args = parser.parse_args()
+    names_path, dist_path, _ = write_wcvp(args.output, args.names)
+    print(f"Wrote {names_path} and {dist_path}")
@@ -0,0 +1,317 @@
+"""
+build_plant_data.py
+-------------------
+Builds the combined dataset, docs/plant_data.csv and the name translations
+in one run, instead of running the merge scripts by hand in the right order.
+
+    permapeople ── merge ───┬─ zenodo ──┬─ export, publish
+    zenodo_parse ───────────┤           └─ translate
+    wcvp_index ─────────────┼─ kew ─────── export, publish
+                            └─ typed ───── export, publish
+
+zenodo and kew both start from merge's rows and the Zenodo parse, and
+write their columns as separate patches (kew's keyed by row key, see
+plant_dataset.py), so the two enrichers run side by side. typed parses
+merge's text columns into numbers and bitmasks (normalise_plant_data.py),
+also as a patch beside them. publish writes the site's per-page column
+artifacts, the plant detail shards and their manifest (publish_plant_data.py).
+
+Every stage declares the code it runs, the files it reads, the dataset
+columns it reads (plant_dataset.py) and what it produces. Its fingerprint
+is a hash of all of those inputs, and a stage is skipped when the
+fingerprint matches its last successful run and its outputs are still what
+that run left behind. File hashes are reused while a file's size and mtime
+are unchanged. State lives in ``.cache/build_state.json``.
+
+Stages whose dependencies are finished run concurrently in a process pool,
+so the Permapeople sync, the Zenodo parse and the WCVP index build overlap. The
+Permapeople sync always runs (its input is the API; the mirror makes it
+cheap). A stage none of whose input files exist (e.g. no WCVP download) is
+skipped with a warning, and the stages after it still run.
+A timing summary is printed at the end.
+
+Usage:
+    python build_plant_data.py                    # build whatever changed
+    python build_plant_data.py --force kew        # re-run a stage even if unchanged
+    python build_plant_data.py --skip translate   # leave a stage out this time
+    python build_plant_data.py --dry-run          # show what would run
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import time
+
+import merge_plant_data
+import merge_wcvp_data
+import merge_zenodo_data
+import normalise_plant_data
+import publish_plant_data
+import translate_plant_names
+import wcvp_index
+from plant_dataset import DATASET_DB, EXPORT_CSV, PlantDataset
+
+SCRIPT_DIR  = os.path.dirname(os.path.abspath(__file__))
+BUILD_STATE = os.path.join(SCRIPT_DIR, ".cache", "build_state.json")
+
+ALL = None   # ``reads``: every column of the dataset
+
+NAME_COLUMNS = ["Genus", "Species"]
+
+
+class Stage:
+    def __init__(self, name, run, deps=(), code=(), inputs=(), reads=(), outputs=(), writes=None,
+                 volatile=False, extra_inputs=(), reads_stage=None):
+        self.name = name
+        self.run = run            # module-level callable, so it can run in a worker process
+        self.deps = deps          # stages that must finish first
+        self.code = code          # modules whose source is part of the fingerprint
+        self.inputs = inputs      # files read
+        self.extra_inputs = extra_inputs  # files read when present (the stage runs without them)
+        self.reads = reads        # dataset columns read (ALL for every column)
+        self.reads_stage = reads_stage    # read only that dataset stage's rows (None: all but its own)
+        self.outputs = outputs    # files written
+        self.writes = writes      # dataset stage written
+        self.volatile = volatile  # reads something that cannot be hashed (an API)
+
+
+def _module(module):
+    return os.path.join(SCRIPT_DIR, os.path.basename(module.__file__))
+
+
+def _run_export():
+    with PlantDataset() as dataset:
+        dataset.export_csv(EXPORT_CSV)
+
+
+def _run_wcvp_index():
+    wcvp_index.open_index().close()
+
+
+def _run_translate():
+    translate_plant_names.run()
+
+
+def _run_publish():
+    with PlantDataset() as dataset:
+        publish_plant_data.publish(dataset)
+
+
+MERGE_CODE = _module(merge_plant_data)
+DATASET_CODE = os.path.join(SCRIPT_DIR, "plant_dataset.py")
+NAMES_CODE = os.path.join(SCRIPT_DIR, "plant_names.py")
+TABLE_CODE = os.path.join(SCRIPT_DIR, "plant_table.py")
+
+STAGES = [
+    Stage("permapeople", merge_plant_data.fetch_permapeople, volatile=True,
+          code=[MERGE_CODE, os.path.join(SCRIPT_DIR, "permapeople_store.py"),
+                os.path.join(SCRIPT_DIR, "permapeople_sync.py")],
+          outputs=[merge_plant_data.PP_CSV]),
+    Stage("zenodo_parse", merge_zenodo_data.parse_to_cache,
+          code=[_module(merge_zenodo_data)], inputs=[merge_zenodo_data.ZENODO_HTML],
+          outputs=[merge_zenodo_data.ZENODO_PARSED]),
+    Stage("wcvp_index", _run_wcvp_index,
+          code=[_module(wcvp_index), os.path.join(SCRIPT_DIR, "wcvp_scan.py")], inputs=[wcvp_index.WCVP_NAMES, wcvp_index.WCVP_DIST],
+          outputs=[wcvp_index.WCVP_INDEX]),
+    # docs/plant_data.csv is both where the PFAF scrape lands and the export,
+    # so merge re-runs once after an export; its output is unchanged, so the
+    # stages after it stay cached.
+    Stage("merge", merge_plant_data.build_base, deps=["permapeople"],
+          code=[MERGE_CODE, DATASET_CODE, NAMES_CODE, TABLE_CODE, os.path.join(SCRIPT_DIR, "sort_join.py")],
+          inputs=[merge_plant_data.PFAF_CSV, merge_plant_data.PP_CSV],
+          writes="merge"),
+    Stage("zenodo", merge_zenodo_data.merge_cached, deps=["merge", "zenodo_parse"],
+          code=[_module(merge_zenodo_data), DATASET_CODE, NAMES_CODE, TABLE_CODE], inputs=[merge_zenodo_data.ZENODO_PARSED],
+          reads=NAME_COLUMNS, writes=merge_zenodo_data.STAGE),
+    Stage("kew", merge_wcvp_data.enrich_from_index, deps=["merge", "zenodo_parse", "wcvp_index"],
+          code=[_module(merge_wcvp_data), _module(wcvp_index), _module(merge_zenodo_data), DATASET_CODE,
+                NAMES_CODE, TABLE_CODE],
+          inputs=[wcvp_index.WCVP_INDEX], extra_inputs=[merge_zenodo_data.ZENODO_PARSED],
+          reads=NAME_COLUMNS, reads_stage=merge_wcvp_data.BASE_STAGE, writes=merge_wcvp_data.STAGE),
+    Stage("typed", normalise_plant_data.normalise_store, deps=["merge"],
+          code=[_module(normalise_plant_data), DATASET_CODE],
+          reads=normalise_plant_data.SOURCE_COLUMNS, reads_stage=normalise_plant_data.BASE_STAGE,
+          writes=normalise_plant_data.STAGE),
+    Stage("export", _run_export, deps=["zenodo", "kew", "typed"],
+          code=[DATASET_CODE], reads=ALL, outputs=[EXPORT_CSV]),
+    Stage("publish", _run_publish, deps=["zenodo", "kew", "typed"],
+          code=[_module(publish_plant_data), _module(normalise_plant_data), DATASET_CODE, TABLE_CODE],
+          inputs=publish_plant_data.PAGES, reads=ALL, outputs=[publish_plant_data.MANIFEST]),
+    Stage("translate", _run_translate, deps=["zenodo"],
+          code=[_module(translate_plant_names)], reads=translate_plant_names.NAME_COLUMNS,
+          outputs=[os.fspath(translate_plant_names.OUTPUT_PATH)]),
+]
+
+
+class BuildState:
+    """Fingerprints of the last successful runs, plus cached file hashes."""
+
+    def __init__(self, path=BUILD_STATE):
+        self.path = path
+        self.data = {"stages": {}, "files": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def file_hash(self, path):
+        """SHA-1 of *path*, or ``None`` when it does not exist."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self.data["files"].get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.data["files"][path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def fingerprint(stage, state):
+    """Hash of everything *stage* reads (a missing file hashes as absent)."""
+    h = hashlib.sha1(stage.name.encode("utf-8"))
+    for path in list(stage.code) + list(stage.inputs) + list(stage.extra_inputs):
+        digest = state.file_hash(path)
+        h.update(f"{os.path.relpath(path, SCRIPT_DIR)}={digest}\n".encode("utf-8"))
+    if stage.reads is ALL or stage.reads:
+        with PlantDataset(DATASET_DB) as dataset:
+            if stage.reads_stage:
+                digest = dataset.digest(stage=stage.reads_stage, columns=stage.reads)
+            else:
+                digest = dataset.digest(columns=stage.reads, exclude_stage=stage.writes)
+            h.update(digest.encode("utf-8"))
+    return h.hexdigest()
+
+
+def output_digest(stage, state):
+    h = hashlib.sha1()
+    for path in stage.outputs:
+        h.update(f"{path}={state.file_hash(path)}\n".encode("utf-8"))
+    if stage.writes:
+        with PlantDataset(DATASET_DB) as dataset:
+            h.update(dataset.digest(stage=stage.writes).encode("utf-8"))
+    return h.hexdigest()
+
+
+def build(stages=STAGES, force=(), skip=(), workers=4, dry_run=False, state_path=BUILD_STATE):
+    """Run every stage that is out of date. Returns ``{stage: (status, seconds)}``."""
+    state = BuildState(state_path)
+    by_name = {s.name: s for s in stages}
+    unknown = (set(force) | set(skip)) - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    pending = [s.name for s in stages]
+    running = {}
+    started = time.time()
+    pool = concurrent.futures.ProcessPoolExecutor(workers) if not dry_run else None
+    if not dry_run:
+        # Concurrent stages may write in any order; rank them as listed
+        with PlantDataset(DATASET_DB) as dataset:
+            dataset.order_stages([s.writes for s in stages if s.writes])
+    try:
+        while pending or running:
+            for name in list(pending):
+                stage = by_name[name]
+                if any(d in pending or d in running for d in stage.deps):
+                    continue
+                pending.remove(name)
+                if any(results[d][0] in ("failed", "blocked") for d in stage.deps):
+                    results[name] = ("blocked", 0.0)
+                    continue
+                if name in skip:
+                    results[name] = ("skipped", 0.0)
+                    continue
+                if dry_run and any(results[d][0] == "would run" for d in stage.deps):
+                    results[name] = ("would run", 0.0)
+                    continue
+                if stage.inputs and all(state.file_hash(p) is None for p in stage.inputs):
+                    print(f"[build] {name}: no {', '.join(os.path.relpath(p, SCRIPT_DIR) for p in stage.inputs)}"
+                          f" – skipped")
+                    results[name] = ("no inputs", 0.0)
+                    continue
+                key = fingerprint(stage, state)
+                last = state.data["stages"].get(name, {})
+                fresh = (not stage.volatile and name not in force and last.get("fingerprint") == key
+                         and last.get("outputs") == output_digest(stage, state))
+                if fresh:
+                    results[name] = ("cached", 0.0)
+                elif dry_run:
+                    results[name] = ("would run", 0.0)
+                else:
+                    print(f"[build] ▶ {name}")
+                    running[name] = (pool.submit(_timed, stage.run), key)
+            if not running:
+                continue
+
+            done, _ = concurrent.futures.wait([f for f, _ in running.values()],
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for name in [n for n, (f, _) in running.items() if f in done]:
+                future, key = running.pop(name)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    print(f"[build] ✗ {name} failed: {e}")
+                    results[name] = ("failed", 0.0)
+                    continue
+                state.data["stages"][name] = {"fingerprint": key, "outputs": output_digest(by_name[name], state),
+                                              "seconds": round(seconds, 2), "finished_at": time.time()}
+                state.save()
+                results[name] = ("ran", seconds)
+                print(f"[build] ✓ {name} ({seconds:.1f}s)")
+    finally:
+        if pool:
+            pool.shutdown()
+    if not dry_run:
+        state.save()
+    results = {s.name: results[s.name] for s in stages}
+    log_summary(results, time.time() - started)
+    return results
+
+
+def _timed(run):
+    started = time.time()
+    run()
+    return time.time() - started
+
+
+def log_summary(results, elapsed):
+    print(f"\n{'stage':<14} {'status':<10} {'seconds':>8}")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<14} {status:<10} {seconds:8.1f}")
+    busy = sum(seconds for _, seconds in results.values())
+    print(f"{'total':<14} {'':<10} {elapsed:8.1f}   ({busy:.1f}s of stage time)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the combined plant dataset, skipping unchanged stages")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                        help="Re-run STAGE even if its inputs are unchanged (repeatable)")
+    parser.add_argument("--skip", action="append", default=[], metavar="STAGE",
+                        help="Leave STAGE out of this build (repeatable)")
+    parser.add_argument("--workers", type=int, default=4, help="Stages run at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    args = parser.parse_args(argv)
+    try:
+        results = build(force=args.force, skip=args.skip, workers=args.workers, dry_run=args.dry_run)
+    except ValueError as e:
+        parser.error(str(e))
+    if any(status in ("failed", "blocked") for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
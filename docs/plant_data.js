@@ -0,0 +1,254 @@
+// ─────────────────────────────────────────────
+// PLANTalytics plant data loader
+// Loads the page's column artifact (publish_plant_data.py) through
+// data/manifest.json; falls back to plant_data.csv via PapaParse.
+// Detail columns come from shards, fetched when a plant is opened.
+// CSV rows missing a typed column get it parsed from their text columns,
+// the way normalise_plant_data.py does at build time.
+// ─────────────────────────────────────────────
+
+const PLANT_DATA_MANIFEST = 'data/manifest.json';
+const PLANT_DATA_CSV      = 'plant_data.csv';
+const PLANT_ROW           = Symbol('plantRow');   // a row's position in the published dataset
+
+let plantDetail = null;               // manifest.detail, once loaded
+const plantDetailShards = new Map();  // shard index → Promise of its decoded rows
+
+// ── typed columns (normalise_plant_data.py) ──
+const PLANT_TYPED_COLUMNS = ['zone_min', 'zone_max', 'height_m', 'width_m', 'ph_min', 'ph_max',
+                             'bloom_months', 'ripen_months', 'soil_bits', 'pollinator_bits'];
+const PLANT_MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                      'August', 'September', 'October', 'November', 'December'];
+const PLANT_SOILS = ['light', 'medium', 'heavy'];
+const PLANT_SOIL_WORDS = { light: 'light', sandy: 'light', sand: 'light', medium: 'medium', loamy: 'medium',
+                           loam: 'medium', heavy: 'heavy', clay: 'heavy' };
+const PLANT_POLLINATORS = ['Bees', 'Flies', 'Insects', 'Wind', 'Self', 'Lepidoptera', 'Beetles',
+                           'Moths', 'Butterflies', 'Apomictic', 'Cleistogamous', 'Birds', 'Bats',
+                           'Wasps', 'Midges', 'Hoverflies', 'Bumblebees', 'Water', 'Slugs', 'Snails',
+                           'Thrips', 'Sawflies', 'Ants'].map(name => name.toLowerCase());
+const PLANT_PH_BANDS = { 'very acid': [4.5, 5.5], 'acid': [5.5, 6.5], 'neutral': [6.5, 7.5], 'basic': [7.5, 8.5],
+                         'alkaline': [7.5, 8.5], 'very alkaline': [8.5, 9.5] };
+const PLANT_UNITS = { cm: 0.01, mm: 0.001, ft: 0.3048, feet: 0.3048, in: 0.0254, inches: 0.0254 };
+
+function plantDataText(value) {
+  return value == null ? '' : String(value);
+}
+
+function plantDataZones(text) {
+  text = plantDataText(text).trim();
+  let m = text.match(/(\d+)\s*(?:to|-|–)\s*(\d+)/);
+  if (m) {
+    const a = parseInt(m[1]), b = parseInt(m[2]);
+    return [Math.min(a, b), Math.max(a, b)];
+  }
+  m = text.match(/^(\d+)$/);
+  return m ? [parseInt(m[1]), parseInt(m[1])] : null;
+}
+
+function plantDataMetres(text) {
+  text = plantDataText(text).trim().toLowerCase();
+  const numbers = (text.match(/\d+(?:\.\d+)?/g) || []).map(parseFloat);
+  if (!numbers.length) return null;
+  const first = text.match(/\d+(?:\.\d+)?/);
+  const unit = text.slice(first.index + first[0].length).match(/[a-z]+/);
+  return Math.round(Math.max(...numbers) * (PLANT_UNITS[unit ? unit[0] : ''] || 1) * 100) / 100;
+}
+
+function plantDataPhRange(ph, phSplit) {
+  const numbers = (plantDataText(ph).match(/\d+(?:\.\d+)?/g) || []).map(parseFloat).filter(n => n >= 0 && n <= 14);
+  if (numbers.length) return [Math.min(...numbers), Math.max(...numbers)];
+  const classes = (plantDataText(ph) + ' ' + plantDataText(phSplit)).toLowerCase()
+    .match(/very acid|very alkaline|acid|neutral|basic|alkaline/g) || [];
+  if (!classes.length) return null;
+  const bands = classes.map(name => PLANT_PH_BANDS[name]);
+  return [Math.min(...bands.map(b => b[0])), Math.max(...bands.map(b => b[1]))];
+}
+
+function plantDataMonth(word) {
+  const i = PLANT_MONTHS.indexOf(word);
+  if (i >= 0) return i;
+  const prefix = word.slice(0, 3).toLowerCase();
+  return PLANT_MONTHS.findIndex(name => name.toLowerCase().startsWith(prefix));
+}
+
+function plantDataMonthMask(text) {
+  text = plantDataText(text);
+  if (!text) return 0;
+  const m = text.match(/([A-Za-z]+)\s+to\s+([A-Za-z]+)/i);
+  let mask = 0;
+  if (m) {
+    const start = plantDataMonth(m[1]), end = plantDataMonth(m[2]);
+    if (start < 0 || end < 0) return 0;
+    for (let i = start; ; i = (i + 1) % 12) {
+      mask |= 1 << i;
+      if (i === end) break;
+    }
+    return mask;
+  }
+  const lower = text.toLowerCase();
+  PLANT_MONTHS.forEach((name, i) => { if (lower.includes(name.toLowerCase())) mask |= 1 << i; });
+  return mask;
+}
+
+function plantDataWordBits(text, bitOf) {
+  let bits = 0;
+  (plantDataText(text).toLowerCase().match(/[a-z]+/g) || []).forEach(word => {
+    const bit = bitOf(word);
+    if (bit >= 0) bits |= 1 << bit;
+  });
+  return bits;
+}
+
+// The typed columns of one row, parsed from its text columns (typed_row)
+function plantDataTypedRow(row) {
+  const zones = plantDataZones(row.HardinessZones);
+  const ph = plantDataPhRange(row.pH, row.pH_split);
+  const mask = bits => bits || null;
+  return {
+    zone_min: zones && zones[0], zone_max: zones && zones[1],
+    height_m: plantDataMetres(row.Height), width_m: plantDataMetres(row.Width),
+    ph_min: ph && ph[0], ph_max: ph && ph[1],
+    bloom_months: mask(plantDataMonthMask(row.Flower)),
+    ripen_months: mask(plantDataMonthMask(row.Ripen)),
+    soil_bits: mask(plantDataWordBits(row.Soils, word => PLANT_SOILS.indexOf(PLANT_SOIL_WORDS[word]))),
+    pollinator_bits: mask(plantDataWordBits(row.Pollinators, word => {
+      const i = PLANT_POLLINATORS.indexOf(word);
+      return i >= 0 ? i : PLANT_POLLINATORS.indexOf(word + 's');
+    })),
+  };
+}
+
+// Fill typed cells a CSV row lacks (an export made before the typed stage
+// ran, or the raw scraper output), so the pages' filters keep working
+function fillPlantTypedColumns(rows) {
+  rows.forEach(row => {
+    let typed = null;
+    PLANT_TYPED_COLUMNS.forEach(col => {
+      if (row[col] != null && row[col] !== '') return;
+      typed = typed || plantDataTypedRow(row);
+      row[col] = typed[col];
+    });
+  });
+  return rows;
+}
+
+// Papa's dynamicTyping for a cell: numbers, booleans, null for empty
+function plantDataTyped(value) {
+  if (value === '') return null;
+  if (value === 'true' || value === 'TRUE') return true;
+  if (value === 'false' || value === 'FALSE') return false;
+  if (/^\s*-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$/.test(value)) return parseFloat(value);
+  return value;
+}
+
+// One column of an artifact as an array of `rows` values
+function decodePlantColumn(column, rows, empty) {
+  const dict = column.dict;
+  const cells = dict ? column.codes.map(code => code === 0 ? empty : dict[code]) : column.values;
+  if (!column.at) return cells;
+  const out = new Array(rows).fill(empty);
+  let position = 0;
+  for (let i = 0; i < column.at.length; i++) {
+    position += column.at[i];
+    out[position] = cells[i];
+  }
+  return out;
+}
+
+// Row objects of an artifact. options.dynamicTyping: true converts text
+// columns like Papa; an object converts only the columns it names.
+// options.start is the position of the first row (detail shards).
+function decodePlantColumns(artifact, options) {
+  const start = (options && options.start) || 0;
+  const typing = (options && options.dynamicTyping) || false;
+  const typed = new Set(artifact.typed || []);
+  const names = Object.keys(artifact.columns);
+  const columns = names.map(name => {
+    const empty = typed.has(name) ? null : '';
+    let values = decodePlantColumn(artifact.columns[name], artifact.rows, empty);
+    if (!typed.has(name) && (typing === true || typing[name])) values = values.map(plantDataTyped);
+    return values;
+  });
+  const data = new Array(artifact.rows);
+  for (let r = 0; r < artifact.rows; r++) {
+    const row = {};
+    for (let c = 0; c < names.length; c++) row[names[c]] = columns[c][r];
+    row[PLANT_ROW] = start + r;
+    data[r] = row;
+  }
+  return data;
+}
+
+function loadPlantDataCsv(options) {
+  return new Promise((resolve, reject) => {
+    Papa.parse(PLANT_DATA_CSV, {
+      download: true,
+      header: true,
+      skipEmptyLines: true,
+      dynamicTyping: (options && options.dynamicTyping) || false,
+      complete: r => resolve({ data: fillPlantTypedColumns(r.data), fields: r.meta.fields, filled: null }),
+      error: err => reject(err),
+    });
+  });
+}
+
+// Resolves to { data, fields, filled }: the page's rows, every column of the
+// dataset, and how many named plants fill each (null from the CSV)
+async function loadPlantData(page, options) {
+  let manifest = null;
+  try {
+    const res = await fetch(PLANT_DATA_MANIFEST, { cache: 'no-cache' });
+    if (res.ok) manifest = await res.json();
+  } catch (e) { /* no manifest: use the CSV */ }
+  const entry = manifest && manifest.pages && manifest.pages[page];
+  if (!entry) return loadPlantDataCsv(options);
+  const res = await fetch(entry.artifact);
+  if (!res.ok) throw new Error('Failed to load ' + entry.artifact + ' (' + res.status + ')');
+  if (entry.detail && entry.detail.length) plantDetail = manifest.detail;
+  return { data: decodePlantColumns(await res.json(), options), fields: manifest.fields, filled: manifest.filled };
+}
+
+// Index of the detail shard holding row `position` (shards are in row order)
+function plantDetailShard(position) {
+  const shards = plantDetail.shards;
+  let lo = 0, hi = shards.length - 1;
+  while (lo < hi) {
+    const mid = (lo + hi + 1) >> 1;
+    if (shards[mid].start <= position) lo = mid; else hi = mid - 1;
+  }
+  return lo;
+}
+
+function fetchPlantDetailShard(index) {
+  if (!plantDetailShards.has(index)) {
+    const shard = plantDetail.shards[index];
+    const rows = fetch(shard.artifact)
+      .then(res => {
+        if (!res.ok) throw new Error('Failed to load ' + shard.artifact + ' (' + res.status + ')');
+        return res.json();
+      })
+      .then(artifact => decodePlantColumns(artifact, { start: shard.start }));
+    rows.catch(() => plantDetailShards.delete(index));   // let a later open retry
+    plantDetailShards.set(index, rows);
+  }
+  return plantDetailShards.get(index);
+}
+
+// Resolves to `row` with its detail columns filled in (from the CSV they
+// are already there)
+async function loadPlantDetail(row) {
+  const position = row[PLANT_ROW];
+  if (!plantDetail || position === undefined) return row;
+  const index = plantDetailShard(position);
+  const rows = await fetchPlantDetailShard(index);
+  return Object.assign(row, rows[position - plantDetail.shards[index].start]);
+}
+
+// loadPlantDetail for many rows, fetching each shard once
+async function loadPlantDetails(rows) {
+  if (!plantDetail) return rows;
+  const indexes = new Set(rows.filter(r => r[PLANT_ROW] !== undefined).map(r => plantDetailShard(r[PLANT_ROW])));
+  await Promise.all([...indexes].map(fetchPlantDetailShard));
+  await Promise.all(rows.map(loadPlantDetail));
+  return rows;
+}
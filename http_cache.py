@@ -0,0 +1,232 @@
+"""
+http_cache.py
+-------------
+Persistent HTTP response cache shared by the PFAF and Permapeople fetchers.
+
+- Keyed by the full request URL (query string included).
+- Fresh entries (younger than the source's TTL) are served from disk with no
+  request at all; stale entries are revalidated with ``If-None-Match`` /
+  ``If-Modified-Since`` so an unchanged page costs a 304 instead of a body.
+- Bodies are zlib-compressed in a single SQLite file; once the file holds more
+  than ``max_bytes`` the least recently used entries are evicted. The size is
+  kept as a running total, re-summed from the table every ``RESUM_EVERY``
+  stores to pick up what other processes sharing the file wrote.
+- A hit only updates the entry's access time in memory. Access times are
+  written in one transaction once ``TOUCH_EVERY`` entries are pending,
+  before an eviction and on ``close()``, so a warm re-crawl doesn't commit
+  per page.
+- ``stats`` counts hits / revalidations / misses / bytes saved, and
+  ``report()`` prints them at the end of a run. Responses served from the
+  cache have ``from_cache`` set, and ``revalidated`` when a 304 was needed.
+
+Usage:
+    cache = HttpCache()
+    response = cache.get(session, url, params=..., timeout=30)
+    cache.report()
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB   = os.path.join(SCRIPT_DIR, ".cache", "http_cache.sqlite")
+
+DAY = 24 * 60 * 60
+
+# URL prefix → seconds an entry is served without revalidation.
+# PFAF species pages rarely change; the Permapeople site is edited daily.
+# PFAF listing pages and Permapeople API pages are always revalidated: a
+# listing so new species show up in the next crawl, an API page because the
+# store sync (permapeople_store.py) reads the pages past its watermark and
+# an explicit refresh must see today's edits. Unchanged pages still cost
+# only a 304.
+DEFAULT_TTL = {
+    "https://pfaf.org/":                                  30 * DAY,
+    "https://pfaf.org/user/DatabaseSearhResult.aspx":     0,
+    "https://permapeople.org/":                           1 * DAY,
+    "https://permapeople.org/api/":                       0,
+}
+FALLBACK_TTL = 1 * DAY
+
+DEFAULT_MAX_BYTES = 512 * 1_048_576
+RESUM_EVERY       = 1000   # stores between full SUM(disk_size) scans
+EVICT_BATCH       = 64     # LRU entries read per eviction query
+TOUCH_EVERY       = 256    # pending access times written in one transaction
+
+
+class HttpCache:
+    def __init__(self, path=CACHE_DB, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = dict(DEFAULT_TTL if ttl is None else ttl)
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0,
+                      "evicted": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url           TEXT PRIMARY KEY,
+                etag          TEXT,
+                last_modified TEXT,
+                content_type  TEXT,
+                fetched_at    REAL NOT NULL,
+                accessed_at   REAL NOT NULL,
+                raw_size      INTEGER NOT NULL,
+                disk_size     INTEGER NOT NULL,
+                body          BLOB NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        self._db.commit()
+        self._disk_bytes = self._sum_disk_size()
+        self._stores_since_sum = 0
+        self._touched = {}   # url → access time not written yet
+
+    def ttl_for(self, url):
+        """TTL of the longest matching prefix in the policy."""
+        best = None
+        for prefix, seconds in self.ttl.items():
+            if url.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+                best = (prefix, seconds)
+        return best[1] if best else FALLBACK_TTL
+
+    # ── public API ────────────────────────────────────────────────────────────
+
+    def get(self, session, url, params=None, headers=None, **kwargs):
+        """Cached drop-in for ``session.get(url, params=..., headers=...)``."""
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        entry = self._lookup(full_url)
+        now = time.time()
+
+        if entry and now - entry["fetched_at"] < self.ttl_for(full_url):
+            self._touch(full_url, now)
+            self._count(hits=1, bytes_saved=entry["raw_size"])
+            return _cached_response(full_url, entry)
+
+        conditional = dict(headers or {})
+        if entry and entry["etag"]:
+            conditional["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            conditional["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(full_url, headers=conditional, **kwargs)
+
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self._db.execute(
+                    "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                    (now, now, full_url))
+                self._db.commit()
+            self._count(revalidated=1, bytes_saved=entry["raw_size"])
+            return _cached_response(full_url, entry, revalidated=True)
+
+        self._count(misses=1)
+        if response.status_code == 200:
+            self._store(full_url, response, now)
+        return response
+
+    def report(self, label="cache"):
+        s = self.stats
+        lookups = s["hits"] + s["revalidated"] + s["misses"]
+        rate = (s["hits"] + s["revalidated"]) / lookups * 100 if lookups else 0
+        print(f"[{label}] {s['hits']} hits  |  {s['revalidated']} revalidated (304)  |  "
+              f"{s['misses']} misses  |  {rate:.1f}% served from cache  |  "
+              f"{s['bytes_saved'] / 1_048_576:.2f} MB saved  |  {s['evicted']} evicted")
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+    # ── storage ───────────────────────────────────────────────────────────────
+
+    def _count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, content_type, fetched_at, raw_size, body "
+                "FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        keys = ("etag", "last_modified", "content_type", "fetched_at", "raw_size", "body")
+        return dict(zip(keys, row))
+
+    def _touch(self, url, now):
+        with self._lock:
+            self._touched[url] = now
+            if len(self._touched) >= TOUCH_EVERY:
+                self._flush_touched()
+                self._db.commit()
+
+    def _flush_touched(self):
+        """Write the pending access times. Caller holds the lock and commits."""
+        if self._touched:
+            self._db.executemany("UPDATE responses SET accessed_at = ? WHERE url = ?",
+                                 [(at, url) for url, at in self._touched.items()])
+            self._touched.clear()
+
+    def _store(self, url, response, now):
+        raw = response.content
+        body = zlib.compress(raw, 6)
+        with self._lock:
+            old = self._db.execute("SELECT disk_size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 response.headers.get("Content-Type"), now, now, len(raw), len(body), body))
+            self.stats["stored"] += 1
+            self._disk_bytes += len(body) - (old[0] if old else 0)
+            self._stores_since_sum += 1
+            if self._stores_since_sum >= RESUM_EVERY:
+                self._disk_bytes = self._sum_disk_size()
+                self._stores_since_sum = 0
+            self._evict()
+            self._db.commit()
+
+    def _sum_disk_size(self):
+        return self._db.execute("SELECT COALESCE(SUM(disk_size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until under ``max_bytes``.
+        Caller holds the lock."""
+        if self._disk_bytes > self.max_bytes:
+            self._flush_touched()
+        while self._disk_bytes > self.max_bytes:
+            batch = self._db.execute(
+                "SELECT url, disk_size FROM responses ORDER BY accessed_at LIMIT ?", (EVICT_BATCH,)).fetchall()
+            if not batch:
+                self._disk_bytes = 0
+                return
+            for url, size in batch:
+                self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.stats["evicted"] += 1
+                self._disk_bytes -= size
+                if self._disk_bytes <= self.max_bytes:
+                    return
+
+
+def _cached_response(url, entry, revalidated=False):
+    """Build a ``requests.Response`` from a cache entry so callers can't tell
+    the difference."""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = zlib.decompress(entry["body"])
+    response.headers = CaseInsensitiveDict({"Content-Type": entry["content_type"] or ""})
+    response.encoding = "utf-8"
+    response.from_cache = True
+    response.revalidated = revalidated
+    return response
@@ -3,24 +3,47 @@ merge_plant_data.py
 -------------------
 Pulls the latest data from Permapeople API, merges it with the existing PFAF
 CSV, deduplicates on latin name, fills gaps across sources, and writes the
-combined dataset to docs/plant_data.csv (and a local backup copy).
+base columns of the combined dataset to the canonical store
+(plant_dataset.py), which is then exported to docs/plant_data.csv.
 
 Run:
     python merge_plant_data.py
 
 Options (env vars):
-    SKIP_FETCH=1   – skip re-fetching from Permapeople (use existing CSV)
+    SKIP_FETCH=1   – skip re-fetching from Permapeople (rebuild its CSV from the local mirror)
+    NO_CACHE=1     – bypass the on-disk HTTP cache (see http_cache.py)
+    PP_WORKERS=N   – parallel Permapeople cursors over id ranges (default 4, 1 = sequential)
+    PP_REFRESH=1   – re-pull every Permapeople plant to pick up edits (otherwise weekly)
+    NO_EXPORT=1    – only update the dataset store, skip the CSV export
+    MERGE_MEMORY_MB=N – merge out of core in about N MB: sorted runs on disk
+                        and a streaming join on exact and canonical names (sort_join.py)
+
+The merge works on columns: both CSVs are transposed into one sequence per
+column, the name join is a list of row positions, and every output column
+is built in one pass and written to the store as is. Columns are held in a
+compact PlantTable (plant_table.py): dictionary-encoded or sparse.
+
+Permapeople plants are mirrored in a local SQLite store. Regular runs only
+fetch plants past its high-water mark, and an interrupted pull resumes on
+the next run (see permapeople_store.py).
 """
 
 import csv
 import os
 import re
-import shutil
-import time
 import sys
+from collections import Counter
 
 from dotenv import load_dotenv
-import requests
+
+from http_cache import HttpCache
+from permapeople_data import flatten_plant
+from permapeople_store import PlantStore, export_csv, sync_store
+from permapeople_sync import PermapeopleClient
+from plant_dataset import SOURCES, PlantDataset
+from plant_names import NameMatcher, describe_suggestions, match_unique, parse_name
+from plant_table import PlantTable
+from sort_join import external_sort, name_join
 
 load_dotenv()
 
@@ -29,7 +52,19 @@ SCRIPT_DIR       = os.path.dirname(os.path.abspath(__file__))
 PFAF_CSV         = os.path.join(SCRIPT_DIR, "docs", "plant_data.csv")
 PP_CSV           = os.path.join(SCRIPT_DIR, "permapeople_plants_expanded.csv")
 OUTPUT_CSV       = os.path.join(SCRIPT_DIR, "docs", "plant_data.csv")
-OUTPUT_BACKUP    = os.path.join(SCRIPT_DIR, "plant_data_combined_backup.csv")
+
+# Out-of-core merge budget in MB (0 = merge in memory)
+MERGE_MEMORY_MB  = int(os.getenv("MERGE_MEMORY_MB", "0") or 0)
+
+# Base columns this stage owns in the dataset store, before the pp_* columns
+PFAF_COLUMNS = [
+    "Family", "Genus", "Species", "CommonName", "GrowthRate",
+    "HardinessZones", "Height", "Width", "Type", "Foliage",
+    "Pollinators", "Leaf", "Flower", "Ripen", "Reproduction",
+    "Soils", "pH", "pH_split", "Preferences", "Tolerances",
+    "Habitat", "HabitatRange", "Edibility", "Medicinal",
+    "OtherUses", "PFAF", "Image URL", SOURCES,
+]
 
 # ── Permapeople API ────────────────────────────────────────────────────────────
 PP_API_URL = "https://permapeople.org/api/plants"
@@ -45,117 +80,135 @@ PP_HEADERS = {
 # ══════════════════════════════════════════════════════════════════════════════
 
 def fetch_permapeople():
-    """Paginate through Permapeople API and write PP_CSV."""
-    if os.environ.get("SKIP_FETCH") == "1":
-        print("[permapeople] SKIP_FETCH=1 – using existing CSV")
-        return
-
-    if not PP_HEADERS["x-permapeople-key-id"]:
-        print("[permapeople] No API credentials found – using existing CSV")
-        return
-
-    print("[permapeople] Fetching latest data …")
-    all_plants = []
-    last_id = None
-
-    while True:
-        params = {"last_id": last_id} if last_id else {}
-        try:
-            r = requests.get(PP_API_URL, headers=PP_HEADERS, params=params, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            print(f"  [!] Request error: {e}")
-            break
-
-        plants = data.get("plants", [])
-        if not plants:
-            break
-
-        all_plants.extend(plants)
-        last_id = plants[-1]["id"]
-        print(f"  fetched {len(all_plants)} records so far …", end="\r")
-        time.sleep(0.8)
-
-    if not all_plants:
-        print("[permapeople] No records – using existing CSV")
-        return
-
-    print(f"\n[permapeople] {len(all_plants)} records fetched. Writing CSV …")
-    _write_pp_csv(all_plants)
-    print(f"[permapeople] Saved → {PP_CSV}")
-
-
-def _write_pp_csv(plants):
-    rows = []
-    all_keys = {}
-
-    for plant in plants:
-        record = {k: plant[k] for k in plant if k != "data"}
-        if "data" in plant:
-            for item in plant["data"]:
-                key = item.get("key", "").strip().lower().replace(" ", "_")
-                value = item.get("value", "")
-                if "-" in str(value) and key in {"soil_ph", "height", "width", "usda_hardiness_zone"}:
-                    try:
-                        parts = value.split("-")
-                        record[f"{key}_min"] = float(parts[0]) if parts[0] else ""
-                        record[f"{key}_max"] = float(parts[1]) if len(parts) > 1 else ""
-                    except ValueError:
-                        record[key] = value
-                else:
-                    record[key] = value
-        for k in record:
-            all_keys[k] = ""
-        rows.append(record)
-
-    with open(PP_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(all_keys))
-        writer.writeheader()
-        writer.writerows(rows)
+    """Sync the local Permapeople mirror and regenerate PP_CSV from it
+    (see permapeople_store / permapeople_sync)."""
+    store = PlantStore()
+    try:
+        if os.environ.get("SKIP_FETCH") == "1":
+            print("[permapeople] SKIP_FETCH=1 – not contacting the API")
+        elif not PP_HEADERS["x-permapeople-key-id"]:
+            print("[permapeople] No API credentials found – not contacting the API")
+        else:
+            print("[permapeople] Syncing local mirror …")
+            cache = None if os.environ.get("NO_CACHE") == "1" else HttpCache()
+            workers = int(os.environ.get("PP_WORKERS", "4"))
+            client = PermapeopleClient(PP_API_URL, headers=PP_HEADERS, cache=cache, pool_size=workers)
+            try:
+                summary = sync_store(client, store, workers, refresh=os.environ.get("PP_REFRESH") == "1")
+            finally:
+                client.close()
+            client.report()
+            if cache:
+                cache.report("permapeople cache")
+                cache.close()
+            if summary["error"]:
+                print(f"  [!] Request error: {summary['error']} – the next run resumes from here")
+
+        if not len(store):
+            print("[permapeople] Mirror is empty – using existing CSV")
+            return
+        rows = export_csv(store, PP_CSV, flatten_plant)
+        print(f"[permapeople] {rows} records from {store.path} → {PP_CSV}")
+    finally:
+        store.close()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  2.  LOAD  –  read both CSVs into dicts keyed by normalised latin name
+#  2.  LOAD  –  read both CSVs into columns keyed by normalised latin name
 # ══════════════════════════════════════════════════════════════════════════════
+#
+# A source is a PlantTable (plant_table.py): the row keys, and compact
+# columns aligned with them. Rows are transposed a column at a time
+# (``zip(*rows)``), and each column is encoded as it comes, rather than
+# turning every row into a dict.
 
 def norm(name: str) -> str:
     """Lowercase, collapse whitespace, strip."""
     return re.sub(r"\s+", " ", str(name).strip().lower())
 
 
-def load_pfaf(path) -> dict:
-    records = {}
+def _pfaf_key(index):
+    """Key function for PFAF rows under the header *index*: the latin name,
+    or "" for rows from other sources of an earlier export."""
+    genus, species, sources = index.get("Genus"), index.get("Species"), index.get(SOURCES)
+
+    def key(row):
+        if sources is not None and row[sources] and "pfaf" not in row[sources].split("+"):
+            return ""
+        return norm(f"{row[genus].strip() if genus is not None else ''} "
+                    f"{row[species].strip() if species is not None else ''}")
+    return key
+
+
+def _pp_key(index):
+    scientific, name = index.get("scientific_name"), index.get("name")
+    return lambda row: norm((row[scientific] if scientific is not None else "")
+                            or (row[name] if name is not None else ""))
+
+
+def read_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def iter_rows(path, make_key):
+    """``(key, row)`` for every row of *path* with a key, where
+    ``make_key(header index)`` returns the key function. Rows are padded or
+    cut to the header."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        width = len(header)
+        key = make_key({name: i for i, name in enumerate(header)})
+        for row in reader:
+            if len(row) != width:
+                row = (row + [""] * width)[:width]
+            latin = key(row)
+            if latin:
+                yield latin, row
+
+
+def _table(header, keyed, wanted=None):
+    """Keep the last row of each key, in first-seen order (like filling a
+    dict), and transpose into a PlantTable with the *wanted* columns."""
+    last = dict(keyed)
+    rows = list(last.values())
+    table = PlantTable(last, {})
+    del last
+    index = {name: i for i, name in enumerate(header)}
+    names = [name for name in (header if wanted is None else wanted) if name]
+    wanted_at = {index[name]: name for name in names if name in index}
+    for i, values in enumerate(zip(*rows)):
+        if i in wanted_at:
+            table.add_column(wanted_at[i], values)
+    for name in names:
+        if name not in index:
+            table.add_column(name, [""] * len(rows))
+    return table
+
+
+def load_pfaf(path) -> PlantTable:
+    """PFAF columns of *path*: a fresh scrape, or an earlier export whose
+    rows from other sources are skipped."""
     if not os.path.exists(path):
         print(f"[pfaf] CSV not found: {path}")
-        return records
-    with open(path, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            genus   = row.get("Genus", "").strip()
-            species = row.get("Species", "").strip()
-            latin   = norm(f"{genus} {species}")
-            if latin and latin != " ":
-                records[latin] = dict(row)
-    print(f"[pfaf] Loaded {len(records)} records from {path}")
-    return records
-
-
-def load_permapeople(path) -> dict:
-    records = {}
+        return PlantTable([], {})
+    table = _table(read_header(path), iter_rows(path, _pfaf_key), [c for c in PFAF_COLUMNS if c != SOURCES])
+    print(f"[pfaf] Loaded {len(table)} records from {path}")
+    return table
+
+
+def load_permapeople(path) -> PlantTable:
     if not os.path.exists(path):
         print(f"[permapeople] CSV not found: {path}")
-        return records
-    with open(path, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            latin = norm(row.get("scientific_name") or row.get("name") or "")
-            if latin:
-                records[latin] = dict(row)
-    print(f"[permapeople] Loaded {len(records)} records from {path}")
-    return records
+        return PlantTable([], {})
+    table = _table(read_header(path), iter_rows(path, _pp_key))
+    print(f"[permapeople] Loaded {len(table)} records from {path}")
+    return table
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  3.  MERGE  –  combine the two dicts
+#  3.  MERGE  –  join and coalesce the two column sets
 # ══════════════════════════════════════════════════════════════════════════════
 
 # Maps Permapeople field → PFAF field (used to fill PFAF blanks from PP)
@@ -177,6 +230,38 @@ PP_TO_PFAF = {
     "images":                  "Image URL",
 }
 
+# PFAF columns of Permapeople-only rows: PFAF field → Permapeople field
+# (None leaves the column blank; Species and Edibility are derived)
+PP_ONLY_FIELDS = {
+    "Family":         "family",
+    "Genus":          "genus",
+    "Species":        None,
+    "CommonName":     "name",
+    "GrowthRate":     "growth",
+    "HardinessZones": "usda_hardiness_zone",
+    "Height":         "height",
+    "Width":          "width",
+    "Type":           "life_cycle",
+    "Foliage":        None,
+    "Pollinators":    "pollination",
+    "Leaf":           None,
+    "Flower":         None,
+    "Ripen":          None,
+    "Reproduction":   "propagation_method",
+    "Soils":          "soil_type",
+    "pH":             "soil_ph",
+    "pH_split":       None,
+    "Preferences":    None,
+    "Tolerances":     "drought_resistant",
+    "Habitat":        "habitat",
+    "HabitatRange":   None,
+    "Edibility":      None,
+    "Medicinal":      "medicinal",
+    "OtherUses":      "utility",
+    "PFAF":           "plants_for_a_future",
+    "Image URL":      "images",
+}
+
 # Extra PP columns to carry through with a pp_ prefix
 PP_EXTRA = [
     "id", "slug", "description", "link", "scientific_name",
@@ -194,113 +279,190 @@ PP_EXTRA = [
 ]
 
 
-def merge(pfaf: dict, pp: dict) -> list[dict]:
+def merge(pfaf: PlantTable, pp: PlantTable) -> PlantTable:
     """
     Strategy:
     - Start with every PFAF record; fill blank PFAF fields from PP equivalents.
     - Append any PP-only records (not in PFAF at all).
     - Add pp_* columns to every row for the extra Permapeople fields.
-    """
-    combined = []
 
-    for latin, prow in pfaf.items():
-        merged = dict(prow)
-        merged["sources"] = "pfaf"
+    PFAF and PP names are joined with plant_names.NameMatcher, so author
+    strings, "x" for "×" and a left-out "var." don't split a plant in two.
+    Each PP record joins one PFAF record at most; a variety matching only
+    its species (species tier) and near spellings (fuzzy tier) are only
+    logged.
 
-        pp_record = pp.get(latin)
-        if pp_record:
-            merged["sources"] = "pfaf+permapeople"
-            # Fill PFAF blanks from PP equivalents
+    Works a column at a time: the join is a list of PP row positions (None
+    where a PFAF row has no match), and each output column is one pass
+    over it; each is encoded into the result as soon as it is built.
+    """
+    pfaf_keys, pp_keys = pfaf.keys, pp.keys
+    suggestions = []
+    joined = match_unique(NameMatcher(pp_keys), pfaf_keys, suggestions)
+    tiers = Counter(m.tier for m in joined.values())
+    print(f"[merge] {len(joined)} PFAF records matched in Permapeople "
+          f"({', '.join(f'{n} {tier}' for tier, n in tiers.most_common()) or 'none'})")
+    if suggestions:
+        print(f"[merge] {describe_suggestions(suggestions)}")
+
+    pp_position = {key: i for i, key in enumerate(pp_keys)}
+    at = [pp_position[joined[key].target] if key in joined else None for key in pfaf_keys]
+    matched = set(at)
+    pfaf_set = set(pfaf_keys)
+    only = [i for i, key in enumerate(pp_keys) if i not in matched and key not in pfaf_set]
+    print(f"[merge] {len(only)} Permapeople-only records (not in PFAF)")
+
+    def take(field, positions):
+        return pp.column(field).take(positions)
+
+    fill = {pfaf_col: pp_col for pp_col, pfaf_col in PP_TO_PFAF.items()}
+    merged = PlantTable(list(pfaf_keys) + [pp_keys[i] for i in only], {})
+    for col in PFAF_COLUMNS:
+        if col == SOURCES:
+            merged.add_column(col, ["pfaf" if i is None else "pfaf+permapeople" for i in at]
+                              + ["permapeople"] * len(only))
+            continue
+        # PFAF rows: fill blank PFAF fields from the PP equivalent
+        base = pfaf.column(col).decode()
+        if col in fill:
+            base = [a or b or a for a, b in zip(base, take(fill[col], at))]
+        # PP-only rows
+        if col == "Species":
+            extra = [" ".join(norm(name).split()[1:]) for name in take("scientific_name", only)]
+        elif col == "Edibility":
+            extra = [a or b for a, b in zip(take("edible_uses", only), take("edible", only))]
+        elif PP_ONLY_FIELDS.get(col):
+            extra = take(PP_ONLY_FIELDS[col], only)
+        else:
+            extra = [""] * len(only)
+        merged.add_column(col, base + extra)
+
+    for col in sorted(PP_EXTRA):
+        merged.add_column(f"pp_{col}", take(col, at) + take(col, only))
+    return merged
+
+
+def merge_row(prow, pprow) -> dict:
+    """One output row by the rules of ``merge``: *prow* is a PFAF record,
+    *pprow* the Permapeople record joined to it; either may be None."""
+    if prow is None:
+        row = {col: pprow.get(field, "") if field else "" for col, field in PP_ONLY_FIELDS.items()}
+        row["Species"] = " ".join(norm(pprow.get("scientific_name", "")).split()[1:])
+        row["Edibility"] = pprow.get("edible_uses", "") or pprow.get("edible", "")
+        row[SOURCES] = "permapeople"
+    else:
+        row = {col: prow.get(col, "") for col in PFAF_COLUMNS if col != SOURCES}
+        row[SOURCES] = "pfaf"
+        if pprow is not None:
+            row[SOURCES] = "pfaf+permapeople"
             for pp_col, pfaf_col in PP_TO_PFAF.items():
-                if not merged.get(pfaf_col) and pp_record.get(pp_col):
-                    merged[pfaf_col] = pp_record[pp_col]
-            # Carry extra PP columns
-            for col in PP_EXTRA:
-                merged[f"pp_{col}"] = pp_record.get(col, "")
+                if not row[pfaf_col] and pprow.get(pp_col):
+                    row[pfaf_col] = pprow[pp_col]
+    for col in sorted(PP_EXTRA):
+        row[f"pp_{col}"] = pprow.get(col, "") if pprow is not None else ""
+    return row
+
+
+def merge_external(pfaf_csv, pp_csv, budget, folder=None):
+    """``merge`` for sources that don't fit in memory: both CSVs are sorted
+    by name in runs of *budget* bytes on disk and joined in one streaming
+    pass (sort_join.name_join), then sorted back into ``merge``'s row order.
+    Names are joined on the same tiers as ``merge``; the PFAF names left
+    unmatched, for which ``merge`` would also log species and fuzzy
+    suggestions, are counted in the log. Yields ``(key, row)``."""
+    columns = PFAF_COLUMNS + [f"pp_{col}" for col in sorted(PP_EXTRA)]
+    sources = []
+    for path, make_key in ((pfaf_csv, _pfaf_key), (pp_csv, _pp_key)):
+        if os.path.exists(path):
+            sources.append((read_header(path), iter_rows(path, make_key)))
         else:
-            for col in PP_EXTRA:
-                merged[f"pp_{col}"] = ""
-
-        combined.append(merged)
-
-    # PP-only records (not matched to any PFAF entry)
-    pfaf_keys = set(pfaf.keys())
-    pp_only = {k: v for k, v in pp.items() if k not in pfaf_keys}
-    print(f"[merge] {len(pp_only)} Permapeople-only records (not in PFAF)")
-
-    for latin, pp_record in pp_only.items():
-        row = {
-            "Family":        pp_record.get("family", ""),
-            "Genus":         pp_record.get("genus", ""),
-            "Species":       " ".join(norm(pp_record.get("scientific_name", "")).split()[1:]),
-            "CommonName":    pp_record.get("name", ""),
-            "GrowthRate":    pp_record.get("growth", ""),
-            "HardinessZones":pp_record.get("usda_hardiness_zone", ""),
-            "Height":        pp_record.get("height", ""),
-            "Width":         pp_record.get("width", ""),
-            "Type":          pp_record.get("life_cycle", ""),
-            "Foliage":       "",
-            "Pollinators":   pp_record.get("pollination", ""),
-            "Leaf":          "",
-            "Flower":        "",
-            "Ripen":         "",
-            "Reproduction":  pp_record.get("propagation_method", ""),
-            "Soils":         pp_record.get("soil_type", ""),
-            "pH":            pp_record.get("soil_ph", ""),
-            "pH_split":      "",
-            "Preferences":   "",
-            "Tolerances":    pp_record.get("drought_resistant", ""),
-            "Habitat":       pp_record.get("habitat", ""),
-            "HabitatRange":  "",
-            "Edibility":     pp_record.get("edible_uses", "") or pp_record.get("edible", ""),
-            "Medicinal":     pp_record.get("medicinal", ""),
-            "OtherUses":     pp_record.get("utility", ""),
-            "PFAF":          pp_record.get("plants_for_a_future", ""),
-            "Image URL":     pp_record.get("images", ""),
-            "sources":       "permapeople",
-        }
-        for col in PP_EXTRA:
-            row[f"pp_{col}"] = pp_record.get(col, "")
-        combined.append(row)
-
-    return combined
+            print(f"[merge] CSV not found: {path}")
+            sources.append(([], iter(())))
+    (pfaf_header, pfaf_rows), (pp_header, pp_rows) = sources
+    # The join's two sorts and the final one hold their buffers at once
+    joined = name_join(pfaf_rows, pp_rows, budget * 2 // 3, folder)
+
+    def merged():
+        tiers, sources = Counter(), Counter()
+        unmatched = infraspecific = 0
+        for left, right, tier in joined:
+            tiers[tier] += 1
+            if left and not right:
+                unmatched += 1
+                infraspecific += bool(parse_name(left[0]).infra)
+            row = merge_row(dict(zip(pfaf_header, left[2])) if left else None,
+                            dict(zip(pp_header, right[2])) if right else None)
+            sources[row[SOURCES]] += 1
+            position = [0, left[1]] if left else [1, right[1]]
+            yield [position, (left or right)[0], [row[col] for col in columns]]
+        print(f"[merge] {sources['pfaf+permapeople']} PFAF records matched in Permapeople "
+              f"({', '.join(f'{tiers[t]} {t}' for t in ('exact', 'canonical') if tiers[t]) or 'none'}), "
+              f"{sources['permapeople']} Permapeople-only records, {sources['pfaf']} PFAF-only")
+        if unmatched:
+            print(f"[merge] out of core: {unmatched} unmatched PFAF names not checked for species or fuzzy "
+                  f"suggestions ({infraspecific} infraspecific) – unset MERGE_MEMORY_MB to list them")
+
+    for _, key, values in external_sort(merged(), lambda entry: entry[0], budget // 3, folder, "sort-merged"):
+        yield key, dict(zip(columns, values))
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  4.  WRITE
+#  4.  WRITE  –  the dataset store
 # ══════════════════════════════════════════════════════════════════════════════
 
-def write_csv(rows: list[dict], path: str):
-    if not rows:
+def write_dataset(table: PlantTable, dataset):
+    """Replace this stage's columns in the dataset store."""
+    if not len(table):
         print("[write] No rows to write.")
         return
-
-    # Union of all keys, PFAF columns first
-    pfaf_cols = [
-        "Family", "Genus", "Species", "CommonName", "GrowthRate",
-        "HardinessZones", "Height", "Width", "Type", "Foliage",
-        "Pollinators", "Leaf", "Flower", "Ripen", "Reproduction",
-        "Soils", "pH", "pH_split", "Preferences", "Tolerances",
-        "Habitat", "HabitatRange", "Edibility", "Medicinal",
-        "OtherUses", "PFAF", "Image URL", "sources",
-    ]
-    pp_cols = sorted({k for row in rows for k in row if k and k.startswith("pp_")})
-    fieldnames = pfaf_cols + pp_cols
-
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(rows)
-
-    size_mb = os.path.getsize(path) / 1_048_576
-    print(f"[write] {len(rows)} rows → {path}  ({size_mb:.2f} MB)")
+    dataset.write_columns("merge", table.keys, table.columns())
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  main
 # ══════════════════════════════════════════════════════════════════════════════
 
+def build_base(pfaf_csv=PFAF_CSV, pp_csv=PP_CSV, memory_mb=MERGE_MEMORY_MB) -> int:
+    """Load both sources, merge them and write this stage's columns to the
+    dataset store. Returns the number of rows (0 when both are empty).
+    With *memory_mb*, the sources are merged out of core within about that
+    many MB (``merge_external``)."""
+    if memory_mb:
+        if not os.path.exists(pfaf_csv) and not os.path.exists(pp_csv):
+            print("[!] Both sources missing – nothing to do.")
+            return 0
+        rows = merge_external(pfaf_csv, pp_csv, memory_mb << 20)
+        with PlantDataset() as dataset:
+            total, _ = dataset.write("merge", rows, PFAF_COLUMNS + [f"pp_{col}" for col in sorted(PP_EXTRA)])
+        print(f"[merge] {total} total plants")
+        return total
+
+    # 1. Load both sources
+    pfaf = load_pfaf(pfaf_csv)
+    pp   = load_permapeople(pp_csv)
+
+    if not len(pfaf) and not len(pp):
+        print("[!] Both sources empty – nothing to do.")
+        return 0
+
+    # 2. Merge
+    merged = merge(pfaf, pp)
+    del pfaf, pp
+    total = len(merged)
+    sources    = Counter(merged.column(SOURCES))
+    pfaf_only  = sources["pfaf"]
+    both       = sources["pfaf+permapeople"]
+    pp_only    = sources["permapeople"]
+    print(f"[merge] {total} total plants  |  {both} matched both  |"
+          f"  {pfaf_only} PFAF-only  |  {pp_only} PP-only")
+    print(f"[merge] Columns held as {', '.join(f'{n} {layout}' for layout, n in merged.layouts().items())}")
+
+    # 3. Write this stage's columns
+    with PlantDataset() as dataset:
+        write_dataset(merged, dataset)
+    return total
+
+
 def main():
     print("=" * 60)
     print("  PLANTalytics – merge_plant_data.py")
@@ -309,29 +471,14 @@ def main():
     # 1. Pull latest Permapeople data
     fetch_permapeople()
 
-    # 2. Load both sources
-    pfaf = load_pfaf(PFAF_CSV)
-    pp   = load_permapeople(PP_CSV)
-
-    if not pfaf and not pp:
-        print("[!] Both sources empty – nothing to do.")
+    # 2. Merge both sources into the dataset store
+    if not build_base():
         sys.exit(1)
 
-    # 3. Merge
-    rows = merge(pfaf, pp)
-    total = len(rows)
-    pfaf_only  = sum(1 for r in rows if r.get("sources") == "pfaf")
-    both       = sum(1 for r in rows if r.get("sources") == "pfaf+permapeople")
-    pp_only    = sum(1 for r in rows if r.get("sources") == "permapeople")
-    print(f"[merge] {total} total plants  |  {both} matched both  |"
-          f"  {pfaf_only} PFAF-only  |  {pp_only} PP-only")
-
-    # 4. Write output
-    write_csv(rows, OUTPUT_CSV)
-
-    # Also save a timestamped backup next to the script
-    shutil.copy(OUTPUT_CSV, OUTPUT_BACKUP)
-    print(f"[backup] Saved → {OUTPUT_BACKUP}")
+    # 3. Export the whole dataset
+    if os.environ.get("NO_EXPORT") != "1":
+        with PlantDataset() as dataset:
+            dataset.export_csv(OUTPUT_CSV)
     print("\nDone ✓")
 
 
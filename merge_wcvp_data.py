@@ -1,174 +1,146 @@
 """
 merge_wcvp_data.py
 ------------------
-Enriches the existing docs/plant_data.csv with data from the World Checklist
-of Vascular Plants (WCVP) — Kew's authoritative taxonomic backbone.
+Enriches the plants in the canonical dataset store (plant_dataset.py) with
+data from the World Checklist of Vascular Plants (WCVP) — Kew's authoritative
+taxonomic backbone — then exports docs/plant_data.csv.
 
 Adds ``kew_``-prefixed columns for:
   - lifeform, climate, geographic_area, taxon_authors, first_published
   - powo_id (links to Plants of the World Online)
   - native_range / introduced_range (aggregated from distribution file)
-
-Only enriches plants already in the dataset (no new rows added).
-Matches on exact genus+species (case-insensitive, accepted taxa only).
+  - accepted_name, when the plant is listed under a synonym
+  - matched_name, when the plant matched a differently spelled WCVP name
+
+Only enriches plants already in the dataset (no new rows added): the rows
+of the PFAF ⨝ Permapeople merge, and the plants of the Zenodo parse. The
+``kew_`` cells are written as a patch keyed by row key (``patch=True`` in
+plant_dataset.py), so those of a Zenodo plant show up once the zenodo
+stage adds its row, and this stage doesn't have to wait for it.
+Matches on exact genus+species (case-insensitive): an accepted species
+first, otherwise a synonym, whose accepted taxon's data is used. Names
+that don't match exactly go through plant_names.py (authors, the spelling
+of "×" and a missing rank ignored); a variety matching only its species,
+and names only a typo away, are logged, not enriched.
+Lookups go through the prebuilt index in wcvp_index.py, which is only
+rebuilt when the WCVP download changes.
+Only Genus/Species are read from the store, and only the ``kew_`` cells
+and this stage's ``sources`` tag are rewritten.
+
+build_plant_data.py runs the two halves as separate stages: the index
+build (``wcvp_index.open_index``) and the enrichment (``enrich_from_index``).
 
 Run:
     python merge_wcvp_data.py
+    NO_EXPORT=1 python merge_wcvp_data.py       # update the store only
 """
 
-import csv
 import os
-import re
-import shutil
-from collections import defaultdict
+import time
+from collections import Counter, defaultdict
+
+from merge_zenodo_data import ZENODO_PARSED, cached_keys
+from plant_dataset import PlantDataset
+from plant_names import describe_suggestions
+from plant_table import PlantTable
+from wcvp_index import NAME_FIELDS, WCVP_INDEX, WcvpIndex, make_key, open_index
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-WCVP_NAMES = os.path.join(SCRIPT_DIR, "docs", "wcvp_names.csv")
-WCVP_DIST  = os.path.join(SCRIPT_DIR, "docs", "wcvp_distribution.csv")
 PLANT_CSV  = os.path.join(SCRIPT_DIR, "docs", "plant_data.csv")
-BACKUP_CSV = os.path.join(SCRIPT_DIR, "plant_data_pre_wcvp_backup.csv")
+STAGE      = "kew"
+BASE_STAGE = "merge"   # the stage whose rows are enriched (besides Zenodo's)
 
 KEW_PREFIX = "kew_"
 
-# Columns we pull from WCVP Names
-NAME_FIELDS = [
-    "lifeform_description",
-    "climate_description",
-    "geographic_area",
-    "taxon_authors",
-    "first_published",
-    "powo_id",
-]
-
 # ── helpers ────────────────────────────────────────────────────────────────────
 
-def make_key(genus, species):
-    return re.sub(r"\s+", " ", f"{genus} {species}".strip()).lower()
-
-
-def add_source(current, tag="kew"):
-    parts = [s.strip() for s in current.split("+") if s.strip()]
-    if tag not in parts:
-        parts.append(tag)
-    return "+".join(parts)
-
-
-# ── main ───────────────────────────────────────────────────────────────────────
-
-def main():
-    # 1. Read existing CSV to know which genus+species keys we need
-    print("[csv] Reading existing plant_data.csv …")
-    with open(PLANT_CSV, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        existing_fields = list(reader.fieldnames)
-        existing_rows = list(reader)
-    print(f"[csv] {len(existing_rows)} rows, {len(existing_fields)} columns")
-
-    # Build lookup: key → list of row indices (some plants share genus+species)
-    key_to_idxs = defaultdict(list)
-    for idx, row in enumerate(existing_rows):
+def dataset_keys(dataset, stage=None):
+    """Genus+species key → dataset row keys (some plants share genus+species),
+    for the rows of *stage* or of every stage."""
+    key_to_rows = defaultdict(list)
+    for row_key, row in dataset.read(["Genus", "Species"], stage=stage):
         key = make_key(row.get("Genus", ""), row.get("Species", ""))
         if key:
-            key_to_idxs[key].append(idx)
-
-    needed_keys = set(key_to_idxs.keys())
-    print(f"[csv] {len(needed_keys)} unique genus+species keys to match")
+            key_to_rows[key].append(row_key)
+    return key_to_rows
+
+
+def candidate_keys(dataset, parsed=ZENODO_PARSED):
+    """``dataset_keys`` of the merge stage's rows, plus the Zenodo plants
+    that may become rows of their own. Nothing the zenodo stage writes is
+    read."""
+    key_to_rows = dataset_keys(dataset, stage=BASE_STAGE)
+    rows = {row_key for row_keys in key_to_rows.values() for row_key in row_keys}
+    for zkey in cached_keys(parsed):
+        if zkey and zkey not in rows:
+            genus, _, species = zkey.partition(" ")
+            key_to_rows[make_key(genus, species)].append(zkey)
+            rows.add(zkey)
+    return key_to_rows
+
+
+def enrich_from_index(index_path=WCVP_INDEX, parsed=ZENODO_PARSED):
+    """Enrich the store from the index built by ``wcvp_index.open_index``."""
+    with WcvpIndex(index_path) as index, PlantDataset() as dataset:
+        enrich(dataset, index, candidate_keys(dataset, parsed))
+
+
+def enrich(dataset, index, key_to_rows):
+    """Look up every key in *index* and write the ``kew_`` cells and
+    ``sources`` tags of matched rows."""
+    started = time.time()
+    hits = index.lookup(key_to_rows)
+    suggestions = []
+    hits.update(index.match([key for key in key_to_rows if key not in hits], suggestions))
+    synonyms = sum(1 for hit in hits.values() if hit["match"] == "synonym")
+    tiers = Counter(hit["tier"] for hit in hits.values())
+    print(f"[wcvp] {len(hits)} species matched ({', '.join(f'{tier} {n}' for tier, n in tiers.most_common()) or 'none'}), "
+          f"{synonyms} through a synonym ({time.time() - started:.2f}s)")
+    if suggestions:
+        print(f"[wcvp] {describe_suggestions(suggestions)}")
 
-    # 2. Scan WCVP Names for accepted species that match our plants
-    print("[wcvp] Scanning wcvp_names.csv for matches …")
-    wcvp_matches = {}  # key → {field: value, plant_name_id: ...}
-    matched_ids = set()
-
-    with open(WCVP_NAMES, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="|")
-        for row in reader:
-            if row["taxon_rank"] != "Species" or row["taxon_status"] != "Accepted":
-                continue
-            key = make_key(row["genus"], row["species"])
-            if key in needed_keys and key not in wcvp_matches:
-                data = {field: row.get(field, "") for field in NAME_FIELDS}
-                data["plant_name_id"] = row["plant_name_id"]
-                wcvp_matches[key] = data
-                matched_ids.add(row["plant_name_id"])
-
-    print(f"[wcvp] {len(wcvp_matches)} species matched from names file")
-
-    # 3. Aggregate distribution for matched plant_name_ids
-    print("[wcvp] Scanning wcvp_distribution.csv for matched plants …")
-    native_ranges = defaultdict(list)     # plant_name_id → [area, ...]
-    introduced_ranges = defaultdict(list)
-
-    with open(WCVP_DIST, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="|")
-        for row in reader:
-            pid = row["plant_name_id"]
-            if pid not in matched_ids:
-                continue
-            area = row.get("area", "").strip()
-            if not area:
-                continue
-            extinct_flag = row.get("extinct", "0") == "1"
-            if extinct_flag:
-                continue  # skip extinct distributions
-            if row.get("introduced", "0") == "1":
-                introduced_ranges[pid].append(area)
-            else:
-                native_ranges[pid].append(area)
-
-    dist_count = sum(1 for pid in matched_ids
-                     if pid in native_ranges or pid in introduced_ranges)
-    print(f"[wcvp] Distribution found for {dist_count} plants")
-
-    # 4. Backup
-    shutil.copy2(PLANT_CSV, BACKUP_CSV)
-    print(f"[csv] Backup → {BACKUP_CSV}")
-
-    # 5. Build new column list
     kew_columns = [f"{KEW_PREFIX}{f}" for f in NAME_FIELDS]
     kew_columns.append(f"{KEW_PREFIX}native_range")
     kew_columns.append(f"{KEW_PREFIX}introduced_range")
-    new_columns = [c for c in kew_columns if c not in existing_fields]
-    output_fields = existing_fields + new_columns
-
-    # Ensure every existing row has placeholders
-    for row in existing_rows:
-        for col in new_columns:
-            row.setdefault(col, "")
-
-    # 6. Enrich matched rows
-    enriched = 0
-    for key, data in wcvp_matches.items():
-        pid = data["plant_name_id"]
-
-        # Build kew_ values
-        kew_data = {}
-        for field in NAME_FIELDS:
-            kew_data[f"{KEW_PREFIX}{field}"] = data.get(field, "")
-
-        # Aggregate distributions as semicolon-separated lists
-        native = native_ranges.get(pid, [])
-        introduced = introduced_ranges.get(pid, [])
-        kew_data[f"{KEW_PREFIX}native_range"] = "; ".join(sorted(set(native)))
-        kew_data[f"{KEW_PREFIX}introduced_range"] = "; ".join(sorted(set(introduced)))
-
-        for idx in key_to_idxs.get(key, []):
-            for col, val in kew_data.items():
-                existing_rows[idx][col] = val
-            existing_rows[idx]["sources"] = add_source(
-                existing_rows[idx].get("sources", ""), "kew"
-            )
-            enriched += 1
-
-    print(f"[merge] {enriched} rows enriched with Kew data")
-    print(f"[merge] Total columns: {len(output_fields)}")
-
-    # 7. Write output
-    with open(PLANT_CSV, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=output_fields, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(existing_rows)
-    print(f"[done] Written → {PLANT_CSV}")
+    kew_columns.append(f"{KEW_PREFIX}accepted_name")
+    kew_columns.append(f"{KEW_PREFIX}matched_name")
+
+    def patch_rows():
+        for key, row_keys in key_to_rows.items():
+            hit = hits.get(key)
+            if hit is None:
+                continue
+            kew_data = {f"{KEW_PREFIX}{field}": hit[field] or "" for field in NAME_FIELDS}
+            kew_data[f"{KEW_PREFIX}native_range"] = hit["native_range"]
+            kew_data[f"{KEW_PREFIX}introduced_range"] = hit["introduced_range"]
+            # Only set when the plant is listed under a name Kew treats as a synonym
+            if hit["match"] == "synonym":
+                kew_data[f"{KEW_PREFIX}accepted_name"] = hit["accepted_name"]
+            # The WCVP name a plant matched when its own name isn't spelled the same
+            if hit["tier"] != "exact":
+                kew_data[f"{KEW_PREFIX}matched_name"] = hit["matched_name"]
+            for row_key in row_keys:
+                yield row_key, dict(kew_data, sources="kew")
+
+    patch = PlantTable.from_rows(patch_rows(), kew_columns)
+    print(f"[merge] {len(patch)} rows enriched with Kew data")
+    dataset.write_columns(STAGE, patch.keys, patch.columns(), patch=True)
+
 
+# ── main ───────────────────────────────────────────────────────────────────────
+
+def main():
+    # 1. Build the WCVP index if it is missing or the download changed
+    with open_index() as index, PlantDataset() as dataset:
+        # 2. Read Genus/Species from the dataset to know which keys we need
+        print("[dataset] Reading Genus/Species …")
+        key_to_rows = candidate_keys(dataset)
+        print(f"[dataset] {len(key_to_rows)} unique genus+species keys to match")
+
+        # 3. Look them up and write this stage's cells
+        enrich(dataset, index, key_to_rows)
+        if os.environ.get("NO_EXPORT") != "1":
+            dataset.export_csv(PLANT_CSV)
 
 if __name__ == "__main__":
     main()
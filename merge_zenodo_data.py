@@ -1,56 +1,152 @@
 """
 merge_zenodo_data.py
 --------------------
-Parses the Zenodo "Plants database" HTML export and merges it with the
-existing docs/plant_data.csv.
+Parses the Zenodo "Plants database" HTML export and merges it into the
+canonical dataset store (plant_dataset.py), then exports
+docs/plant_data.csv.
 
 - Zenodo columns are prefixed with ``zn_`` so the data source is always clear.
-- Plants are matched on exact scientific name (case-insensitive).
+- Plants are matched on scientific name (plant_names.py): exactly, then
+  ignoring authors, the spelling of "×" and a missing rank. Varieties
+  matching only their species, and near spellings (one typo apart), are
+  logged as suggestions, not matched.
 - Matched rows get the new ``zn_*`` columns filled in and ``sources`` updated.
 - Unmatched Zenodo plants are appended as new rows at the end.
+- Only Genus/Species are read from the store, and only this stage's cells
+  are rewritten.
+
+The export is read in blocks by an event-driven ``HTMLParser``: rows are
+yielded as their ``</tr>`` arrives, so no tree is built and memory does not
+grow with the file. The parsed rows go to a JSONL sidecar,
+``.cache/zenodo_plants.jsonl``. Its first line holds the HTML's SHA-1 and
+the field names, then there is one JSON array of cell values per plant.
+A run on an unchanged export reads the sidecar and skips parsing
+(``load_zenodo``).
+
+build_plant_data.py runs the two halves as separate stages: the HTML is
+parsed into the sidecar (``parse_to_cache``), which is then merged into
+the store (``merge_cached``).
 
 Run:
     python merge_zenodo_data.py
+    NO_EXPORT=1 python merge_zenodo_data.py     # update the store only
 """
 
-import csv
+import hashlib
+import json
 import os
 import re
-import shutil
-from bs4 import BeautifulSoup
+import time
+from collections import Counter
+from html.parser import HTMLParser
+
+from plant_dataset import PlantDataset
+from plant_names import NameMatcher, describe_suggestions, match_unique
+from plant_table import PlantTable
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ZENODO_HTML = os.path.join(SCRIPT_DIR, "docs", "Plants database b5a880c30b2f4c1.html")
 PLANT_CSV = os.path.join(SCRIPT_DIR, "docs", "plant_data.csv")
-BACKUP_CSV = os.path.join(SCRIPT_DIR, "plant_data_pre_zenodo_backup.csv")
+ZENODO_PARSED = os.path.join(SCRIPT_DIR, ".cache", "zenodo_plants.jsonl")
+BLOCK = 1 << 16   # characters fed to the parser at a time
+STAGE = "zenodo"
 
 # Zenodo field names → prefixed column names
 ZENODO_PREFIX = "zn_"
 
 # ── helpers ────────────────────────────────────────────────────────────────────
 
-def parse_zenodo_html(path):
-    """Return (field_names, list[dict]) from the transposed HTML table."""
+class _TableRows(HTMLParser):
+    """Event handlers collecting the cell texts of each ``<tr>`` of the first
+    table into ``rows``; the caller drains ``rows`` after every ``feed``."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._tables = 0      # tables seen
+        self._depth = 0       # open tables (only the first one is read)
+        self._row = None      # cells of the row being read
+        self._cell = None     # text nodes of the cell being read
+        self._text = []       # pieces of the current text node
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag == "table":
+            self._tables += 1
+            self._depth += 1
+        elif self._tables != 1 or self._depth != 1:
+            return
+        elif tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag == "table":
+            self._depth -= 1
+        elif self._tables != 1 or self._depth != 1:
+            return
+        elif tag == "td" and self._cell is not None:
+            self._row.append("".join(self._cell))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._text.append(data)   # a text node can arrive split across feeds
+
+    def _flush(self):
+        # Each text node stripped and empty ones dropped, as BeautifulSoup's
+        # get_text(strip=True) does
+        if self._text:
+            text = "".join(self._text).strip()
+            if text:
+                self._cell.append(text)
+            self._text.clear()
+
+
+def iter_table_rows(path, block=BLOCK):
+    """Yield the ``<td>`` texts of every row of the first table in *path*,
+    reading it *block* characters at a time (no tree is built)."""
+    parser = _TableRows()
     with open(path, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f.read(), "html.parser")
-
-    table = soup.find("table")
-    rows = table.find_all("tr")
-
+        for chunk in iter(lambda: f.read(block), ""):
+            parser.feed(chunk)
+            yield from parser.rows
+            parser.rows.clear()
+    parser.close()
+    yield from parser.rows
+
+
+def _record(field_names, cells):
+    record = {}
+    for fname, val in zip(field_names, cells):
+        if fname:  # skip empty-named columns
+            record[fname] = val
+    return record
+
+
+def iter_zenodo_html(path):
+    """Yield the field names, then the cells of each plant row of the
+    transposed HTML table (rows without a ``name`` skipped)."""
+    rows = iter_table_rows(path)
+    next(rows, None)   # column letters
     # Row 1 (first data row) holds the field names as cell values
-    field_names = [c.get_text(strip=True) for c in rows[1].find_all("td")]
+    field_names = next(rows, [])
+    yield field_names
+    for cells in rows:
+        if _record(field_names, cells).get("name"):
+            yield cells[:len(field_names)]
 
-    plants = []
-    for row in rows[2:]:
-        cells = [c.get_text(strip=True) for c in row.find_all("td")]
-        record = {}
-        for fname, val in zip(field_names, cells):
-            if fname:  # skip empty-named columns
-                record[fname] = val
-        if record.get("name"):
-            plants.append(record)
 
-    return field_names, plants
+def parse_zenodo_html(path):
+    """Return (field_names, list[dict]) from the transposed HTML table."""
+    rows = iter_zenodo_html(path)
+    field_names = next(rows)
+    return field_names, [_record(field_names, cells) for cells in rows]
 
 
 def make_zenodo_key(name):
@@ -63,103 +159,151 @@ def make_existing_key(genus, species):
     return re.sub(r"\s+", " ", f"{genus} {species}".strip()).lower()
 
 
-def add_source(current, tag="zenodo"):
-    """Append *tag* to a ``+``-separated sources string if not already there."""
-    parts = [s.strip() for s in current.split("+") if s.strip()]
-    if tag not in parts:
-        parts.append(tag)
-    return "+".join(parts)
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
 
-# ── main ───────────────────────────────────────────────────────────────────────
-
-def main():
-    # 1. Parse Zenodo
+def parse_to_cache(html=ZENODO_HTML, output=ZENODO_PARSED):
+    """Stream the export into the sidecar *output*, unless it already holds
+    the parse of this exact file. Returns the HTML's SHA-1."""
+    digest = file_hash(html)
+    if _sidecar_hash(output) == digest:
+        print(f"[zenodo] {os.path.basename(html)} unchanged – using {output}")
+        return digest
     print("[zenodo] Parsing HTML …")
-    field_names, zenodo_plants = parse_zenodo_html(ZENODO_HTML)
+    started = time.time()
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    count = 0
+    with open(output + ".tmp", "w", encoding="utf-8") as f:
+        rows = iter_zenodo_html(html)
+        f.write(json.dumps({"sha1": digest, "fields": next(rows)}, ensure_ascii=False) + "\n")
+        for cells in rows:
+            f.write(json.dumps(cells, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    os.replace(output + ".tmp", output)
+    print(f"[zenodo] {count} plants → {output} ({time.time() - started:.2f}s)")
+    return digest
+
+
+def read_cached(parsed=ZENODO_PARSED):
+    """``(field_names, list[dict])`` from the sidecar."""
+    with open(parsed, encoding="utf-8") as f:
+        field_names = json.loads(f.readline())["fields"]
+        return field_names, [_record(field_names, json.loads(line)) for line in f]
+
+
+def cached_keys(parsed=ZENODO_PARSED):
+    """``make_zenodo_key`` of every plant in the sidecar – the row key a
+    plant gets when it is added as a new row – without building records.
+    Empty when there is no sidecar."""
+    if not os.path.exists(parsed):
+        return []
+    with open(parsed, encoding="utf-8") as f:
+        field_names = json.loads(f.readline())["fields"]
+        if "name" not in field_names:
+            return []
+        at = len(field_names) - 1 - field_names[::-1].index("name")
+        return [make_zenodo_key(cells[at]) for cells in map(json.loads, f) if at < len(cells)]
+
+
+def load_zenodo(html=ZENODO_HTML, parsed=ZENODO_PARSED):
+    """Parse the export, or read the parse cached for its current hash."""
+    parse_to_cache(html, parsed)
+    return read_cached(parsed)
+
+
+def _sidecar_hash(parsed):
+    try:
+        with open(parsed, encoding="utf-8") as f:
+            return json.loads(f.readline()).get("sha1")
+    except (OSError, ValueError):
+        return None
+
+
+def merge_cached(parsed=ZENODO_PARSED):
+    """Merge the records kept by ``parse_to_cache`` into the store."""
+    field_names, zenodo_plants = read_cached(parsed)
+    with PlantDataset() as dataset:
+        merge_into(dataset, field_names, zenodo_plants)
+
+
+def merge_into(dataset, field_names, zenodo_plants):
+    """Write the ``zn_`` cells, ``sources`` tags and new rows into *dataset*."""
     # Filter field_names to non-empty
     field_names = [f for f in field_names if f]
     zn_columns = [f"{ZENODO_PREFIX}{f}" for f in field_names]
     print(f"[zenodo] Found {len(zenodo_plants)} plants, {len(field_names)} fields")
 
-    # 2. Read existing CSV
-    print("[csv] Reading existing plant_data.csv …")
-    with open(PLANT_CSV, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        existing_fields = list(reader.fieldnames)
-        existing_rows = list(reader)
-    print(f"[csv] {len(existing_rows)} existing rows, {len(existing_fields)} columns")
-
-    # 3. Backup
-    shutil.copy2(PLANT_CSV, BACKUP_CSV)
-    print(f"[csv] Backup saved → {BACKUP_CSV}")
-
-    # 4. Build lookup of existing rows by scientific name key
-    key_to_idx = {}
-    for idx, row in enumerate(existing_rows):
+    # 1. Build lookup of existing rows by scientific name key (Genus and
+    #    Species only; this stage's own appended rows don't count)
+    key_to_row = {}
+    for row_key, row in dataset.read(["Genus", "Species"], exclude_stage=STAGE):
         key = make_existing_key(row.get("Genus", ""), row.get("Species", ""))
-        if key and key not in key_to_idx:
-            key_to_idx[key] = idx
-
-    # 5. Determine output field order (existing + new zn_ columns)
-    new_columns = [c for c in zn_columns if c not in existing_fields]
-    output_fields = existing_fields + new_columns
-
-    # Ensure every existing row has placeholders for new columns
-    for row in existing_rows:
-        for col in new_columns:
-            row.setdefault(col, "")
-
-    # 6. Merge
-    matched = 0
-    added = 0
-    seen_keys = set()
-
-    for zplant in zenodo_plants:
-        zkey = make_zenodo_key(zplant.get("name", ""))
-        if not zkey or zkey in seen_keys:
-            continue
-        seen_keys.add(zkey)
-
-        # Build the zn_ dict for this plant
-        zn_data = {}
-        for fname in field_names:
-            zn_data[f"{ZENODO_PREFIX}{fname}"] = zplant.get(fname, "")
-
-        if zkey in key_to_idx:
-            # ── matched: enrich existing row ──
-            idx = key_to_idx[zkey]
-            for col, val in zn_data.items():
-                existing_rows[idx][col] = val
-            existing_rows[idx]["sources"] = add_source(
-                existing_rows[idx].get("sources", ""), "zenodo"
-            )
-            matched += 1
-        else:
-            # ── new plant: create a stub row ──
-            new_row = {col: "" for col in output_fields}
-            # Fill zn_ columns
-            for col, val in zn_data.items():
-                new_row[col] = val
-            # Also populate the core identifying columns from Zenodo
-            parts = zplant["name"].split(None, 1)
-            new_row["Genus"] = parts[0] if parts else ""
-            new_row["Species"] = parts[1] if len(parts) > 1 else ""
-            new_row["CommonName"] = zplant.get("commonName", "")
-            new_row["Family"] = zplant.get("Family", "")
-            new_row["sources"] = "zenodo"
-            existing_rows.append(new_row)
-            added += 1
-
-    print(f"[merge] {matched} matched (enriched), {added} new plants added")
-    print(f"[merge] Total rows: {len(existing_rows)}, Total columns: {len(output_fields)}")
-
-    # 7. Write output
-    with open(PLANT_CSV, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=output_fields, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(existing_rows)
-    print(f"[done] Written → {PLANT_CSV}")
+        if key and key not in key_to_row:
+            key_to_row[key] = row_key
+    print(f"[dataset] {len(key_to_row)} existing genus+species keys")
+
+    # 2. Match Zenodo names to those rows (plant_names.py: exact, then
+    #    canonical / species-level), each row claimed once
+    zkeys = list(dict.fromkeys(k for k in (make_zenodo_key(z.get("name", "")) for z in zenodo_plants) if k))
+    suggestions = []
+    joined = match_unique(NameMatcher(key_to_row), zkeys, suggestions)
+    tiers = Counter(m.tier for m in joined.values())
+    print(f"[zenodo] Matched by {', '.join(f'{tier} {n}' for tier, n in tiers.most_common()) or 'nothing'}")
+    if suggestions:
+        print(f"[zenodo] {describe_suggestions(suggestions)}")
+
+    # 3. Merge, each row encoded into a compact table as it is built
+    counts = Counter()
+
+    def merged_rows():
+        seen_keys = set()
+        for zplant in zenodo_plants:
+            zkey = make_zenodo_key(zplant.get("name", ""))
+            if not zkey or zkey in seen_keys:
+                continue
+            seen_keys.add(zkey)
+
+            # Build the zn_ dict for this plant
+            zn_data = {}
+            for fname in field_names:
+                zn_data[f"{ZENODO_PREFIX}{fname}"] = zplant.get(fname, "")
+            zn_data["sources"] = "zenodo"
+
+            if zkey in joined:
+                # ── matched: enrich existing row ──
+                counts["matched"] += 1
+                yield key_to_row[joined[zkey].target], zn_data
+            else:
+                # ── new plant: a stub row with the core identifying columns ──
+                parts = zplant["name"].split(None, 1)
+                zn_data["Genus"] = parts[0] if parts else ""
+                zn_data["Species"] = parts[1] if len(parts) > 1 else ""
+                zn_data["CommonName"] = zplant.get("commonName", "")
+                zn_data["Family"] = zplant.get("Family", "")
+                counts["added"] += 1
+                yield zkey, zn_data
+
+    patch = PlantTable.from_rows(merged_rows(), zn_columns)
+    print(f"[merge] {counts['matched']} matched (enriched), {counts['added']} new plants added")
+
+    # 4. Write this stage's cells
+    dataset.write_columns(STAGE, patch.keys, patch.columns())
+    print(f"[merge] Total rows: {len(dataset)}")
+
+
+# ── main ───────────────────────────────────────────────────────────────────────
+
+def main():
+    field_names, zenodo_plants = load_zenodo()
+    with PlantDataset() as dataset:
+        merge_into(dataset, field_names, zenodo_plants)
+        if os.environ.get("NO_EXPORT") != "1":
+            dataset.export_csv(PLANT_CSV)
 
 
 if __name__ == "__main__":
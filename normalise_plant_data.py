@@ -0,0 +1,261 @@
+"""
+normalise_plant_data.py
+-----------------------
+Adds typed, pre-parsed columns to the canonical dataset store
+(plant_dataset.py), so the site filters on numbers and bitmasks instead of
+re-parsing the scraped text of every plant on every filter change.
+
+    zone_min, zone_max      USDA zones, from ``HardinessZones`` ("5 to 9",
+                            "4-8", "7"; "None to None" gives nothing)
+    height_m, width_m       metres, from ``Height`` / ``Width`` (the upper
+                            end of a range; cm, ft and in converted)
+    ph_min, ph_max          from the numbers in ``pH`` ("5.5-7"), otherwise
+                            the bands of its classes ("Acid, neutral and
+                            basic"; ``PH_BANDS``) and of ``pH_split``
+    bloom_months,           12-bit masks, bit 0 = January, from ``Flower``
+    ripen_months            and ``Ripen`` ("April to June", wrapping past
+                            December, or month names)
+    soil_bits               ``SOILS`` bits: light / medium / heavy, from the
+                            ``Soils`` list (sandy, loamy, clay count too)
+    pollinator_bits         ``POLLINATORS`` bits, from the ``Pollinators``
+                            list
+
+Values that can't be read stay empty, as do masks with no bit set. The
+page code (docs/index.html, docs/dashboard.html) keeps the same
+``MONTHS`` / ``SOILS`` / ``POLLINATORS`` order as this module, and
+docs/plant_data.js repeats ``typed_row`` for CSV rows that lack the typed
+columns; change them together.
+
+Only the merge stage's rows carry these source columns, so only those are
+read. The typed cells are written as a patch keyed by row key
+(``patch=True`` in plant_dataset.py), and this stage runs beside the
+zenodo and kew stages.
+
+``--csv`` adds the typed columns to an exported CSV in place instead, for
+the scheduled workflow, which has no store and replaces
+docs/plant_data.csv with the raw scraper output.
+
+Run:
+    python normalise_plant_data.py
+    NO_EXPORT=1 python normalise_plant_data.py      # update the store only
+    python normalise_plant_data.py --csv docs/plant_data.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+from collections import Counter
+
+from plant_dataset import EXPORT_CSV, PlantDataset
+
+STAGE      = "typed"
+BASE_STAGE = "merge"   # the stage whose text columns are parsed
+
+SOURCE_COLUMNS = ["HardinessZones", "Height", "Width", "pH", "pH_split", "Flower", "Ripen",
+                  "Soils", "Pollinators"]
+TYPED_COLUMNS  = ["zone_min", "zone_max", "height_m", "width_m", "ph_min", "ph_max",
+                  "bloom_months", "ripen_months", "soil_bits", "pollinator_bits"]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+SOILS = ["light", "medium", "heavy"]
+SOIL_WORDS = {"light": "light", "sandy": "light", "sand": "light",
+              "medium": "medium", "loamy": "medium", "loam": "medium",
+              "heavy": "heavy", "clay": "heavy"}
+# Bit order is shared with the pages; only add names at the end (31 at most,
+# so a mask stays a JS small integer)
+POLLINATORS = ["Bees", "Flies", "Insects", "Wind", "Self", "Lepidoptera", "Beetles",
+               "Moths", "Butterflies", "Apomictic", "Cleistogamous", "Birds", "Bats",
+               "Wasps", "Midges", "Hoverflies", "Bumblebees", "Water", "Slugs", "Snails",
+               "Thrips", "Sawflies", "Ants"]
+
+# Conventional soil pH bands of the classes PFAF names
+PH_BANDS = {
+    "very acid":      (4.5, 5.5),
+    "acid":           (5.5, 6.5),
+    "neutral":        (6.5, 7.5),
+    "basic":          (7.5, 8.5),
+    "alkaline":       (7.5, 8.5),
+    "very alkaline":  (8.5, 9.5),
+}
+UNITS = {"cm": 0.01, "mm": 0.001, "ft": 0.3048, "feet": 0.3048, "in": 0.0254, "inches": 0.0254}
+
+_ZONE_RANGE_RE  = re.compile(r"(\d+)\s*(?:to|-|–)\s*(\d+)")
+_ZONE_SINGLE_RE = re.compile(r"^(\d+)$")
+_NUMBER_RE      = re.compile(r"\d+(?:\.\d+)?")
+_UNIT_RE        = re.compile(r"[a-z]+")
+_PH_CLASS_RE    = re.compile(r"very acid|very alkaline|acid|neutral|basic|alkaline")
+_MONTH_RANGE_RE = re.compile(r"([A-Za-z]+)\s+to\s+([A-Za-z]+)", re.IGNORECASE)
+_WORD_RE        = re.compile(r"[a-z]+")
+
+_POLLINATOR_BIT = {name.lower(): i for i, name in enumerate(POLLINATORS)}
+
+
+def _number(value):
+    return f"{value:g}"
+
+
+def zone_range(text):
+    """``(zone_min, zone_max)`` of a ``HardinessZones`` cell, or None."""
+    text = (text or "").strip()
+    match = _ZONE_RANGE_RE.search(text)
+    if match:
+        low, high = int(match.group(1)), int(match.group(2))
+        return min(low, high), max(low, high)
+    match = _ZONE_SINGLE_RE.match(text)
+    if match:
+        return int(match.group(1)), int(match.group(1))
+    return None
+
+
+def metres(text):
+    """A size in metres: the largest number of *text*, converted from the
+    unit that follows it (metres when there is none), or None."""
+    text = (text or "").strip().lower()
+    numbers = [float(n) for n in _NUMBER_RE.findall(text)]
+    if not numbers:
+        return None
+    unit = _UNIT_RE.search(text, _NUMBER_RE.search(text).end())
+    return max(numbers) * UNITS.get(unit.group(0) if unit else "", 1.0)
+
+
+def ph_range(ph, ph_split=""):
+    """``(ph_min, ph_max)`` from the numbers in *ph*, otherwise from the
+    bands of the classes named in *ph* and *ph_split*, or None."""
+    numbers = [float(n) for n in _NUMBER_RE.findall(ph or "") if 0 <= float(n) <= 14]
+    if numbers:
+        return min(numbers), max(numbers)
+    bands = [PH_BANDS[name] for name in _PH_CLASS_RE.findall(f"{ph} {ph_split}".lower())]
+    if not bands:
+        return None
+    return min(low for low, _ in bands), max(high for _, high in bands)
+
+
+def _month(word):
+    """Index of a month name, or of the month its first three letters
+    start (so "Sept" and "sep" work), or -1."""
+    if word in MONTHS:
+        return MONTHS.index(word)
+    prefix = word[:3].lower()
+    return next((i for i, name in enumerate(MONTHS) if name.lower().startswith(prefix)), -1)
+
+
+def month_mask(text):
+    """12-bit mask of the months in a ``Flower`` / ``Ripen`` cell."""
+    if not text:
+        return 0
+    match = _MONTH_RANGE_RE.search(text)
+    if match:
+        start, end = _month(match.group(1)), _month(match.group(2))
+        if start < 0 or end < 0:
+            return 0
+        months = range(start, end + 1) if end >= start else list(range(start, 12)) + list(range(end + 1))
+        return sum(1 << i for i in months)
+    lower = text.lower()
+    return sum(1 << i for i, name in enumerate(MONTHS) if name.lower() in lower)
+
+
+def soil_bits(text):
+    """``SOILS`` bits of a ``Soils`` cell (a list literal or free text)."""
+    words = {SOIL_WORDS.get(word) for word in _WORD_RE.findall((text or "").lower())}
+    return sum(1 << i for i, name in enumerate(SOILS) if name in words)
+
+
+def pollinator_bits(text, unknown=None):
+    """``POLLINATORS`` bits of a ``Pollinators`` cell. Words of the cell
+    that name no pollinator are counted in *unknown*, when given."""
+    bits = 0
+    for word in _WORD_RE.findall((text or "").lower()):
+        bit = _POLLINATOR_BIT.get(word, _POLLINATOR_BIT.get(f"{word}s"))
+        if bit is not None:
+            bits |= 1 << bit
+        elif unknown is not None and word not in ("and", "or", "by", "the", "also", "other", "mainly"):
+            unknown[word] += 1
+    return bits
+
+
+def typed_row(row, unknown=None):
+    """The ``TYPED_COLUMNS`` cells of one row of ``SOURCE_COLUMNS``."""
+    typed = {}
+    zones = zone_range(row.get("HardinessZones"))
+    if zones:
+        typed["zone_min"], typed["zone_max"] = str(zones[0]), str(zones[1])
+    for col, target in (("Height", "height_m"), ("Width", "width_m")):
+        size = metres(row.get(col))
+        if size is not None:
+            typed[target] = _number(round(size, 2))
+    ph = ph_range(row.get("pH", ""), row.get("pH_split", ""))
+    if ph:
+        typed["ph_min"], typed["ph_max"] = _number(ph[0]), _number(ph[1])
+    masks = {
+        "bloom_months":     month_mask(row.get("Flower")),
+        "ripen_months":     month_mask(row.get("Ripen")),
+        "soil_bits":        soil_bits(row.get("Soils")),
+        "pollinator_bits":  pollinator_bits(row.get("Pollinators"), unknown),
+    }
+    typed.update((col, str(mask)) for col, mask in masks.items() if mask)
+    return typed
+
+
+def normalise(dataset):
+    """Parse the merge stage's rows and write the typed cells as a patch."""
+    unknown = Counter()
+    keys, columns = [], {col: [] for col in TYPED_COLUMNS}
+    for row_key, row in dataset.read(SOURCE_COLUMNS, stage=BASE_STAGE):
+        typed = typed_row(row, unknown)
+        keys.append(row_key)
+        for col, values in columns.items():
+            values.append(typed.get(col, ""))
+    filled = {col: sum(1 for value in values if value) for col, values in columns.items()}
+    print(f"[typed] {len(keys)} rows: " + ", ".join(f"{col} {n}" for col, n in filled.items()))
+    if unknown:
+        print(f"[typed] Words in Pollinators that name no pollinator: "
+              f"{', '.join(f'{word} ({n})' for word, n in unknown.most_common(10))}")
+    dataset.write_columns(STAGE, keys, columns, patch=True)
+
+
+def normalise_store():
+    """The build stage: normalise the default store."""
+    with PlantDataset() as dataset:
+        normalise(dataset)
+
+
+def normalise_csv(path=EXPORT_CSV):
+    """Write the typed columns into the CSV at *path*: appended when it lacks
+    them, recomputed from the text columns when it has them."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header = list(reader.fieldnames or [])
+        rows = list(reader)
+    header += [col for col in TYPED_COLUMNS if col not in header]
+    unknown = Counter()
+    for row in rows:
+        typed = typed_row(row, unknown)
+        row.update((col, typed.get(col, "")) for col in TYPED_COLUMNS)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    print(f"[typed] {len(rows)} rows of {path}: " + ", ".join(
+        f"{col} {sum(1 for row in rows if row[col])}" for col in TYPED_COLUMNS))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add the typed columns to the dataset store or a CSV")
+    parser.add_argument("--csv", metavar="PATH", nargs="?", const=EXPORT_CSV,
+                        help="Add them to an exported CSV in place instead (default docs/plant_data.csv)")
+    args = parser.parse_args(argv)
+    if args.csv:
+        normalise_csv(args.csv)
+        return
+    with PlantDataset() as dataset:
+        normalise(dataset)
+        if os.environ.get("NO_EXPORT") != "1":
+            dataset.export_csv(EXPORT_CSV)
+
+
+if __name__ == "__main__":
+    main()
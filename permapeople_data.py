@@ -1,8 +1,9 @@
-import requests
-import csv
 from dotenv import load_dotenv
 import os
-import time
+
+from http_cache import HttpCache
+from permapeople_store import PlantStore, export_csv, sync_store
+from permapeople_sync import PermapeopleClient
 
 # Load environment variables from .env file
 load_dotenv()
@@ -31,6 +32,9 @@ REFERENCE_COLUMNS = [
     "pests_diseases", "notes"
 ]
 
+# Data keys whose values are ranges (e.g. "6.0-6.5"), split into _min/_max
+RANGE_KEYS = {"soil_ph", "height", "width", "usda_hardiness_zone"}
+
 # Function to process range values (e.g., "6.0-6.5")
 def parse_range(value):
     try:
@@ -41,95 +45,59 @@ def parse_range(value):
     except (ValueError, IndexError):
         return None, None
 
-# Function to fetch data from the API using last_id for pagination
-def fetch_api_data(last_id, headers):
-    params = {"last_id": last_id} if last_id else {}
-    try:
-        response = requests.get(API_URL, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data: {e}")
-        return None
-
-# Function to save data to a CSV file
-def save_to_csv(data, filename):
-    if not data:
-        print("No data to write to CSV.")
-        return
-
-    # Prepare rows and keys
-    rows = []
-    keys_with_types = {}
-
-    for plant in data:
-        # Flatten the main plant record (excluding 'data' key for now)
-        plant_details = {k: plant[k] for k in plant if k != 'data'}
-        
-        # Flatten the 'data' key which contains multiple dictionaries
-        data_details = {}
-        if 'data' in plant:
-            for data_item in plant['data']:
-                key = data_item.get('key', '').strip().lower().replace(" ", "_")  # Normalize keys
-                value = data_item.get('value', '')
-
-                # Check for range-like values and handle them
-                if "-" in value and key in {"soil_ph", "height", "width","usda_hardiness_zone"}:  # Add other range keys as needed
-                    min_value, max_value = parse_range(value)
-                    data_details[f"{key}_min"] = min_value
-                    data_details[f"{key}_max"] = max_value
-                else:
-                    data_details[key] = value
-
-        # Merge plant details and data details
-        full_record = {**plant_details, **data_details}
-        
-        # Track all keys for the header
-        for key in full_record.keys():
-            keys_with_types[key] = ""  # Leave types as empty for now
-
-        # Prepare row for CSV
-        rows.append(full_record)
-
-    # Writing to CSV
-    try:
-        with open(filename, mode="w", newline="", encoding="utf-8") as file:
-            # Create header from all keys
-            header = list(keys_with_types.keys())
-            writer = csv.DictWriter(file, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(rows)
-
-        print(f"Data successfully written to {filename}")
-    except Exception as e:
-        print(f"Error writing to CSV: {e}")
+# Function to flatten one plant: the 'data' key/value list becomes columns.
+# Shared by merge_plant_data.py. Values may be numbers, booleans or lists as
+# well as strings; only string ranges are split, and a range that doesn't
+# parse is kept as it is.
+def flatten_plant(plant):
+    # Flatten the main plant record (excluding 'data' key for now)
+    plant_details = {k: plant[k] for k in plant if k != 'data'}
+
+    # Flatten the 'data' key which contains multiple dictionaries
+    data_details = {}
+    for data_item in plant.get('data') or ():
+        key = str(data_item.get('key') or '').strip().lower().replace(" ", "_")  # Normalize keys
+        value = data_item.get('value', '')
+
+        # Check for range-like values and handle them
+        if key in RANGE_KEYS and isinstance(value, str) and "-" in value:
+            min_value, max_value = parse_range(value)
+            if min_value is not None or max_value is not None:
+                data_details[f"{key}_min"] = min_value
+                data_details[f"{key}_max"] = max_value
+                continue
+        data_details[key] = value
+
+    # Merge plant details and data details
+    return {**plant_details, **data_details}
 
 def main():
-    all_plants = []  # To collect all plants across multiple batches
-    last_id = None  # Start without a last_id
-
-    while True:
-        print(f"Fetching data starting after ID {last_id}...")
-        response = fetch_api_data(last_id, HEADERS)
-
-        if response and 'plants' in response:
-            plants = response['plants']
-            if not plants:  # No more data to fetch
-                break
-            all_plants.extend(plants)  # Add fetched plants to the list
-            
-            # Update last_id to the ID of the last plant fetched
-            last_id = plants[-1]["id"]
-            time.sleep(1)  # Respectful delay between requests
-        else:
-            print("No more data or error occurred.")
-            break
-    
-    if all_plants:
-        print(f"Fetched {len(all_plants)} records.")
-        output_filename = "permapeople_plants_expanded.csv"
-        print("Saving expanded data to CSV...")
-        save_to_csv(all_plants, output_filename)
+    # Plants are mirrored in a local SQLite store: only ids past its
+    # watermark are fetched (plus a full refresh weekly, or with PP_REFRESH=1)
+    # and the CSV is regenerated from the store
+    output_filename = "permapeople_plants_expanded.csv"
+    cache = None if os.getenv("NO_CACHE") == "1" else HttpCache()
+    workers = int(os.getenv("PP_WORKERS", "4"))  # parallel cursors over id ranges
+    client = PermapeopleClient(API_URL, headers=HEADERS, cache=cache, pool_size=workers)
+    store = PlantStore()
+
+    print("Fetching data …")
+    try:
+        summary = sync_store(client, store, workers, refresh=os.getenv("PP_REFRESH") == "1")
+        if summary["error"]:
+            print(f"Sync stopped early ({summary['error']}) – run again to resume.")
+        rows = export_csv(store, output_filename, flatten_plant) if len(store) else 0
+    finally:
+        client.close()
+        store.close()
+    client.report()
+    if cache:
+        cache.report()
+        cache.close()
+
+    if rows:
+        print(f"Fetched {rows} records.")
+        print(f"Data successfully written to {output_filename}")
     else:
         print("No records found or failed to fetch data.")
 
@@ -0,0 +1,175 @@
+"""
+permapeople_store.py
+--------------------
+Local mirror of the Permapeople plants API in one SQLite file, so the
+expanded CSV can be rebuilt without the network and later syncs only
+fetch what changed.
+
+- ``plants`` holds every plant's raw JSON keyed by ``id``, with its
+  ``updated_at``.
+- ``meta.watermark`` is the highest id mirrored. A regular sync pages on
+  from the watermark only, because new plants get new, higher ids.
+- The API cannot list "changed since", so edits to older plants are picked
+  up by a refresh. A refresh is a full, parallel pull (see
+  permapeople_sync) that only rewrites rows whose ``updated_at`` changed
+  and drops ids the API no longer serves. It runs when forced, or when the
+  last one is older than ``refresh_days``. Its cursors are kept in
+  ``meta``, so an interrupted refresh resumes.
+- ``export_csv`` flattens every stored plant into the expanded CSV in one
+  pass over the table.
+
+Usage:
+    store = PlantStore()
+    sync_store(client, store)
+    export_csv(store, "permapeople_plants_expanded.csv", flatten)
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import time
+
+from permapeople_sync import new_ranges, pull
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DB   = os.path.join(SCRIPT_DIR, ".cache", "permapeople_store.sqlite")
+
+DAY = 24 * 60 * 60
+REFRESH_DAYS = 7
+
+
+class PlantStore:
+    def __init__(self, path=STORE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS plants (
+                id         INTEGER PRIMARY KEY,
+                updated_at TEXT,
+                seen_at    REAL NOT NULL,
+                body       TEXT NOT NULL
+            )""")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM plants").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def get_meta(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        if value is None:
+            self._db.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        self._db.commit()
+
+    @property
+    def watermark(self):
+        return self.get_meta("watermark", 0)
+
+    def apply(self, plants, seen_at, extra_meta=None):
+        """Upsert one page of plants in a single transaction. Returns
+        ``(added, changed)``. Unchanged rows only get their ``seen_at``
+        bumped."""
+        if not plants:
+            return 0, 0
+        ids = [p["id"] for p in plants]
+        existing = {row[0]: row[1:] for row in self._db.execute(
+            f"SELECT id, updated_at, body FROM plants WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        writes, touched, added = [], [], 0
+        for plant in plants:
+            body = json.dumps(plant, ensure_ascii=False)
+            old = existing.get(plant["id"])
+            updated_at = plant.get("updated_at")
+            if old is None:
+                added += 1
+            elif old[0] == updated_at and (updated_at is not None or old[1] == body):
+                touched.append((seen_at, plant["id"]))
+                continue
+            writes.append((plant["id"], updated_at, seen_at, body))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO plants VALUES (?, ?, ?, ?)", writes)
+            self._db.executemany("UPDATE plants SET seen_at = ? WHERE id = ?", touched)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('watermark', ?)",
+                             (json.dumps(max(self.watermark, max(ids))),))
+            for key, value in (extra_meta or {}).items():
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        return added, len(writes) - added
+
+    def remove_unseen(self, since):
+        """Drop plants a completed refresh started at *since* did not see."""
+        with self._db:
+            return self._db.execute("DELETE FROM plants WHERE seen_at < ?", (since,)).rowcount
+
+    def plants(self):
+        """Every stored plant as parsed JSON, by id."""
+        for (body,) in self._db.execute("SELECT body FROM plants ORDER BY id"):
+            yield json.loads(body)
+
+
+def sync_store(client, store, workers=4, refresh=False, refresh_days=REFRESH_DAYS):
+    """Bring *store* up to date. Returns counts plus ``error`` (``None`` when
+    the sync finished)."""
+    state = store.get_meta("refresh")
+    due = refresh or state is not None or time.time() - store.get_meta("refreshed_at", 0) > refresh_days * DAY
+    summary = {"mode": "refresh" if due else "incremental", "added": 0, "changed": 0, "removed": 0,
+               "error": None}
+    started = time.time()
+
+    if due:
+        if state is None:
+            try:
+                state = {"started": started, "ranges": new_ranges(client, workers)}
+            except Exception as e:
+                summary["error"] = f"{e} while sampling ids"
+                return summary
+            store.set_meta("refresh", state)
+        else:
+            print(f"  resuming refresh ({sum(not r['done'] for r in state['ranges'])} cursor ranges left)")
+    else:
+        print(f"  fetching plants after id {store.watermark}")
+        state = {"ranges": [{"start": store.watermark, "stop": None, "cursor": store.watermark,
+                             "done": False}]}
+
+    def on_page(plants):
+        added, changed = store.apply(plants, time.time(), {"refresh": state} if due else None)
+        summary["added"] += added
+        summary["changed"] += changed
+        print(f"  {summary['added']} added, {summary['changed']} changed …", end="\r")
+
+    summary["error"] = pull(client, state["ranges"], on_page, workers if due else 1)
+    print()
+    if due and summary["error"] is None:
+        summary["removed"] = store.remove_unseen(state["started"])
+        store.set_meta("refreshed_at", state["started"])
+        store.set_meta("refresh", None)
+    print(f"[permapeople] {summary['mode']} sync: {summary['added']} added  |  {summary['changed']} changed  |  "
+          f"{summary['removed']} removed  |  {len(store)} stored  |  watermark {store.watermark}  "
+          f"({time.time() - started:.1f}s)")
+    return summary
+
+
+def export_csv(store, csv_path, flatten):
+    """Write the expanded CSV from the store alone. Returns the row count."""
+    rows, fieldnames = [], {}
+    for plant in store.plants():
+        record = flatten(plant)
+        for key in record:
+            fieldnames.setdefault(key, None)
+        rows.append(record)
+    tmp = csv_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(fieldnames))
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, csv_path)
+    return len(rows)
@@ -0,0 +1,368 @@
+"""
+permapeople_sync.py
+-------------------
+Streaming, resumable pull of the Permapeople plants API, shared by
+``merge_plant_data.py`` and ``permapeople_data.py``.
+
+- Every page is flattened and appended to ``<csv>.partial.jsonl`` the
+  moment it arrives. Each cursor's ``last_id`` is checkpointed in
+  ``<csv>.sync.json`` after each page, so an interrupted or failed sync
+  resumes from the last page it finished instead of starting over.
+- Requests go through a ``TokenBucket`` instead of fixed sleeps. The rate
+  grows on every success and is halved on a 429, and all callers are held
+  back until the server's ``Retry-After`` has passed. The pull settles at
+  whatever rate the API tolerates.
+- 429 / 5xx responses and connection errors are retried with backoff. A
+  sync only gives up (keeping its checkpoint) once retries run out.
+- ``workers`` > 1 samples the id space and runs that many cursors in
+  parallel over ``(start, stop]`` id ranges, all behind the same bucket.
+- When every cursor runs dry the staging file becomes the CSV: lines are
+  indexed and sorted by ``id`` (so the result does not depend on how many
+  cursors ran), de-duplicated, and written after a header-union pass.
+
+Usage:
+    client = PermapeopleClient(headers=..., cache=HttpCache())
+    sync_to_csv(client, "permapeople_plants_expanded.csv", flatten, workers=4)
+"""
+
+import collections
+import csv
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pfaf_fetch import RETRY_STATUSES, _retry_after
+
+API_URL = "https://permapeople.org/api/plants"
+RANGES_PER_WORKER = 4   # id ranges per cursor, so a dense range does not stall one worker
+
+
+class TokenBucket:
+    """Adaptive request-rate limiter shared by every caller of one API.
+
+    Tokens refill at ``rate`` per second up to ``burst``. ``success()`` grows
+    the rate by ``growth`` (up to ``max_rate``). ``throttled()`` halves it
+    and blocks every ``acquire()`` until the server's ``Retry-After`` has
+    passed.
+    """
+
+    def __init__(self, rate=5.0, burst=2, max_rate=50.0, min_rate=0.2, growth=1.2):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.growth = growth
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def refund(self):
+        """Give back a token that did not turn into a request (cache hit)."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * self.growth)
+
+    def throttled(self, retry_after=None):
+        with self._lock:
+            # Parallel callers hit by the same burst of 429s halve the rate once
+            if time.monotonic() >= self._blocked_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+
+
+class PermapeopleClient:
+    """Pooled, rate-limited, retrying reader of the ``last_id``-paged API."""
+
+    def __init__(self, url=API_URL, headers=None, cache=None, bucket=None, retries=5,
+                 backoff=1.0, timeout=30, pool_size=8):
+        self.url = url
+        self.headers = dict(headers or {})
+        self.cache = cache
+        self.bucket = bucket or TokenBucket()
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"requests": 0, "cached": 0, "revalidated": 0, "retries": 0, "throttled": 0}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def page(self, last_id=None):
+        """The plants after *last_id* (``[]`` once the cursor runs dry).
+        Raises after ``retries`` failed attempts."""
+        params = {"last_id": last_id} if last_id else {}
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                if self.cache is not None:
+                    response = self.cache.get(self.session, self.url, headers=self.headers, params=params,
+                                              timeout=self.timeout)
+                else:
+                    response = self.session.get(self.url, headers=self.headers, params=params,
+                                                timeout=self.timeout)
+            except requests.RequestException:
+                self._count("requests")
+                if attempt == self.retries:
+                    raise
+                delay = None
+            else:
+                if getattr(response, "from_cache", False):
+                    if response.revalidated:
+                        # a 304 still went to the server
+                        self._count("requests")
+                        self._count("revalidated")
+                        self.bucket.success()
+                    else:
+                        self.bucket.refund()
+                        self._count("cached")
+                    return response.json().get("plants", [])
+                self._count("requests")
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    self.bucket.success()
+                    return response.json().get("plants", [])
+                if attempt == self.retries:
+                    response.raise_for_status()
+                delay = _retry_after(response)
+                if response.status_code == 429:
+                    self._count("throttled")
+                    self.bucket.throttled(delay)
+                    delay = 0
+            self._count("retries")
+            time.sleep(delay if delay is not None else random.uniform(0, self.backoff * 2 ** attempt))
+
+    def report(self, label="permapeople"):
+        s = self.stats
+        print(f"[{label}] {s['requests']} requests ({s['revalidated']} revalidated, 304)  |  "
+              f"{s['cached']} from cache  |  {s['retries']} retries  |  "
+              f"{s['throttled']} throttled (429)  |  limiter at {self.bucket.rate:.1f} req/s")
+
+
+def _write_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def sample_ranges(client, n):
+    """Split the id space into *n* ``(start, stop]`` cursor ranges.
+
+    Probes ``last_id`` values (doubling, then bisecting) to bound the
+    largest id, then cuts ``[first id, bound]`` into equal widths. The first
+    range starts at the beginning of the cursor and the last one is
+    open-ended, so ids outside the sample are still covered. Uneven density
+    is absorbed by handing ranges to workers from a shared queue.
+    """
+    first = client.page(None)
+    page_size = len(first)
+    if n <= 1 or not first:
+        return [(None, None)]
+    low = first[0]["id"]
+    lo, hi, step = first[-1]["id"], None, max(first[-1]["id"] - low, 1)
+    while hi is None:
+        page = client.page(lo + step)
+        if not page:
+            hi = lo + step
+        elif len(page) < page_size:
+            hi = page[-1]["id"]
+            break
+        else:
+            lo, step = page[-1]["id"], step * 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        page = client.page(mid)
+        if not page:
+            hi = mid
+        elif len(page) < page_size:
+            hi = page[-1]["id"]
+            break
+        else:
+            lo = page[-1]["id"]
+    if hi - low < n:
+        return [(None, None)]
+    bounds = [low - 1 + (hi - low + 1) * i // n for i in range(1, n)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _index_lines(f):
+    """``[(id, offset), ...]`` of a binary JSON-lines file, sorted by id."""
+    index, offset = [], 0
+    for line in f:
+        index.append((json.loads(line).get("id"), offset))
+        offset += len(line)
+    index.sort(key=lambda item: (item[0] is None, item[0] or 0))
+    return index
+
+
+def staging_to_csv(staging, csv_path):
+    """Turn flattened JSON lines into a CSV ordered by ``id``, whose header
+    is the union of every record's keys in that order. A repeated id is
+    written once. Returns the number of rows written."""
+    with open(staging, "rb") as f:
+        index = _index_lines(f)
+
+        def records():
+            previous = object()
+            for plant_id, offset in index:
+                if plant_id == previous and plant_id is not None:
+                    continue
+                previous = plant_id
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+        fieldnames = {}
+        for record in records():
+            for key in record:
+                fieldnames.setdefault(key, None)
+
+        rows = 0
+        tmp = csv_path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=list(fieldnames))
+            writer.writeheader()
+            for record in records():
+                writer.writerow(record)
+                rows += 1
+    os.replace(tmp, csv_path)
+    return rows
+
+
+def new_ranges(client, workers):
+    """Fresh cursor ranges for a pull with *workers* cursors (one
+    open-ended range when sequential)."""
+    ranges = sample_ranges(client, workers * RANGES_PER_WORKER) if workers > 1 else [(None, None)]
+    if len(ranges) > 1:
+        print(f"  {len(ranges)} id ranges over {workers} cursors")
+    return [{"start": a, "stop": b, "cursor": a, "done": False} for a, b in ranges]
+
+
+def pull(client, ranges, on_page, workers=1):
+    """Page every unfinished range dict in *ranges* to its ``stop`` on up to
+    *workers* threads.
+
+    After each page the range's ``cursor`` / ``done`` are updated and
+    ``on_page(plants)`` is called with the plants inside the range, under a
+    lock shared by all threads. Returns ``None`` on success or a description
+    of the first request error, after which no new range is started.
+    """
+    pending = collections.deque(r for r in ranges if not r["done"])
+    errors = []
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                if errors or not pending:
+                    return
+                r = pending.popleft()
+            while not r["done"]:
+                try:
+                    plants = client.page(r["cursor"])
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{e} – stopped after id {r['cursor']}")
+                    return
+                kept = [p for p in plants if r["stop"] is None or p["id"] <= r["stop"]]
+                with lock:
+                    if kept:
+                        r["cursor"] = kept[-1]["id"]
+                    r["done"] = not plants or len(kept) < len(plants)
+                    on_page(kept)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(min(workers, len(pending)) or 1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors[0] if errors else None
+
+
+def sync_to_csv(client, csv_path, flatten, resume=True, workers=1):
+    """Pull every plant into *csv_path*, flattening each with *flatten*.
+
+    With *workers* > 1 the id space is sampled first (``sample_ranges``) and
+    that many cursors run in parallel, each from one range boundary to the
+    next. All of them share the client's token bucket, so the request rate
+    stays within what the API allows.
+
+    Returns the number of rows written, or ``None`` if the sync stopped
+    early. In that case the staging file and checkpoint (one cursor per
+    range) are kept, and the next call with *resume* continues after the
+    last finished page of every range.
+    """
+    staging, state_path = csv_path + ".partial.jsonl", csv_path + ".sync.json"
+    state = None
+    if resume and os.path.exists(state_path) and os.path.exists(staging):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        left = sum(not r["done"] for r in state["ranges"])
+        print(f"  resuming {left} of {len(state['ranges'])} cursor ranges "
+              f"({state['records']} records already staged)")
+    if state is None:
+        try:
+            state = {"ranges": new_ranges(client, workers), "records": 0}
+        except Exception as e:
+            print(f"  [!] Request error while sampling ids: {e}")
+            return None
+
+    started = time.time()
+    with open(staging, "a" if state["records"] else "w", encoding="utf-8") as out:
+        def on_page(plants):
+            out.writelines(json.dumps(flatten(p), ensure_ascii=False) + "\n" for p in plants)
+            out.flush()
+            state["records"] += len(plants)
+            _write_state(state_path, state)
+            rate = state["records"] / max(time.time() - started, 1e-9)
+            print(f"  fetched {state['records']} records so far ({rate:.0f}/s) …", end="\r")
+
+        error = pull(client, state["ranges"], on_page, workers)
+
+    print()
+    if error:
+        print(f"  [!] Request error: {error}, re-run to resume")
+        return None
+    if not state["records"]:
+        os.remove(staging)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return 0
+    rows = staging_to_csv(staging, csv_path)
+    os.remove(staging)
+    os.remove(state_path)
+    return rows
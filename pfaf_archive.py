@@ -0,0 +1,193 @@
+"""
+pfaf_archive.py
+---------------
+Append-only archive of the raw PFAF species pages, so a parser fix can be
+applied to the whole catalog without touching the network.
+
+Layout (both files only ever grow):
+
+    pages.warc.gz   one gzip member per page, each a WARC-style record:
+                        WARC/1.0
+                        WARC-Type: response
+                        WARC-Target-URI: <url>
+                        WARC-Date: <UTC timestamp>
+                        Content-Length: <n>
+
+                        <page bytes>
+    pages.idx       JSON lines: name, genus, species, url, offset, length,
+                    sha1, fetched_at. The last line for a name wins.
+
+Every record is its own gzip member, so it can be read with one seek, and
+the file is still a valid ``.warc.gz`` stream for other tools. A page whose
+bytes match the latest archived copy is not appended again. The record is
+written and flushed before its index line, so a crash can at worst leave
+an unindexed tail that is ignored.
+
+``reparse`` runs ``parse_plant_info`` over the latest copy of every page in
+a process pool. Each worker reads its own slice of the archive, so only
+file offsets cross the process boundary. The archive keeps the pages of
+species PFAF has since dropped, so a reparse can be limited to the names
+of the current catalog (the output's manifest, see pfaf_delta).
+
+Only one process should append to a given archive at a time. Workers of a
+distributed crawl each need their own ``--archive``.
+"""
+
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pfaf_extract import parse_plant_info
+from pfaf_pipeline import RowWriter, latin_key
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, ".cache", "pfaf_archive")
+CHUNK = 64   # records handed to a reparse worker at a time
+
+
+class PageArchive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.data_path = os.path.join(directory, "pages.warc.gz")
+        self.index_path = os.path.join(directory, "pages.idx")
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "unchanged": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.index[entry["name"]] = entry
+        self._data = open(self.data_path, "ab")
+        self._idx = open(self.index_path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._idx.close()
+
+    def add(self, genus, species, url, content):
+        """Archive one fetched page unless it is identical to the latest copy."""
+        name = latin_key(genus, species)
+        digest = hashlib.sha1(content).hexdigest()
+        now = time.time()
+        header = (f"WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: {url}\r\n"
+                  f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))}\r\n"
+                  f"Content-Length: {len(content)}\r\n\r\n").encode("utf-8")
+        record = gzip.compress(header + content + b"\r\n\r\n", compresslevel=6)
+        with self._lock:
+            latest = self.index.get(name)
+            if latest and latest["sha1"] == digest:
+                self.stats["unchanged"] += 1
+                return
+            offset = self._data.seek(0, os.SEEK_END)
+            self._data.write(record)
+            self._data.flush()
+            entry = {"name": name, "genus": genus, "species": species, "url": url,
+                     "offset": offset, "length": len(record), "sha1": digest, "fetched_at": now}
+            self._idx.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._idx.flush()
+            self.index[name] = entry
+            self.stats["stored"] += 1
+
+    def read(self, name):
+        """Latest archived bytes of *name*'s page, or ``None``."""
+        entry = self.index.get(name)
+        if entry is None:
+            return None
+        with open(self.data_path, "rb") as f:
+            return read_record(f, entry)
+
+    def report(self, label="archive"):
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        print(f"[{label}] {self.stats['stored']} pages stored  |  {self.stats['unchanged']} unchanged  |  "
+              f"{len(self.index)} species archived  |  {size / 1_048_576:.1f} MB")
+
+
+def open_archive(archive):
+    """``True`` → the default archive, a path → that archive, ``False`` or
+    ``None`` → ``None``, else *archive* itself (an open ``PageArchive``,
+    which may still be empty)."""
+    if archive is True:
+        return PageArchive()
+    if isinstance(archive, str):
+        return PageArchive(archive)
+    if archive is False:
+        return None
+    return archive
+
+
+def read_record(f, entry):
+    """Page bytes of the record described by index *entry* in open file *f*."""
+    f.seek(entry["offset"])
+    record = gzip.decompress(f.read(entry["length"]))
+    head, _, rest = record.partition(b"\r\n\r\n")
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            return rest[:int(line.split(b":", 1)[1])]
+    return rest[:-4]
+
+
+def _parse_chunk(data_path, entries):
+    """Reparse worker: read and parse a slice of the archive."""
+    rows = []
+    with open(data_path, "rb") as f:
+        for entry in entries:
+            try:
+                rows.append(parse_plant_info(read_record(f, entry), entry["genus"], entry["species"],
+                                             entry["url"]))
+            except Exception as e:
+                print(f"Failed to reparse {entry['name']}: {e}")
+                rows.append(None)
+    return rows
+
+
+def reparse(archive, output, fieldnames, workers=None, names=None):
+    """Rebuild *output* from the archive alone, from the pages of *names*
+    only when given. Returns the number of rows."""
+    started = time.time()
+    # Archive order keeps the output close to the original crawl order
+    entries = sorted((entry for name, entry in archive.index.items() if names is None or name in names),
+                     key=lambda e: e["offset"])
+    if names is not None:
+        print(f"[reparse] {len(entries)} of {len(archive.index)} archived species are in the catalog "
+              f"({len(names) - len(entries)} listed but not archived)")
+    chunks = [entries[i:i + CHUNK] for i in range(0, len(entries), CHUNK)]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+
+    writer = RowWriter(output, fieldnames)
+    pool = concurrent.futures.ProcessPoolExecutor(workers) if workers > 0 else None
+    failed = 0
+    try:
+        parsed = (pool.map if pool else map)(_parse_chunk, [archive.data_path] * len(chunks), chunks)
+        for rows in parsed:
+            for row in rows:
+                if row is None:
+                    failed += 1
+                else:
+                    writer.write(row)
+    finally:
+        writer.close()
+        if pool:
+            pool.shutdown()
+
+    elapsed = time.time() - started
+    print(f"[reparse] {writer.rows} plants from {len(entries)} archived pages in {elapsed:.1f}s "
+          f"({len(entries) / max(elapsed, 1e-9):.0f} pages/s, {failed} failed) → {output}")
+    return writer.rows
@@ -0,0 +1,184 @@
+"""
+pfaf_delta.py
+-------------
+Incremental ("delta") PFAF crawl.
+
+A manifest next to the scraper output records, for every Latin name, a hash
+of its CSV row and when it was last fetched. A delta run then:
+
+1. walks the listing pages only (a few hundred small requests),
+2. fetches species that are new or whose last fetch is older than
+   ``max_age_days``,
+3. rewrites the full output in one streaming pass — changed rows replaced,
+   species gone from the listings dropped, new species appended — and
+4. writes an ``added`` / ``changed`` / ``removed`` diff next to it.
+
+Species are only dropped under letters whose listing partitions were all
+walked to the end; when a listing page fails, the rows under its letter are
+kept and a warning is logged.
+
+Full crawls refresh the manifest from their output, so any full run can be
+the baseline for the next delta.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+
+from pfaf_pipeline import Checkpoint, RowWriter, latin_key, run_crawl, walk_partitions
+
+DAY = 24 * 60 * 60
+
+
+def manifest_path(output):
+    return f"{os.path.splitext(output)[0]}_manifest.json"
+
+
+def delta_path(output):
+    return f"{os.path.splitext(output)[0]}_delta.csv"
+
+
+def csv_values(row):
+    """Row values exactly as they read back from the CSV."""
+    return ["" if v is None else str(v) for v in row]
+
+
+def row_hash(values):
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """``{latin name: {"hash": ..., "fetched_at": ...}}`` persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def record(self, name, digest, fetched_at):
+        self.entries[name] = {"hash": digest, "fetched_at": fetched_at}
+
+    def stale(self, name, max_age):
+        entry = self.entries.get(name)
+        return entry is None or time.time() - entry["fetched_at"] > max_age
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def rebuild_from(self, output, fieldnames, fetched_at=None):
+        """Hash every row of a finished full crawl."""
+        fetched_at = fetched_at or time.time()
+        self.entries = {}
+        for name, values in _read_rows(output, fieldnames):
+            self.record(name, row_hash(values), fetched_at)
+        self.save()
+
+
+def _read_rows(path, fieldnames):
+    """Stream ``(latin name, values)`` from a scraper CSV output."""
+    if not os.path.exists(path):
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            values = [row.get(col) or "" for col in fieldnames]
+            yield latin_key(row.get("Genus", ""), row.get("Species", "")), values
+
+
+def run_delta(output, fieldnames, walk_letter, fetch_row, letters, workers=16, max_age_days=180):
+    """Delta crawl against *output*; see the module docstring. Returns counts."""
+    manifest = Manifest(manifest_path(output))
+    max_age = max_age_days * DAY
+    started = time.time()
+
+    # 1. Listing walk only
+    listed, failed = {}, set()
+    walk_partitions(letters, walk_letter,
+                    lambda genus, species: listed.setdefault(latin_key(genus, species), (genus, species)),
+                    failed=failed)
+    if not manifest.entries and os.path.exists(output):
+        print(f"[delta] No manifest yet – hashing existing {output}")
+        manifest.rebuild_from(output, fieldnames, fetched_at=os.path.getmtime(output))
+
+    to_fetch = [pair for name, pair in listed.items() if manifest.stale(name, max_age)]
+    # Only species under the letters actually walked, and walked in full,
+    # can have disappeared
+    incomplete = {partition[:1].upper() for partition in failed}
+    unlisted = {name for name in manifest.entries
+                if name[:1].upper() in letters and name not in listed}
+    removed = {name for name in unlisted if name[:1].upper() not in incomplete}
+    if incomplete:
+        print(f"[delta] WARNING: listing incomplete for {', '.join(sorted(incomplete))} – keeping "
+              f"{len(unlisted) - len(removed)} unlisted species there instead of removing them")
+    print(f"[delta] {len(listed)} species listed  |  {len(to_fetch)} new or stale  |  "
+          f"{len(removed)} no longer listed")
+
+    # 2. Fetch new / stale species into a side file
+    fetched_path = output + ".fetched.csv"
+    writer = RowWriter(fetched_path, fieldnames)
+    checkpoint = Checkpoint(fetched_path + ".done")
+    try:
+        counts = run_crawl(["delta"], lambda _: iter(to_fetch), fetch_row, writer, checkpoint,
+                           workers=workers)
+    finally:
+        writer.close()
+        checkpoint.close()
+    fetched = dict(_read_rows(fetched_path, fieldnames))
+    now = time.time()
+
+    # 3. One streaming pass: old output → new output + diff
+    summary = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "failed": counts["failed"]}
+    tmp = output + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as out_f, \
+            open(delta_path(output), "w", newline="", encoding="utf-8") as diff_f:
+        out = csv.writer(out_f, quoting=csv.QUOTE_MINIMAL)
+        diff = csv.writer(diff_f, quoting=csv.QUOTE_MINIMAL)
+        out.writerow(fieldnames)
+        diff.writerow(["change"] + fieldnames)
+
+        seen = set()
+        for name, values in _read_rows(output, fieldnames):
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in removed:
+                diff.writerow(["removed"] + values)
+                summary["removed"] += 1
+                continue
+            new_values = fetched.get(name)
+            if new_values is not None:
+                digest = row_hash(new_values)
+                if digest != row_hash(values):
+                    diff.writerow(["changed"] + new_values)
+                    summary["changed"] += 1
+                else:
+                    summary["unchanged"] += 1
+                manifest.record(name, digest, now)
+                values = new_values
+            out.writerow(values)
+
+        for name, values in fetched.items():
+            if name not in seen:
+                out.writerow(values)
+                diff.writerow(["added"] + values)
+                manifest.record(name, row_hash(values), now)
+                summary["added"] += 1
+
+    os.replace(tmp, output)
+    for name in removed:
+        manifest.entries.pop(name, None)
+    manifest.save()
+    for path in (fetched_path, fetched_path + ".done"):
+        os.remove(path)
+
+    print(f"[delta] {summary['added']} added  |  {summary['changed']} changed  |  "
+          f"{summary['removed']} removed  |  {summary['unchanged']} unchanged  |  "
+          f"{summary['failed']} failed  ({time.time() - started:.1f}s)")
+    print(f"[delta] Diff → {delta_path(output)}")
+    return summary
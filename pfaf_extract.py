@@ -0,0 +1,275 @@
+"""
+pfaf_extract.py
+---------------
+Parsing side of the PFAF scraper: turns the raw bytes of a species page into
+a CSV row, without any network access.
+
+``parse_plant_info`` only builds the parts of the page it reads (the
+description meta, the ``ContentPlaceHolder1_*`` spans and the image table)
+using a ``SoupStrainer``, uses lxml when it is installed, and collects the
+tags it reads by id in one walk over that tree. ``ParseStage``
+runs it in a process pool so parsing is not serialised behind the GIL of
+the fetch threads.
+
+``extract_description`` is the single-pass extractor for the species summary
+held in ``<meta id="description">``.
+
+The summary is a fixed sentence template, e.g.::
+
+    Malus domestica is a deciduous Tree growing to 10 m (32ft) by 8 m (26ft)
+    at a medium rate. ... It is in leaf from April to November, in flower from
+    April to May, and the seeds ripen from August to October. ...
+
+Instead of building a word list and running a ``list.index`` scan (often two)
+per field, the description is whitespace-normalised once, each anchor word
+("is", "growing", "by", "leaf", ...) is located with one substring search, and
+every field is read from the few words following its anchor. The free-text
+fields use module-level compiled patterns. This step alone runs at about
+the speed of the original (the old index scans were already C-bound); the
+gain is in the page parse around it.
+
+Field semantics match what ``get_plant_info`` has always written to the CSV
+(see benchmarks/bench_pfaf_extract.py for the parity check), except that a
+missing piece no longer raises and drops the whole plant.
+"""
+
+import concurrent.futures
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Only these elements (and their children) are built into the tree
+_PAGE_STRAINER = SoupStrainer(
+    ["meta", "span", "table"],
+    attrs={"id": re.compile(r"^(?:description$|ContentPlaceHolder1_)")},
+)
+
+# Words the fixed-offset fields hang off
+_ANCHORS = tuple((word, f" {word} ") for word in
+                 ("is", "growing", "rate.", "by", "leaf", "flower", "ripen", "pH:"))
+
+_POLLINATED_BY = "pollinated by"
+_SUITABLE_FOR  = "Suitable for:"
+
+_SOIL_RE         = re.compile(r"(light|medium|heavy)")
+_PH_SPLIT_RE     = re.compile(r",| and ")
+_REPRODUCTION_RE = re.compile(r"The species is\s(\w+)")
+_PREFERENCES_RE  = re.compile(r"prefers (.*?) and")
+_TOLERANCES_RE   = re.compile(r"can tolerate (.*?)\.")
+_RATING_RE       = re.compile(r"\d")
+
+
+@dataclass
+class PlantDescription:
+    """Typed fields parsed from one PFAF description.
+
+    List fields are ``None`` when the description has no such sentence, and a
+    (possibly empty) list when it does.
+    """
+    plant_type:   Optional[str] = None
+    foliage:      Optional[str] = None
+    height:       Optional[float] = None
+    width:        Optional[float] = None
+    growth_rate:  str = ""
+    pollinators:  Optional[list] = None
+    leaf:         str = ""
+    flower:       str = ""
+    ripen:        str = ""
+    reproduction: str = ""
+    soils:        Optional[list] = None
+    ph:           str = ""
+    ph_split:     list = field(default_factory=list)
+    preferences:  str = ""
+    tolerances:   str = ""
+
+
+def _words(text, pos, n):
+    """The first *n* words of the single-spaced ``text[pos:]``."""
+    return text[pos:pos + 160].split(" ", n)[:n]
+
+
+def _float_word(text, pos, n):
+    """Word *n* (0-based) after *pos* as a float, or ``None``."""
+    try:
+        return float(_words(text, pos, n + 1)[n])
+    except (ValueError, IndexError):
+        return None
+
+
+def _period(text, pos, strip, single=True):
+    """Read "in <Month>" (when *single*) or "from <Month> to <Month>"
+    following the anchor word at *pos*."""
+    words = _words(text, pos, 5)
+    if len(words) < 2:
+        return ""
+    if single and words[1] == "in" and len(words) > 2:
+        return words[2].strip(strip)
+    if words[1] == "from":
+        return " ".join(words[2:5]).strip(strip)
+    return ""
+
+
+def extract_description(description):
+    """Parse a PFAF ``meta#description`` string into a ``PlantDescription``."""
+    rec = PlantDescription()
+
+    # Single-spaced and padded, so " word " finds the first whole word exactly
+    # where ``description.split().index(word)`` would. Re-joining the split
+    # words is cheaper than scanning for irregular whitespace first.
+    text = f" {' '.join(description.split())} "
+    first = {}
+    for word, padded in _ANCHORS:
+        pos = text.find(padded)
+        if pos != -1:
+            first[word] = pos + 1
+
+    is_pos, growing_pos = first.get("is"), first.get("growing")
+    if is_pos is not None and growing_pos is not None:
+        rec.plant_type = " ".join(text[is_pos:growing_pos].split()[2:]).title()
+        words = rec.plant_type.split(" ")
+        rec.foliage = words[0] if len(words) == 2 else None
+    if growing_pos is not None:
+        rec.height = _float_word(text, growing_pos, 2)
+    if "by" in first:
+        rec.width = _float_word(text, first["by"], 1)
+    if "rate." in first:
+        before = text[:first["rate."]].rsplit(None, 1)
+        rec.growth_rate = before[-1] if before else text.split()[-1]
+
+    if "leaf" in first:
+        rec.leaf = _period(text, first["leaf"], ",", single=False)
+    if "flower" in first:
+        rec.flower = _period(text, first["flower"], ",")
+    if "ripen" in first:
+        rec.ripen = _period(text, first["ripen"], ".")
+
+    if "pH:" in first:
+        tail = text[first["pH:"]:].split()[1:]
+        end = next((i for i, x in enumerate(tail) if "soil" in x), len(tail))
+        rec.ph = " ".join(tail[:end]).replace(" (mildly alkaline)", "").capitalize()
+        rec.ph_split = _PH_SPLIT_RE.split(rec.ph.replace(" soils", "").replace(" can grow in", ""))
+
+    start = description.find(_POLLINATED_BY)
+    if start != -1:
+        start += len(_POLLINATED_BY) + 1
+        end = description.find(".", start)
+        text = description[start:end] if end != -1 else description[start:]
+        rec.pollinators = [p.strip().capitalize() for p in text.split(",")]
+
+    start = description.find(_SUITABLE_FOR)
+    if start != -1:
+        rec.soils = _SOIL_RE.findall(description[start:description.find(".", start)])
+
+    match = _REPRODUCTION_RE.search(description)
+    if match:
+        rec.reproduction = match.group(1).capitalize()
+    match = _PREFERENCES_RE.search(description)
+    if match:
+        rec.preferences = match.group(1).strip().capitalize()
+    match = _TOLERANCES_RE.search(description)
+    if match:
+        rec.tolerances = match.group(1).capitalize()
+
+    return rec
+
+
+def parse_rating(text):
+    """First digit of a PFAF rating span such as ``" (4 of 5)"``, or ``""``."""
+    match = _RATING_RE.search(text or "")
+    return match.group(0) if match else ""
+
+
+def parse_plant_info(content, genus, species, pfaf_url):
+    """Build the ``pfaf_generator.attributes`` row from a species page."""
+    soup = BeautifulSoup(content, PARSER, parse_only=_PAGE_STRAINER)
+    # One walk over the strained tree instead of a find() per field
+    by_id = {}
+    for tag in soup.find_all(id=True):
+        by_id.setdefault(tag["id"], tag)
+    meta = by_id.get("description")
+    desc = extract_description(meta.get("content", "") if meta is not None and meta.name == "meta" else "")
+
+    def span(span_id):
+        tag = by_id.get(span_id)
+        return tag.text if tag is not None and tag.name == "span" else ""
+
+    common_name = span("ContentPlaceHolder1_lblCommanName")
+    family = span("ContentPlaceHolder1_lblFamily")
+    hardiness_range = span("ContentPlaceHolder1_lblUSDAhardiness")
+
+    zone_min, zone_max = None, None
+    match = re.search(r'(\d+)\-(\d+)', hardiness_range)
+    if match:
+        zone_min, zone_max = match.groups()
+
+    habitats = re.sub(r"\[\d+\]", "", span("ContentPlaceHolder1_txtHabitats"))
+    habitat_range = span("ContentPlaceHolder1_lblRange")
+
+    edibility = parse_rating(span("ContentPlaceHolder1_txtEdrating"))
+    other_uses = parse_rating(span("ContentPlaceHolder1_txtOtherUseRating"))
+    medicinal_rating = parse_rating(span("ContentPlaceHolder1_txtMedRating"))
+
+    img_url = ''
+    details_table = by_id.get('ContentPlaceHolder1_tblPlantImges')
+    if details_table is not None and details_table.name == 'table':
+        img_tag = details_table.find('img')
+        if img_tag:
+            img_url = 'https://pfaf.org' + img_tag['src'][2:]
+
+    pollinators = '' if desc.pollinators is None else desc.pollinators
+    soils = '' if desc.soils is None else desc.soils
+    return [
+        family, genus, species, common_name, desc.growth_rate, f"{zone_min} to {zone_max}", desc.height, desc.width,
+        desc.plant_type, desc.foliage, pollinators, desc.leaf, desc.flower, desc.ripen, desc.reproduction, soils,
+        desc.ph, desc.ph_split, desc.preferences, desc.tolerances, habitats, habitat_range, edibility,
+        medicinal_rating, other_uses, pfaf_url, img_url
+    ]
+
+
+class ParseStage:
+    """Process pool for the CPU-bound parse step.
+
+    ``submit`` blocks once ``backlog`` pages are waiting, so fetch threads
+    slow down instead of queueing every downloaded page in memory.
+    ``workers=0`` parses inline on the calling thread.
+    """
+
+    def __init__(self, workers=None, backlog=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._pool = (concurrent.futures.ProcessPoolExecutor(self.workers)
+                      if self.workers > 0 else None)
+        self._slots = threading.BoundedSemaphore(backlog or max(self.workers, 1) * 4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=True)
+
+    def submit(self, content, genus, species, pfaf_url):
+        if self._pool is None:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(parse_plant_info(content, genus, species, pfaf_url))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        future = self._pool.submit(parse_plant_info, content, genus, species, pfaf_url)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
@@ -0,0 +1,174 @@
+"""
+pfaf_fetch.py
+-------------
+Connection-pooled fetch engine used by the PFAF scraper.
+
+- One shared ``requests.Session`` with a keep-alive connection pool, so detail
+  pages reuse TCP/TLS connections instead of opening a new one per plant.
+- A bounded worker pool (``max_in_flight``) plus a per-host semaphore, so
+  detail requests from every letter are pipelined without hammering one host.
+- In-flight de-duplication: submitting the same key (Latin name) twice while
+  the first request is still running returns the same future.
+- Retry with jittered exponential backoff on connection errors and on
+  429 / 5xx responses.
+- Optional ``http_cache.HttpCache`` so re-crawls are served from disk or
+  revalidated with conditional requests. A revalidation still counts as a
+  request, and as ``revalidated`` in ``stats``.
+
+The engine is thread based on purpose: the scraper, the listing crawl and the
+parsers are all synchronous ``requests`` / BeautifulSoup code.
+"""
+
+import concurrent.futures
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
+}
+
+# Statuses worth retrying; everything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchEngine:
+    """Pooled, bounded, de-duplicating HTTP fetcher.
+
+    Use as a context manager::
+
+        with FetchEngine(max_in_flight=16) as engine:
+            fut = engine.submit("Malus domestica", url, parse)
+            row = fut.result()
+    """
+
+    def __init__(self, max_in_flight=16, per_host=None, retries=3, backoff=0.5,
+                 timeout=30, headers=None, cache=None):
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.per_host = per_host or max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="pfaf-fetch"
+        )
+        # Backpressure: producers block once this many detail fetches are queued
+        self._pending = threading.BoundedSemaphore(max_in_flight * 4)
+        self._hosts = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "revalidated": 0, "retries": 0, "deduped": 0, "failed": 0, "bytes": 0}
+
+    # ── context manager ───────────────────────────────────────────────────────
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    # ── fetching ──────────────────────────────────────────────────────────────
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def get(self, url, **kwargs):
+        """Blocking GET with retries. Returns the final response (any status)
+        or raises the last connection error once retries are exhausted."""
+        slot = self._host_slot(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with slot:
+                    if self.cache is not None:
+                        response = self.cache.get(self.session, url, timeout=self.timeout, **kwargs)
+                    else:
+                        response = self.session.get(url, timeout=self.timeout, **kwargs)
+                if getattr(response, "from_cache", False):
+                    if response.revalidated:
+                        self._count("requests")
+                        self._count("revalidated")
+                    return response
+                self._count("requests")
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    self._count("bytes", len(response.content))
+                    return response
+                delay = _retry_after(response)
+            except requests.RequestException:
+                self._count("requests")
+                if attempt == self.retries:
+                    self._count("failed")
+                    raise
+                delay = None
+            self._count("retries")
+            # Full jitter: spreads retries of a burst of failed requests out
+            time.sleep(delay if delay is not None
+                       else random.uniform(0, self.backoff * 2 ** attempt))
+
+    def submit(self, key, url, callback=None):
+        """Schedule a GET of *url* on the pool and return a future.
+
+        If *callback* is given the future resolves to ``callback(response)``,
+        so parsing happens on the same worker. A second submit with a *key*
+        that is still in flight returns the existing future.
+        """
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self.stats["deduped"] += 1
+                return existing
+
+        self._pending.acquire()
+        with self._lock:
+            # Another producer may have won the race while we waited
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self._pending.release()
+                self.stats["deduped"] += 1
+                return existing
+            future = self._executor.submit(self._run, url, callback)
+            self._in_flight[key] = future
+
+        def _done(_, key=key):
+            with self._lock:
+                self._in_flight.pop(key, None)
+            self._pending.release()
+
+        future.add_done_callback(_done)
+        return future
+
+    def _run(self, url, callback):
+        response = self.get(url)
+        return callback(response) if callback else response
+
+
+def _retry_after(response):
+    """Seconds to wait from a ``Retry-After`` header, if it is numeric."""
+    value = response.headers.get("Retry-After", "")
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -24,11 +24,33 @@ Date:5/22/2024
 """
 
 #####################################
-import requests
-from bs4 import BeautifulSoup
-import re
-import csv
-import concurrent.futures
+import argparse
+import os
+import string
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from http_cache import HttpCache
+from pfaf_archive import open_archive, reparse
+from pfaf_delta import Manifest, manifest_path, run_delta
+from pfaf_extract import PARSER, ParseStage, parse_plant_info
+from pfaf_fetch import FetchEngine
+from pfaf_pipeline import Checkpoint, ListingError, RowWriter, Split, latin_key, run_crawl, written_names
+from pfaf_queue import DEFAULT_BATCH, DEFAULT_LEASE_SECONDS, WorkQueue, run_coordinator, run_worker
+
+# Override to point the scraper at a stand-in server (see benchmarks/)
+PFAF_BASE = os.environ.get("PFAF_BASE_URL", "https://pfaf.org/user/")
+LATIN_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# A listing chain longer than this many pages is handed on as sub-prefixes
+SPLIT_AFTER_PAGES = 3
+MAX_PREFIX_LEN = 3
+
+# Listing pages: only the results grid and the "Next" link are needed
+_LISTING_STRAINER = SoupStrainer(
+    ["table", "a"],
+    attrs={"id": ["ContentPlaceHolder1_gvresults", "ContentPlaceHolder1_gvresults_ctl23_LinkButtonNext"]},
+)
 
 attributes = [
     "Family", "Genus", "Species", "CommonName", "GrowthRate", "HardinessZones",
@@ -37,138 +59,37 @@ attributes = [
     "Edibility", "Medicinal", "OtherUses", "PFAF", "Image URL"
 ]
 
-def get_plant_info(genus, species=""):
-    pfaf_url = f"https://pfaf.org/user/Plant.aspx?LatinName={genus}+{species}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
-    }
-    response = requests.get(pfaf_url, headers=headers)
-    if response.status_code != 200:
-        return None
-
-    soup = BeautifulSoup(response.content, 'html.parser')
-    description = soup.find("meta", id="description")['content']
-    description_list = description.split()
+def plant_url(genus, species=""):
+    return f"{PFAF_BASE}Plant.aspx?LatinName={genus}+{species}"
 
-    # Extracting characteristics
-    plant_type, foliage, height, width, growth_rate = None, None, None, None, ""
-    try:
-        type_idx = description_list.index("is") + 2
-        growing_idx = description_list.index("growing")
-        plant_type = " ".join(description_list[type_idx:growing_idx]).title()
-        foliage = plant_type.split(' ')[0] if len(plant_type.split(' ')) == 2 else None
-    except ValueError:
-        pass
-
-    try:
-        height_idx = description_list.index("growing") + 2
-        height = float(description_list[height_idx])
-    except (ValueError, IndexError):
-        pass
+def listing_url(prefix):
+    return f"{PFAF_BASE}DatabaseSearhResult.aspx?LatinName={prefix}"
 
-    if "rate." in description_list:
-        growth_rate = description_list[description_list.index("rate.") - 1]
+def get_plant_info(genus, species="", engine=None):
+    pfaf_url = plant_url(genus, species)
+    if engine is None:
+        with FetchEngine(max_in_flight=1) as engine:
+            response = engine.get(pfaf_url)
+    else:
+        response = engine.get(pfaf_url)
+    if response.status_code != 200:
+        return None
+    return parse_plant_info(response.content, genus, species, pfaf_url)
 
-    try:
-        width_idx = description_list.index("by") + 1
-        width = float(description_list[width_idx])
-    except (ValueError, IndexError):
-        pass
-
-    pollinators, leaf, flower, ripen_date, soils, ph, ph_split, reproduction, preferences, tolerances = '', '', '', '', '', '', [], '', '', ''
-    if "pollinated by" in description:
-        pollinators_start = description.index("pollinated by") + len("pollinated by") + 1
-        pollinators_end = description.index(".", pollinators_start)
-        pollinators = [p.strip().capitalize() for p in description[pollinators_start:pollinators_end].split(',')]
-
-    if "leaf" in description_list:
-        leaf_idx = description_list.index("leaf")
-        if description_list[leaf_idx + 1] == "from":
-            leaf = " ".join(description_list[leaf_idx + 2: leaf_idx + 5]).strip(",")
-
-    if "flower" in description_list:
-        flower_idx = description_list.index("flower")
-        if description_list[flower_idx + 1] == "in":
-            flower = description_list[flower_idx + 2].strip(",")
-        elif description_list[flower_idx + 1] == "from":
-            flower = " ".join(description_list[flower_idx + 2: flower_idx + 5]).strip(",")
-
-    if "ripen" in description_list:
-        tmp_idx = description_list.index("ripen")
-        if description_list[tmp_idx + 1] == "in":
-            ripen_date = description_list[tmp_idx + 2].strip(".")
-        elif description_list[tmp_idx + 1] == "from":
-            ripen_date = " ".join(description_list[tmp_idx + 2: tmp_idx + 5]).strip(".")
-
-    soil_idx = description.find("Suitable for:")
-    if soil_idx != -1:
-        soil_text = description[soil_idx:description.find(".", soil_idx)]
-        soils = re.findall(r"(light|medium|heavy)", soil_text)
-
-    # Extracting and correlating pH values
-    if "pH:" in description_list:
-        ph_idx = description_list.index("pH:") + 1
-        ph_list = description_list[ph_idx:]
-        end_idx = next((i for i, x in enumerate(ph_list) if 'soil' in x), len(ph_list))
-        ph = " ".join(ph_list[:end_idx]).replace(r' (mildly alkaline)', '').capitalize()
-        ph_split = re.split(',| and ', ph.replace(' soils', '').replace(' can grow in', ''))
-
-    reproduction_match = re.findall(r"The species is\s(\w+)", description)
-    if reproduction_match:
-        reproduction = reproduction_match[0].capitalize()
-
-    preferences_match = re.findall(r"prefers (.*?) and", description)
-    if preferences_match:
-        preferences = preferences_match[0].strip().capitalize()
-
-    tolerances_match = re.findall(r"can tolerate (.*?)\.", description)
-    if tolerances_match:
-        tolerances = tolerances_match[0].capitalize()
-
-    table = soup.find("table", class_="table table-hover table-striped")
-    common_name = table.find("span", id="ContentPlaceHolder1_lblCommanName").text
-    family = table.find("span", id="ContentPlaceHolder1_lblFamily").text
-    hardiness_range = table.find("span", id="ContentPlaceHolder1_lblUSDAhardiness").text
-
-    # Extract hardiness zones and correlate them
-    hardiness_zones = []
-    zone_min, zone_max = None, None
-    match = re.search(r'(\d+)\-(\d+)', hardiness_range)
-    if match:
-        zone_min, zone_max = match.groups()
-        hardiness_zones = list(range(int(zone_min), int(zone_max) + 1))
-
-    habitats = re.sub(r"\[\d+\]", "", table.find("span", id="ContentPlaceHolder1_txtHabitats").text)
-    habitat_range = table.find("span", id="ContentPlaceHolder1_lblRange").text
-
-    edibility = table.find("span", id="ContentPlaceHolder1_txtEdrating").text.strip()[1]
-    other_uses = table.find("span", id="ContentPlaceHolder1_txtOtherUseRating").text.strip()[1]
-    medicinal_rating = table.find("span", id="ContentPlaceHolder1_txtMedRating").text.strip()[1]
-
-    img_url = ''
-    details_table = soup.find('table', id='ContentPlaceHolder1_tblPlantImges')
-    if details_table:
-        img_tag = details_table.find('img')
-        if img_tag:
-            img_url = 'https://pfaf.org' + img_tag['src'][2:]
-
-    return [
-        family, genus, species, common_name, growth_rate, f"{zone_min} to {zone_max}", height, width,
-        plant_type, foliage, pollinators, leaf, flower, ripen_date, reproduction, soils, ph, ph_split, preferences,
-        tolerances, habitats, habitat_range, edibility, medicinal_rating, other_uses, pfaf_url, img_url
-    ]
-
-def scrape_genus_species(url, headers):
-    response = requests.get(url, headers=headers)
+def listing_page(url, engine):
+    """Fetch one listing page. Returns ``([(genus, species), ...], next_url)``;
+    raises ``ListingError`` when the page can't be fetched, so the partition
+    is known to be incomplete."""
+    response = engine.get(url)
     if response.status_code != 200:
-        return []
+        raise ListingError(f"HTTP {response.status_code} for {url}")
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = BeautifulSoup(response.content, PARSER, parse_only=_LISTING_STRAINER)
     table = soup.find('table', id='ContentPlaceHolder1_gvresults')
     if not table:
-        return []
+        return [], None
 
-    plant_data = []
+    names = []
     for row in table.find_all('tr')[1:]:
         cols = row.find_all('td')
         if cols:
@@ -178,40 +99,244 @@ def scrape_genus_species(url, headers):
             except ValueError:
                 print(f"Skipping invalid latin name: {latin_name}")
                 genus, species = latin_name, ""
-            try:
-                plant_info = get_plant_info(genus, species)
-                if plant_info:
-                    plant_data.append(plant_info)
-            except Exception as e:
-                print(f"Failed to process {latin_name}: {e}")
+            names.append((genus, species))
 
     next_page = soup.find('a', {'id': 'ContentPlaceHolder1_gvresults_ctl23_LinkButtonNext'})
-    if next_page:
-        next_url = "https://pfaf.org/user/" + next_page['href']
-        plant_data.extend(scrape_genus_species(next_url, headers))
-
-
-    return plant_data
-
-def scrape_plant_data():
-    latin_alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
-    plant_data = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(scrape_genus_species, f"https://pfaf.org/user/DatabaseSearhResult.aspx?LatinName={letter}", headers) for letter in latin_alphabet]
-        for future in concurrent.futures.as_completed(futures):
-            plant_data.extend(future.result())
-
-    with open('plant_data_debug.csv', 'w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_MINIMAL)
-        writer.writerow(attributes)
-        for data in plant_data:
-            # Ensure that each list element is properly formatted as a string
-            formatted_data = [str(item) if isinstance(item, list) else item for item in data]
-            writer.writerow(formatted_data)
+    return names, PFAF_BASE + next_page['href'] if next_page else None
+
+def scrape_genus_species(url, engine):
+    """Walk a listing chain starting at *url*, yielding ``(genus, species)``
+    for every row of every page."""
+    while url:
+        names, url = listing_page(url, engine)
+        yield from names
+
+def walk_listing(prefix, engine, split_after=SPLIT_AFTER_PAGES, max_prefix=MAX_PREFIX_LEN):
+    """Walk the listing for a Latin-name *prefix*.
+
+    Once *split_after* pages have been read and more remain, the rest of the
+    chain is handed back as a ``Split`` into ``prefix + a..z`` so other
+    listing workers can walk it in parallel. Sub-prefixes that sort wholly
+    before the last name already seen are skipped (only when the pages came
+    back in alphabetical order).
+    """
+    url, pages, last, ordered = listing_url(prefix), 0, "", True
+    while url:
+        names, url = listing_page(url, engine)
+        pages += 1
+        for genus, species in names:
+            key = latin_key(genus, species).lower()
+            ordered = ordered and key >= last
+            last = key
+            yield genus, species
+        if url and split_after and pages >= split_after and len(prefix) < max_prefix:
+            children = [prefix + c for c in string.ascii_lowercase]
+            if ordered:
+                children = [c for c in children if c.lower() >= last[:len(c)]]
+            yield Split(children)
+            return
+
+def fetch_plant_row(genus, species, engine, parser, archive=None):
+    """Fetch one species page, archive the raw bytes and parse it on the parse stage."""
+    pfaf_url = plant_url(genus, species)
+    response = engine.get(pfaf_url)
+    if response.status_code != 200:
+        return None
+    if archive is not None:
+        archive.add(genus, species, pfaf_url, response.content)
+    return parser.submit(response.content, genus, species, pfaf_url).result()
+
+def scrape_plant_data(letters=LATIN_ALPHABET, concurrency=16, output='plant_data_debug.csv', cache=True,
+                      parse_workers=None, resume=False, split_after=SPLIT_AFTER_PAGES, archive=True):
+    """Crawl *letters* and stream every plant into *output* as it is parsed.
+
+    Finished Latin names are checkpointed in ``<output>.done``; with
+    *resume* the existing output is kept and those names are skipped.
+    Letters longer than *split_after* listing pages are split into
+    sub-prefixes (0 walks each letter as one chain). Raw pages go to the
+    *archive* (see pfaf_archive) for offline reparsing.
+    """
+    started = time.time()
+    http_cache = HttpCache() if cache is True else cache or None
+    page_archive = open_archive(archive)
+    skip = written_names(output) if resume else set()
+    writer = RowWriter(output, attributes, append=resume)
+    checkpoint = Checkpoint(output + ".done", resume=resume)
+    if resume:
+        print(f"Resuming: {len(checkpoint.done | skip)} plants already in {output}")
+    try:
+        with ParseStage(parse_workers) as parser, \
+                FetchEngine(max_in_flight=concurrency, cache=http_cache) as engine:
+            counts = run_crawl(
+                letters,
+                walk_letter=lambda prefix: walk_listing(prefix, engine, split_after),
+                fetch_row=lambda genus, species: fetch_plant_row(genus, species, engine, parser, page_archive),
+                writer=writer, checkpoint=checkpoint, workers=concurrency, skip=skip,
+            )
+            stats = dict(engine.stats)
+    finally:
+        writer.close()
+        checkpoint.close()
+    if not output.endswith(".jsonl"):
+        Manifest(manifest_path(output)).rebuild_from(output, attributes)
+
+    elapsed = time.time() - started
+    print(f"Scraped {counts['written']} plants in {elapsed:.1f}s "
+          f"({stats['requests'] / max(elapsed, 1e-9):.1f} req/s, {stats['revalidated']} revalidated, "
+          f"{counts['skipped']} skipped, "
+          f"{counts['failed']} failed, {stats['retries']} retries)")
+    if http_cache:
+        http_cache.report()
+        if cache is True:
+            http_cache.close()
+    if page_archive is not None:
+        page_archive.report()
+        if page_archive is not archive:
+            page_archive.close()
+    return counts
+
+def delta_plant_data(letters=LATIN_ALPHABET, concurrency=16, output='plant_data_debug.csv', cache=True,
+                     parse_workers=None, max_age_days=180, split_after=SPLIT_AFTER_PAGES, archive=True):
+    """Refresh *output* with only new or stale species (see pfaf_delta)."""
+    http_cache = HttpCache() if cache is True else cache or None
+    page_archive = open_archive(archive)
+    with ParseStage(parse_workers) as parser, \
+            FetchEngine(max_in_flight=concurrency, cache=http_cache) as engine:
+        summary = run_delta(
+            output, attributes,
+            walk_letter=lambda prefix: walk_listing(prefix, engine, split_after),
+            fetch_row=lambda genus, species: fetch_plant_row(genus, species, engine, parser, page_archive),
+            letters=letters, workers=concurrency, max_age_days=max_age_days,
+        )
+    if http_cache:
+        http_cache.report()
+        if cache is True:
+            http_cache.close()
+    if page_archive is not None:
+        page_archive.report()
+        if page_archive is not archive:
+            page_archive.close()
+    return summary
+
+def coordinate_crawl(queue_path, letters=LATIN_ALPHABET, output='plant_data_debug.csv', cache=True,
+                     lease_seconds=DEFAULT_LEASE_SECONDS, split_after=SPLIT_AFTER_PAGES):
+    """Seed a shared work queue from the listings and merge what the workers
+    (``crawl_worker``) write back (see pfaf_queue)."""
+    http_cache = HttpCache() if cache is True else cache or None
+    queue = WorkQueue(queue_path, lease_seconds)
+    try:
+        with FetchEngine(cache=http_cache) as engine:
+            counts = run_coordinator(queue, letters, lambda prefix: walk_listing(prefix, engine, split_after),
+                                     output, attributes)
+    finally:
+        queue.close()
+    if not output.endswith(".jsonl"):
+        Manifest(manifest_path(output)).rebuild_from(output, attributes)
+    if http_cache and cache is True:
+        http_cache.close()
+    return counts
+
+def crawl_worker(queue_path, concurrency=16, cache=True, parse_workers=None,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, batch=DEFAULT_BATCH, archive=None):
+    """Fetch and parse names leased from a shared work queue until it is drained.
+
+    Workers only archive pages when given their own *archive* directory,
+    since several processes must not append to one archive.
+    """
+    http_cache = HttpCache() if cache is True else cache or None
+    page_archive = open_archive(archive)
+    queue = WorkQueue(queue_path, lease_seconds)
+    try:
+        with ParseStage(parse_workers) as parser, \
+                FetchEngine(max_in_flight=concurrency, cache=http_cache) as engine:
+            return run_worker(queue,
+                              lambda genus, species: fetch_plant_row(genus, species, engine, parser, page_archive),
+                              concurrency=concurrency, batch=batch)
+    finally:
+        queue.close()
+        if http_cache and cache is True:
+            http_cache.close()
+        if page_archive is not None and page_archive is not archive:
+            page_archive.close()
+
+def reparse_plant_data(output='plant_data_debug.csv', archive=None, parse_workers=None):
+    """Rebuild *output* by re-running the parser over archived pages, offline.
+
+    Only the species in *output*'s manifest are reparsed, so species a
+    delta crawl removed stay removed; without a manifest every archived
+    page is.
+    """
+    page_archive = open_archive(True if archive is None else archive)
+    manifest = Manifest(manifest_path(output))
+    try:
+        if not len(page_archive):
+            print(f"No archived pages in {page_archive.directory}")
+            return 0
+        if not manifest.entries:
+            print(f"No manifest for {output} – reparsing every archived page")
+        rows = reparse(page_archive, output, attributes, parse_workers,
+                       names=set(manifest.entries) if manifest.entries else None)
+    finally:
+        page_archive.close()
+    if not output.endswith(".jsonl"):
+        Manifest(manifest_path(output)).rebuild_from(output, attributes)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape plant data from pfaf.org")
+    parser.add_argument("--letters", default=LATIN_ALPHABET, help="Listing letters to crawl (default A-Z)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max detail requests in flight")
+    parser.add_argument("--output", default="plant_data_debug.csv",
+                        help="CSV output, or JSON lines when the name ends in .jsonl")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep the existing output and skip plants already checkpointed")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk HTTP cache")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="Processes parsing pages (default: one per core, 0 = parse on fetch threads)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only fetch new or stale species and write an added/changed/removed diff")
+    parser.add_argument("--max-age-days", type=float, default=180,
+                        help="With --delta, refetch species last fetched longer ago than this")
+    parser.add_argument("--split-after", type=int, default=SPLIT_AFTER_PAGES,
+                        help="Split a letter into Latin-name prefixes after this many listing pages (0 = never)")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="Coordinate a distributed crawl through this SQLite work queue")
+    parser.add_argument("--worker", action="store_true",
+                        help="With --queue, lease and fetch names instead of coordinating")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="With --queue, re-queue names whose worker has not heartbeated for this long")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="With --worker, names leased at a time")
+    parser.add_argument("--archive", metavar="DIR", default=None,
+                        help="Raw-page archive directory (default .cache/pfaf_archive)")
+    parser.add_argument("--no-archive", action="store_true", help="Do not archive fetched pages")
+    parser.add_argument("--reparse", action="store_true",
+                        help="Rebuild the output from the archived pages without any network access")
+    args = parser.parse_args(argv)
+    archive = False if args.no_archive else args.archive or True
+    if args.reparse:
+        reparse_plant_data(args.output, args.archive, args.parse_workers)
+        return
+    if args.worker and not args.queue:
+        parser.error("--worker needs --queue")
+    if args.queue:
+        if args.worker:
+            crawl_worker(args.queue, args.concurrency, cache=not args.no_cache,
+                         parse_workers=args.parse_workers, lease_seconds=args.lease_seconds, batch=args.batch,
+                         archive=None if args.no_archive else args.archive)
+        else:
+            coordinate_crawl(args.queue, args.letters.upper(), args.output, cache=not args.no_cache,
+                             lease_seconds=args.lease_seconds, split_after=args.split_after)
+        return
+    if args.delta:
+        if args.output.endswith(".jsonl"):
+            parser.error("--delta needs a CSV output")
+        delta_plant_data(args.letters.upper(), args.concurrency, args.output, cache=not args.no_cache,
+                         parse_workers=args.parse_workers, max_age_days=args.max_age_days,
+                         split_after=args.split_after, archive=archive)
+        return
+    scrape_plant_data(args.letters.upper(), args.concurrency, args.output, cache=not args.no_cache,
+                      parse_workers=args.parse_workers, resume=args.resume, split_after=args.split_after,
+                      archive=archive)
 
 if __name__ == "__main__":
-    scrape_plant_data()
+    main()
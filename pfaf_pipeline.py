@@ -0,0 +1,269 @@
+"""
+pfaf_pipeline.py
+----------------
+Streaming crawl pipeline for the PFAF scraper:
+
+    listing workers ──► name queue ──► detail workers ──► result queue ──► writer
+    (shared partitions)  (bounded)      (fetch + parse)     (bounded)       (CSV/JSONL + checkpoint)
+
+- Queues are bounded, so memory stays flat however large the catalog is.
+- The writer appends and flushes every row as soon as it is parsed, then
+  records the Latin name in a checkpoint file next to the output.
+- ``resume=True`` keeps the existing output and skips every name already in
+  the checkpoint (or already written to the output), so a crash only loses
+  the pages that were in flight.
+- Listing workers take partitions (letters, then Latin-name prefixes) from
+  one shared deque. A walker that finds its partition is long yields a
+  ``Split`` and the sub-prefixes go to the front of the deque, where any
+  idle worker picks them up, so one huge letter no longer sets the
+  wall-clock time of the whole listing crawl.
+"""
+
+import collections
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+_DONE = object()   # end-of-stream marker on the queues
+
+
+def latin_key(genus, species):
+    return f"{genus} {species}".strip()
+
+
+class RowWriter:
+    """Appending row writer. ``.jsonl`` outputs get one JSON object per line,
+    anything else is CSV with a header."""
+
+    def __init__(self, path, fieldnames, append=False):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.jsonl = path.endswith(".jsonl")
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a" if exists else "w", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self._csv = csv.writer(self._file, quoting=csv.QUOTE_MINIMAL)
+            if not exists:
+                self._csv.writerow(fieldnames)
+                self._file.flush()
+        self.rows = 0
+
+    def write(self, row):
+        # Ensure that each list element is properly formatted as a string
+        formatted = [str(item) if isinstance(item, list) else item for item in row]
+        if self.jsonl:
+            self._file.write(json.dumps(dict(zip(self.fieldnames, formatted)), ensure_ascii=False) + "\n")
+        else:
+            self._csv.writerow(formatted)
+        self._file.flush()
+        self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+
+def written_names(path):
+    """Latin names already present in an output file (streamed, not loaded)."""
+    names = set()
+    if not os.path.exists(path):
+        return names
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            names.add(latin_key(row.get("Genus", ""), row.get("Species", "")))
+    return names
+
+
+class Checkpoint:
+    """Append-only list of finished Latin names, one per line."""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def mark(self, name):
+        self.done.add(name)
+        self._file.write(name + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ListingError(Exception):
+    """A listing page could not be read, so its partition is incomplete."""
+
+
+class Split:
+    """Yielded by a listing walker instead of a name: queue *prefixes* as new
+    partitions for whichever listing worker is idle."""
+
+    def __init__(self, prefixes):
+        self.prefixes = list(prefixes)
+
+
+def walk_partitions(partitions, walk, emit, workers=10, failed=None):
+    """Walk listing *partitions* on *workers* threads sharing one deque.
+
+    *walk(partition)* yields ``(genus, species)`` pairs, each handed to
+    *emit*, or ``Split`` markers whose prefixes are pushed to the front of the
+    deque. Returns ``[(partition, names, seconds)]`` in completion order.
+    Partitions whose walk raised are logged and added to the *failed* set.
+    """
+    pending = collections.deque(partitions)
+    active = 0
+    timings = []
+    cond = threading.Condition()
+
+    def work():
+        nonlocal active
+        while True:
+            with cond:
+                while not pending and active:
+                    cond.wait()
+                if not pending:
+                    return
+                partition = pending.popleft()
+                active += 1
+            started, names = time.time(), 0
+            try:
+                for item in walk(partition):
+                    if isinstance(item, Split):
+                        with cond:
+                            pending.extendleft(reversed(item.prefixes))
+                            cond.notify_all()
+                    else:
+                        emit(*item)
+                        names += 1
+            except Exception as e:
+                print(f"Listing crawl failed for {partition}: {e}")
+                if failed is not None:
+                    with cond:
+                        failed.add(partition)
+            finally:
+                with cond:
+                    active -= 1
+                    timings.append((partition, names, time.time() - started))
+                    cond.notify_all()
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(max(workers, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return timings
+
+
+def log_partitions(timings, elapsed, top=5):
+    """One summary line for the listing crawl plus its slowest partitions."""
+    if not timings:
+        return
+    busy = sum(seconds for _, _, seconds in timings)
+    print(f"[listing] {len(timings)} partitions, {sum(n for _, n, _ in timings)} names in "
+          f"{elapsed:.1f}s wall ({busy:.1f}s of walking)")
+    slowest = sorted(timings, key=lambda t: t[2], reverse=True)[:top]
+    print("[listing] slowest: " + ", ".join(f"{p} {s:.1f}s/{n}" for p, n, s in slowest))
+
+
+def run_crawl(letters, walk_letter, fetch_row, writer, checkpoint, workers=16,
+              listing_workers=10, skip=frozenset()):
+    """Drive the pipeline until every letter is walked and every name written.
+
+    *walk_letter(partition)* yields ``(genus, species)`` or ``Split`` markers
+    (see ``walk_partitions``); *fetch_row(genus, species)* returns the parsed
+    row or ``None``. Names in *skip* or already in the checkpoint are not
+    fetched. Returns a dict of counters.
+
+    If writing a row or marking it done raises, the crawl stops: nothing
+    more is queued or fetched, the queues are drained so every thread
+    exits, and the error is raised here.
+    """
+    names = queue.Queue(maxsize=workers * 4)
+    results = queue.Queue(maxsize=workers * 4)
+    seen = set(skip) | checkpoint.done
+    seen_lock = threading.Lock()
+    counts = {"queued": 0, "skipped": 0, "written": 0, "empty": 0, "failed": 0}
+    failure = []   # the writer's error, once it has stopped
+    started = time.time()
+
+    def produce(genus, species):
+        if failure:
+            return
+        key = latin_key(genus, species)
+        with seen_lock:
+            if key in seen:
+                counts["skipped"] += 1
+                return
+            seen.add(key)
+            counts["queued"] += 1
+        names.put((genus, species))
+
+    def work():
+        while True:
+            item = names.get()
+            if item is _DONE:
+                results.put(_DONE)
+                return
+            if failure:
+                continue
+            key = latin_key(*item)
+            try:
+                results.put((key, fetch_row(*item)))
+            except Exception as e:
+                print(f"Failed to process {key}: {e}")
+                results.put((key, _DONE))
+
+    def record(key, row):
+        if row is _DONE:
+            counts["failed"] += 1
+        elif row is None:
+            counts["empty"] += 1
+        else:
+            writer.write(row)
+            checkpoint.mark(key)
+            counts["written"] += 1
+            if counts["written"] % 100 == 0:
+                rate = counts["written"] / max(time.time() - started, 1e-9)
+                print(f"  {counts['written']} plants written ({rate:.1f}/s) …", end="\r")
+
+    def write():
+        finished = 0
+        while finished < workers:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            if failure:
+                continue   # draining, so workers blocked on results.put can exit
+            try:
+                record(*item)
+            except Exception as e:
+                print(f"Failed to write {item[0]}: {e} – stopping the crawl")
+                failure.append(e)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    writer_thread = threading.Thread(target=write, daemon=True)
+    for t in threads + [writer_thread]:
+        t.start()
+
+    timings = walk_partitions(letters, walk_letter, produce, listing_workers)
+    if len(timings) > 1:
+        log_partitions(timings, time.time() - started)
+
+    for _ in threads:
+        names.put(_DONE)
+    for t in threads + [writer_thread]:
+        t.join()
+    if failure:
+        raise failure[0]
+    return counts
@@ -0,0 +1,277 @@
+"""
+pfaf_queue.py
+-------------
+Durable work queue for spreading a full PFAF crawl over several processes,
+containers or hosts that share one SQLite file.
+
+    coordinator ──► tasks table ◄── lease / heartbeat / complete ── workers (N)
+        │                                                              │
+        └──────────── merge ◄────────── results table ◄────────────────┘
+
+- The coordinator walks the listing pages once and seeds one task per Latin
+  name, then waits and re-queues leases whose worker stopped heartbeating.
+- Workers lease a batch of names, extend the lease from a heartbeat thread
+  while they fetch and parse, and write each row back as JSON.
+- A name whose lease expired or whose fetch failed goes back to
+  ``pending``. After ``max_attempts`` leases it is marked ``failed``.
+- When nothing is pending or leased the coordinator streams the results, in
+  listing order, into the usual CSV/JSONL output.
+
+Seeding and results live in the same file, so a coordinator that is
+restarted picks up where it stopped and does not walk the listings again.
+"""
+
+import concurrent.futures
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from pfaf_pipeline import RowWriter, latin_key, walk_partitions
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_BATCH = 32
+MAX_ATTEMPTS = 3
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Tasks, leases and results in one SQLite file."""
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                seq           INTEGER PRIMARY KEY AUTOINCREMENT,
+                name          TEXT UNIQUE NOT NULL,
+                genus         TEXT NOT NULL,
+                species       TEXT NOT NULL,
+                state         TEXT NOT NULL DEFAULT 'pending',
+                owner         TEXT,
+                lease_expires REAL,
+                attempts      INTEGER NOT NULL DEFAULT 0
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                name TEXT PRIMARY KEY,
+                row  TEXT
+            )""")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ── coordinator side ──────────────────────────────────────────────────────
+
+    @property
+    def seeded(self):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+        return row is not None
+
+    def add(self, pairs):
+        """Queue ``(genus, species)`` pairs; names already queued are ignored."""
+        rows = [(latin_key(g, s), g, s) for g, s in pairs]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO tasks (name, genus, species) VALUES (?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def mark_seeded(self):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('seeded', ?)", (str(time.time()),))
+
+    def requeue_expired(self):
+        """Return expired leases to ``pending`` (or ``failed`` once out of
+        attempts). Returns how many were requeued."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            requeued = self._requeue_expired(now)
+            self._db.execute("COMMIT")
+        return requeued
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(rows)
+        return counts
+
+    def results(self):
+        """Stream ``(name, row)`` for finished tasks in listing order; *row*
+        is ``None`` when the species page was empty."""
+        db = sqlite3.connect(self.path, timeout=60)
+        try:
+            for name, row in db.execute(
+                    "SELECT t.name, r.row FROM tasks t JOIN results r ON r.name = t.name "
+                    "WHERE t.state = 'done' ORDER BY t.seq"):
+                yield name, None if row is None else json.loads(row)
+        finally:
+            db.close()
+
+    # ── worker side ───────────────────────────────────────────────────────────
+
+    def lease(self, owner, batch=DEFAULT_BATCH):
+        """Lease up to *batch* pending names to *owner*. Returns
+        ``[(genus, species), ...]``."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(now)
+            rows = self._db.execute(
+                "SELECT seq, genus, species FROM tasks WHERE state = 'pending' ORDER BY seq LIMIT ?",
+                (batch,)).fetchall()
+            self._db.executemany(
+                "UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE seq = ?",
+                [(owner, now + self.lease_seconds, seq) for seq, _, _ in rows])
+            self._db.execute("COMMIT")
+        return [(genus, species) for _, genus, species in rows]
+
+    def heartbeat(self, owner):
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE owner = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, owner))
+
+    def complete(self, results):
+        """Store ``(name, row)`` results (``row`` may be ``None``) and mark
+        the names done, whoever holds the lease by now."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO results (name, row) VALUES (?, ?)",
+                [(name, None if row is None else json.dumps(row, ensure_ascii=False))
+                 for name, row in results])
+            self._db.executemany(
+                "UPDATE tasks SET state = 'done', owner = NULL, lease_expires = NULL WHERE name = ?",
+                [(name,) for name, _ in results])
+            self._db.execute("COMMIT")
+
+    def fail(self, names):
+        """Give failed names back to the queue, or give up on them after
+        ``max_attempts`` leases."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL WHERE name = ? AND state = 'leased'",
+                [(self.max_attempts, name) for name in names])
+            self._db.execute("COMMIT")
+
+    def _requeue_expired(self, now):
+        cursor = self._db.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, lease_expires = NULL WHERE state = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now))
+        return cursor.rowcount
+
+
+def run_coordinator(queue, letters, walk_letter, output, fieldnames, poll=2.0, listing_workers=10):
+    """Seed *queue* from the listings (once), wait for the workers, then
+    merge every result into *output*. Returns the final task counts."""
+    started = time.time()
+    if queue.seeded:
+        print(f"[coordinator] Queue {queue.path} already seeded – waiting for workers")
+    else:
+        pending, lock = [], threading.Lock()
+
+        def emit(genus, species):
+            with lock:
+                pending.append((genus, species))
+                if len(pending) >= 500:
+                    queue.add(pending)
+                    pending.clear()
+
+        walk_partitions(letters, walk_letter, emit, listing_workers)
+        queue.add(pending)
+        queue.mark_seeded()
+        print(f"[coordinator] Seeded {sum(queue.counts().values())} names in {time.time() - started:.1f}s")
+
+    while True:
+        requeued = queue.requeue_expired()
+        counts = queue.counts()
+        if requeued:
+            print(f"\n[coordinator] Re-queued {requeued} expired leases")
+        print(f"  {counts['done']} done  |  {counts['leased']} leased  |  {counts['pending']} pending  |  "
+              f"{counts['failed']} failed …", end="\r")
+        if not counts["pending"] and not counts["leased"]:
+            break
+        time.sleep(poll)
+
+    writer = RowWriter(output, fieldnames)
+    empty = 0
+    try:
+        for _, row in queue.results():
+            if row is None:
+                empty += 1
+            else:
+                writer.write(row)
+    finally:
+        writer.close()
+    print(f"\n[coordinator] Merged {writer.rows} plants into {output} ({empty} empty pages, "
+          f"{counts['failed']} failed) in {time.time() - started:.1f}s")
+    return counts
+
+
+def run_worker(queue, fetch_row, concurrency=16, batch=DEFAULT_BATCH, poll=2.0, owner=None):
+    """Lease, fetch and report until the seeded queue has nothing left.
+    Returns the number of names this worker completed."""
+    owner = owner or worker_id()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(queue.lease_seconds / 3):
+            queue.heartbeat(owner)
+
+    def fetch(pair):
+        try:
+            return latin_key(*pair), fetch_row(*pair), None
+        except Exception as e:
+            return latin_key(*pair), None, e
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    completed = 0
+    print(f"[worker {owner}] Leasing from {queue.path}")
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                pairs = queue.lease(owner, batch)
+                if not pairs:
+                    counts = queue.counts()
+                    if queue.seeded and not counts["pending"] and not counts["leased"]:
+                        break
+                    time.sleep(poll)
+                    continue
+                results, failed = [], []
+                for name, row, error in pool.map(fetch, pairs):
+                    if error is None:
+                        results.append((name, row))
+                    else:
+                        print(f"Failed to process {name}: {error}")
+                        failed.append(name)
+                queue.complete(results)
+                queue.fail(failed)
+                completed += len(results)
+    finally:
+        stop.set()
+        beat.join()
+    print(f"[worker {owner}] Completed {completed} names")
+    return completed
@@ -0,0 +1,355 @@
+"""
+plant_dataset.py
+----------------
+Canonical store for the combined plant dataset. The merge stages read and
+write it instead of rewriting docs/plant_data.csv, which is now only an
+export of the store.
+
+One SQLite file (``.cache/plant_dataset.sqlite``):
+
+    rows      rid, key (normalised "genus species"), the stage that owns
+              the row and its position within that stage's output
+    chunks    (stage, col) → one zlib-compressed JSON column chunk holding
+              the non-empty values that stage wrote, as ``[rids, values]``
+              (``[keys, values]`` for a patch stage)
+    columns   every column, the stage that declared it first, and its order
+    stages    stages in the order they first wrote
+
+- ``read(columns)`` is a projection: only the named columns' chunks are
+  read and decoded.
+- ``write(stage, rows, columns)`` replaces whatever *stage* wrote last time,
+  in one transaction, and never touches another stage's chunks. Where two
+  stages write the same cell the later stage wins. A row belongs to the
+  earliest stage that writes its key; rows a stage owned and no longer
+  produces are dropped.
+- ``write(..., patch=True)`` writes a patch instead: cells keyed by row
+  key, which apply to whichever rows have those keys when the table is
+  read, and never add or claim rows. An enricher can then write a patch
+  for rows another stage is still adding, concurrently with it.
+- ``sources`` holds each stage's own tag for a row, and is joined with
+  ``+`` in stage order instead of overwritten. ``order_stages`` fixes that
+  order up front when stages may finish in any order.
+- ``export_csv`` assembles every stage's cells and patches in one pass:
+  each column is decoded once into a list in row order, and the rows are
+  zipped from those lists as they are written. Rows are grouped by stage,
+  columns by the stage that declared them.
+
+Usage:
+    python plant_dataset.py                     # export docs/plant_data.csv
+    python plant_dataset.py --output out.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+SCRIPT_DIR  = os.path.dirname(os.path.abspath(__file__))
+DATASET_DB  = os.path.join(SCRIPT_DIR, ".cache", "plant_dataset.sqlite")
+EXPORT_CSV  = os.path.join(SCRIPT_DIR, "docs", "plant_data.csv")
+
+SOURCES = "sources"
+LOCK_TIMEOUT = 120   # seconds to wait for another process's write to commit
+
+
+def make_key(genus, species):
+    """Row key: lowercase "genus species" with whitespace collapsed."""
+    return re.sub(r"\s+", " ", f"{genus} {species}".strip()).lower()
+
+
+def add_source(current, tag):
+    """Append *tag* to a ``+``-separated sources string if not already there."""
+    parts = [s.strip() for s in current.split("+") if s.strip()]
+    if tag not in parts:
+        parts.append(tag)
+    return "+".join(parts)
+
+
+class PlantDataset:
+    def __init__(self, path=DATASET_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self._keys = None
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS stages (
+                name TEXT PRIMARY KEY,
+                rank INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                rid   INTEGER PRIMARY KEY,
+                key   TEXT UNIQUE NOT NULL,
+                stage TEXT NOT NULL,
+                seq   INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                stage TEXT NOT NULL,
+                col   TEXT NOT NULL,
+                data  BLOB NOT NULL,
+                PRIMARY KEY (col, stage)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS columns (
+                name     TEXT PRIMARY KEY,
+                stage    TEXT NOT NULL,
+                position INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def columns(self):
+        """Every column in export order."""
+        return [name for (name,) in self._db.execute(
+            "SELECT c.name FROM columns c JOIN stages s ON s.name = c.stage "
+            "ORDER BY s.rank, c.position")]
+
+    def read(self, columns, exclude_stage=None, stage=None):
+        """Yield ``(key, record)`` for every row in export order, where
+        *record* holds only the requested, non-empty *columns*. Rows owned by
+        *exclude_stage* (typically the caller's own new rows) are skipped;
+        with *stage*, only that stage's rows are read."""
+        self._keys = None
+        values = {col: self._column(col) for col in columns}
+        for rid, key in self._rows(exclude_stage, stage):
+            yield key, {col: v[rid] for col, v in values.items() if rid in v}
+
+    def write(self, stage, rows, columns=(), patch=False):
+        """Replace everything *stage* wrote before with *rows*, an iterable of
+        ``(key, record)``. A ``sources`` entry in a record is that stage's tag
+        for the row. *columns* declares the stage's columns (and their order)
+        even where every value is empty. With *patch*, the cells are kept by
+        key and no rows are added (see the module docstring). Returns
+        ``(rows, cells)`` written."""
+        keys, cells = [], {}
+        declared = dict.fromkeys(c for c in columns if c)
+        for seq, (key, record) in enumerate(rows):
+            keys.append(key)
+            declared.update(dict.fromkeys(record))
+            for col, value in record.items():
+                if value is not None and value != "":
+                    column = cells.get(col)
+                    if column is None:
+                        column = cells[col] = ([], [])
+                    column[0].append(seq)
+                    column[1].append(str(value))
+        return self._write(stage, keys, cells, declared, patch)
+
+    def write_columns(self, stage, keys, columns, patch=False):
+        """``write`` for data already in columns: *keys* and every list in
+        *columns* (name → values, in declared order) are aligned by row.
+        Each column is read in one pass, so any iterable of values will do
+        (a ``plant_table.Column`` too)."""
+        cells = {}
+        for col, values in columns.items():
+            seqs, kept = [], []
+            for i, value in enumerate(values):
+                if value is not None and value != "":
+                    seqs.append(i)
+                    kept.append(str(value))
+            cells[col] = (seqs, kept)
+        return self._write(stage, list(keys), cells, dict.fromkeys(columns), patch)
+
+    def order_stages(self, names):
+        """Rank the stages *names* in this order, ahead of any other stage,
+        whether or not they have written yet."""
+        with self._db:
+            ranked = [name for (name,) in self._db.execute("SELECT name FROM stages ORDER BY rank")]
+            ranked = list(names) + [name for name in ranked if name not in names]
+            self._db.execute("DELETE FROM stages")
+            self._db.executemany("INSERT INTO stages VALUES (?, ?)", [(n, i) for i, n in enumerate(ranked)])
+
+    def _write(self, stage, keys, cells, declared, patch=False):
+        """*cells*: column → ``(row positions, values)``, positions in *keys*."""
+        started = time.time()
+        self._keys = None
+        if patch:
+            return self._write_patch(stage, keys, cells, declared, started)
+        with self._db:
+            rank = self._rank(stage)
+            ranks = dict(self._db.execute("SELECT name, rank FROM stages"))
+            existing = {key: (rid, owner) for rid, key, owner in
+                        self._db.execute("SELECT rid, key, stage FROM rows")}
+            self._db.execute("UPDATE rows SET seq = NULL WHERE stage = ?", (stage,))
+
+            rids, owned = [], []
+            for seq, key in enumerate(keys):
+                if key in existing:
+                    rid, owner = existing[key]
+                    if owner == stage or ranks[owner] > rank:
+                        owned.append((stage, seq, rid))
+                else:
+                    rid = self._db.execute("INSERT INTO rows (key, stage, seq) VALUES (?, ?, ?)",
+                                           (key, stage, seq)).lastrowid
+                    existing[key] = (rid, stage)
+                rids.append(rid)
+            self._db.executemany("UPDATE rows SET stage = ?, seq = ? WHERE rid = ?", owned)
+
+            # Rows this stage owned but no longer produces
+            dropped = self._db.execute("DELETE FROM rows WHERE stage = ? AND seq IS NULL", (stage,)).rowcount
+            self._db.execute("DELETE FROM chunks WHERE stage = ?", (stage,))
+            chunks = [(stage, col, _encode([rids[i] for i in seqs], values))
+                      for col, (seqs, values) in cells.items() if col and values]
+            self._db.executemany("INSERT INTO chunks VALUES (?, ?, ?)", chunks)
+            self._declare(stage, [c for c in declared if c])
+        count = sum(len(values) for _, values in cells.values())
+        print(f"[dataset] {stage}: {len(keys)} rows, {count} cells in {len(chunks)} columns, "
+              f"{dropped} rows dropped ({time.time() - started:.2f}s)")
+        return len(keys), count
+
+    def _write_patch(self, stage, keys, cells, declared, started):
+        with self._db:
+            self._rank(stage)
+            existing = {key for (key,) in self._db.execute("SELECT key FROM rows")}
+            # A patch stage owns no rows
+            self._db.execute("DELETE FROM rows WHERE stage = ?", (stage,))
+            self._db.execute("DELETE FROM chunks WHERE stage = ?", (stage,))
+            chunks = [(stage, col, _encode([keys[i] for i in seqs], values))
+                      for col, (seqs, values) in cells.items() if col and values]
+            self._db.executemany("INSERT INTO chunks VALUES (?, ?, ?)", chunks)
+            self._declare(stage, [c for c in declared if c])
+        count = sum(len(values) for _, values in cells.values())
+        pending = sum(1 for key in keys if key not in existing)
+        print(f"[dataset] {stage}: patch of {len(keys)} rows ({pending} not in the table yet), "
+              f"{count} cells in {len(chunks)} columns ({time.time() - started:.2f}s)")
+        return len(keys), count
+
+    def export_csv(self, path=EXPORT_CSV):
+        """Write the whole table to *path*. Returns the row count."""
+        started = time.time()
+        self._keys = None
+        fieldnames = self.columns()
+        position = {rid: i for i, (rid, _) in enumerate(self._rows())}
+        # One list per column in row order, each decoded and filled in turn
+        # so only non-empty cells are visited; rows are zipped up as written
+        columns = []
+        for col in fieldnames:
+            values = [""] * len(position)
+            for rid, value in self._column(col).items():
+                i = position.get(rid)
+                if i is not None:
+                    values[i] = value
+            columns.append(values)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            writer.writerows(zip(*columns))
+        os.replace(tmp, path)
+        count = len(position)
+        size_mb = os.path.getsize(path) / 1_048_576
+        print(f"[export] {count} rows, {len(fieldnames)} columns → {path}  ({size_mb:.2f} MB, "
+              f"{time.time() - started:.2f}s)")
+        return count
+
+    def digest(self, stage=None, columns=None, exclude_stage=None):
+        """SHA-1 of what *stage* wrote, or else of *columns* (every column when
+        ``None``) as a stage that is *exclude_stage* would read them. Used by
+        build_plant_data.py to tell whether a stage's input or output changed."""
+        h = hashlib.sha1()
+        if stage is not None:
+            where, args = "stage = ?", (stage,)
+        else:
+            where, args = "stage IS NOT ?", (exclude_stage,)
+        chunks, chunk_args = where, args
+        if columns is not None:
+            chunks = f"{where} AND col IN ({','.join('?' * len(columns))})"
+            chunk_args = args + tuple(columns)
+        queries = [
+            (f"SELECT rid, key, stage, seq FROM rows WHERE {where} ORDER BY rid", args),
+            (f"SELECT col, stage, data FROM chunks WHERE {chunks} ORDER BY col, stage", chunk_args),
+            # Ranks decide row order and which stage's cell wins
+            (f"SELECT name, rank FROM stages WHERE name IN (SELECT stage FROM rows WHERE {where} "
+             f"UNION SELECT stage FROM chunks WHERE {chunks}) ORDER BY rank", args + chunk_args),
+        ]
+        if columns is None:
+            queries.append((f"SELECT name, stage, position FROM columns WHERE {where} ORDER BY name", args))
+        for sql, params in queries:
+            for row in self._db.execute(sql, params):
+                for value in row:
+                    h.update(value if isinstance(value, bytes) else repr(value).encode("utf-8"))
+                h.update(b"\n")
+        return h.hexdigest()
+
+    def _rows(self, exclude_stage=None, stage=None):
+        return self._db.execute(
+            "SELECT r.rid, r.key FROM rows r JOIN stages s ON s.name = r.stage "
+            "WHERE r.stage IS NOT ? AND (? IS NULL OR r.stage = ?) ORDER BY s.rank, r.seq",
+            (exclude_stage, stage, stage))
+
+    def _column(self, col):
+        """``{rid: value}`` for *col*, stage chunks applied in stage order."""
+        values = {}
+        for (data,) in self._db.execute(
+                "SELECT c.data FROM chunks c JOIN stages s ON s.name = c.stage "
+                "WHERE c.col = ? ORDER BY s.rank", (col,)):
+            ids, chunk = json.loads(zlib.decompress(data))
+            if ids and isinstance(ids[0], str):
+                # A patch: keyed by row key, keys without a row are skipped
+                if self._keys is None:
+                    self._keys = dict(self._db.execute("SELECT key, rid FROM rows"))
+                cells = [(self._keys[key], value) for key, value in zip(ids, chunk) if key in self._keys]
+            else:
+                cells = zip(ids, chunk)
+            if col != SOURCES:
+                values.update(cells)
+                continue
+            for rid, tag in cells:
+                current = values.get(rid, "")
+                for part in tag.split("+"):
+                    if part.strip():
+                        current = add_source(current, part.strip())
+                values[rid] = current
+        return values
+
+    def _rank(self, stage):
+        row = self._db.execute("SELECT rank FROM stages WHERE name = ?", (stage,)).fetchone()
+        if row:
+            return row[0]
+        rank = self._db.execute("SELECT COALESCE(MAX(rank) + 1, 0) FROM stages").fetchone()[0]
+        self._db.execute("INSERT INTO stages VALUES (?, ?)", (stage, rank))
+        return rank
+
+    def _declare(self, stage, columns):
+        owned = {name for (name,) in self._db.execute("SELECT name FROM columns WHERE stage = ?", (stage,))}
+        taken = {name for (name,) in self._db.execute("SELECT name FROM columns WHERE stage != ?", (stage,))}
+        self._db.executemany("DELETE FROM columns WHERE name = ?", [(c,) for c in owned - set(columns)])
+        self._db.executemany("INSERT OR REPLACE INTO columns VALUES (?, ?, ?)",
+                             [(c, stage, i) for i, c in enumerate(columns) if c not in taken])
+
+
+def _encode(rids, values):
+    chunk = [rids, values]
+    return zlib.compress(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the canonical plant dataset to CSV")
+    parser.add_argument("--dataset", default=DATASET_DB, help="Dataset store to read")
+    parser.add_argument("--output", default=EXPORT_CSV, help="CSV to write")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.dataset):
+        parser.error(f"{args.dataset} does not exist – run merge_plant_data.py first")
+    with PlantDataset(args.dataset) as dataset:
+        dataset.export_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
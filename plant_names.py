@@ -0,0 +1,345 @@
+"""
+plant_names.py
+--------------
+Scientific-name matching shared by the merge stages.
+
+Sources spell the same plant differently: "Mentha × piperita L.",
+"Mentha x piperita", "Allium cepa var. aggregatum", "Malus domestica Borkh.",
+"Brassica oleracea capitata" (PFAF leaves the rank out), or with a typo.
+``parse_name`` splits a name into canonical parts (genus, epithet,
+infraspecific rank and name, hybrid flag), with author strings, cultivar
+names and diacritics dropped. A lowercase word right after the epithet is
+an infraspecific name without its rank. ``NameMatcher`` indexes a set of
+target names and matches names against it in tiers:
+
+    exact      the normalised strings are equal
+    canonical  the parsed names are equal (authors, the spelling of ×,
+               diacritics and a missing rank ignored)
+    species    only genus and epithet are equal: a variety against its
+               species, or a hybrid against a name without the sign
+    fuzzy      genus and epithet one edit apart
+
+Only the first two tiers (``JOIN_TIERS``) join records one to one
+(``match_unique``). A variety is not its species, a hybrid is not its
+parent, and sibling species are often only an edit or two apart ("Carex
+flava" / "Carex flacca"), so species and fuzzy matches are suggestions to
+report, never joins.
+
+Fuzzy candidates come from trigram postings rather than comparing every
+pair: one ``TrigramIndex`` over the genera, and one over the epithets of
+each genus. Postings are built the first time a fuzzy match needs them.
+
+Usage:
+    matcher = NameMatcher(["malus domestica", "mentha × piperita"])
+    matcher.match("Mentha x piperita L.")
+    # Match(name='Mentha x piperita L.', target='mentha × piperita', tier='canonical', score=0.98)
+"""
+
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+NameParts = namedtuple("NameParts", "genus epithet rank infra hybrid")
+Match = namedtuple("Match", "name target tier score")
+
+TIER_SCORES = {"exact": 1.0, "canonical": 0.98, "species": 0.9}
+JOIN_TIERS  = ("exact", "canonical")   # the tiers match_unique joins
+
+MAX_DISTANCE = 1     # total edits over genus and epithet for a fuzzy match
+MIN_SCORE    = 0.9   # fuzzy matches scoring lower are not returned
+SCAN_WORDS   = 64    # TrigramIndex compares smaller sets directly
+
+HYBRID_MARKS = {"×", "x", "X"}
+RANKS = {
+    "subsp.": "subsp.", "subsp": "subsp.", "ssp.": "subsp.", "ssp": "subsp.",
+    "var.": "var.", "var": "var.", "v.": "var.",
+    "f.": "f.", "fo.": "f.", "forma": "f.",
+    "subvar.": "subvar.", "nothosubsp.": "subsp.", "nothovar.": "var.",
+}
+# Not a species epithet: open nomenclature and missing epithets
+NO_EPITHET = {"sp.", "sp", "spp.", "spp", "sp.nov.", "aff.", "cf.", "agg.", "group", "hybrid"}
+CULTIVAR = {"cv.", "cv", "cultivar"}
+QUOTES = "'\"‘“"
+NOT_EPITHET = NO_EPITHET | set(RANKS) | CULTIVAR
+
+
+# Lowercase particles of author names, not bare infraspecific names
+AUTHOR_PARTICLES = {"de", "di", "du", "da", "van", "von", "der", "den", "la", "le", "des", "del", "ex", "et", "in"}
+
+SPACES = re.compile(r"\s+")
+NOT_FOLDED = re.compile(r"[^a-z0-9-]")
+BINOMIAL = re.compile(r"([a-z][a-z-]*) ([a-z][a-z-]*)")
+BARE_INFRA = re.compile(r"[a-z][a-z-]+")
+
+
+def normalise(name):
+    """Lowercase, collapse whitespace, strip – the exact-tier key."""
+    return SPACES.sub(" ", str(name).strip().lower())
+
+
+def _fold(token):
+    """Lowercase ASCII letters, digits and hyphens only (diacritics removed)."""
+    token = unicodedata.normalize("NFKD", token.replace("æ", "ae").replace("œ", "oe"))
+    return NOT_FOLDED.sub("", token.lower())
+
+
+def parse_name(name):
+    """Split a scientific name into ``NameParts``. Empty parts are ``""``."""
+    simple = BINOMIAL.fullmatch(name) if isinstance(name, str) else None
+    if simple and simple[1] != "x" and simple[2] not in NOT_EPITHET:
+        return NameParts(simple[1], simple[2], "", "", False)
+    text = str(name).replace("×", " × ").strip()
+    tokens = SPACES.split(text) if text else []
+    hybrid = False
+    while tokens and tokens[0] in HYBRID_MARKS:
+        hybrid = True
+        tokens.pop(0)
+    if not tokens:
+        return NameParts("", "", "", "", hybrid)
+    genus = _fold(tokens.pop(0))
+
+    epithet = ""
+    if tokens and tokens[0] in HYBRID_MARKS:
+        hybrid = True
+        tokens.pop(0)
+    if tokens and not _is_author(tokens[0]) and tokens[0][0] not in QUOTES \
+            and tokens[0].lower() not in NOT_EPITHET:
+        epithet = _fold(tokens.pop(0))
+
+    rank = infra = ""
+    for i, token in enumerate(tokens):
+        lowered = token.lower()
+        if lowered in CULTIVAR or token[0] in QUOTES:
+            break
+        if lowered in RANKS and i + 1 < len(tokens):
+            rank, infra = RANKS[lowered], _fold(tokens[i + 1])
+            break
+        if token in HYBRID_MARKS and i + 1 < len(tokens):
+            # a hybrid formula ("Salix alba × fragilis"): kept apart from
+            # both the species and the nothospecies "Salix × alba"
+            rank, infra = "×", _fold(tokens[i + 1])
+            break
+        if i == 0 and epithet and BARE_INFRA.fullmatch(token) and token not in AUTHOR_PARTICLES:
+            infra = _fold(token)
+            break
+    return NameParts(genus, epithet, rank, infra, hybrid)
+
+
+def _is_author(token):
+    """"(L.)", "Mill.", "&", "ex" … – a capitalised word without a full stop
+    is taken for a miscapitalised epithet instead."""
+    return token[0] in "([&" or token in ("ex", "et", "in") or (token[0].isupper() and "." in token)
+
+
+def canonical_key(parts, infraspecific=True):
+    """``"× genus epithet rank infra"``, leaving out the parts a name lacks,
+    or only ``"genus epithet"`` unless *infraspecific*."""
+    if not parts.genus:
+        return ""
+    key = f"{parts.genus} {parts.epithet}".strip()
+    if not infraspecific:
+        return key
+    if parts.infra:
+        key = f"{key} {parts.rank} {parts.infra}" if parts.rank else f"{key} {parts.infra}"
+    return f"× {key}" if parts.hybrid else key
+
+
+def rankless_key(parts):
+    """``canonical_key`` with the infraspecific rank left out, so "var.",
+    "subsp." and no rank at all share a key; a hybrid formula keeps its "×"."""
+    if parts.rank and parts.rank != "×":
+        parts = parts._replace(rank="")
+    return canonical_key(parts)
+
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance between *a* and *b*, or ``limit + 1`` as soon as
+    it is certain to exceed *limit*."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        left = i
+        for j, cb in enumerate(b):
+            best = previous[j] if ca == cb else previous[j] + 1
+            if previous[j + 1] + 1 < best:
+                best = previous[j + 1] + 1
+            if left + 1 < best:
+                best = left + 1
+            current.append(best)
+            left = best
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Words by trigram: ``search(word, limit)`` only computes the edit
+    distance to words sharing enough trigrams to be within *limit* (an edit
+    changes at most three of them). Small sets are compared directly."""
+
+    def __init__(self, words=()):
+        self._words = set()
+        self._grams = None
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def add(self, word):
+        if word in self._words:
+            return
+        self._words.add(word)
+        if self._grams is not None:
+            for gram in _trigrams(word):
+                self._grams[gram].append(word)
+
+    def search(self, word, limit):
+        """``[(distance, word)]`` within *limit*, nearest first."""
+        if word in self._words:
+            return [(0, word)]
+        if len(self._words) < SCAN_WORDS:
+            candidates = self._words
+        else:
+            if self._grams is None:
+                self._grams = defaultdict(list)
+                for known in self._words:
+                    for gram in _trigrams(known):
+                        self._grams[gram].append(known)
+            query = _trigrams(word)
+            needed = len(query) - 3 * limit
+            shared = Counter(known for gram in query for known in self._grams.get(gram, ()))
+            candidates = [known for known, count in shared.items() if count >= needed]
+        found = []
+        for known in candidates:
+            distance = edit_distance(word, known, limit)
+            if distance <= limit:
+                found.append((distance, known))
+        return sorted(found)
+
+
+class NameMatcher:
+    """Index of target names; ``match`` returns the best ``Match`` or ``None``."""
+
+    def __init__(self, names, max_distance=MAX_DISTANCE, min_score=MIN_SCORE):
+        self.max_distance = max_distance
+        self.min_score = min_score
+        self._exact = {}
+        self._canonical = {}
+        self._species = {}
+        self._targets = defaultdict(dict)    # genus → epithet → target
+        self._epithets = {}                  # genus → TrigramIndex of its epithets
+        self._genera = TrigramIndex()
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, name):
+        key = normalise(name)
+        if not key or key in self._exact:
+            return
+        self._exact[key] = name
+        parts = parse_name(name)
+        if not parts.genus:
+            return
+        self._canonical.setdefault(canonical_key(parts), name)
+        self._canonical.setdefault(rankless_key(parts), name)
+        if parts.epithet:
+            self._species.setdefault(canonical_key(parts, infraspecific=False), name)
+            if parts.epithet not in self._targets[parts.genus]:
+                self._targets[parts.genus][parts.epithet] = name
+                self._epithets.setdefault(parts.genus, TrigramIndex()).add(parts.epithet)
+                self._genera.add(parts.genus)
+
+    def match(self, name):
+        key = normalise(name)
+        if not key:
+            return None
+        target = self._exact.get(key)
+        if target is not None:
+            return Match(name, target, "exact", TIER_SCORES["exact"])
+        parts = parse_name(name)
+        if not parts.genus:
+            return None
+        target = self._canonical.get(canonical_key(parts))
+        if target is None:
+            target = self._canonical.get(rankless_key(parts))
+        if target is not None:
+            return Match(name, target, "canonical", TIER_SCORES["canonical"])
+        if parts.epithet:
+            target = self._species.get(canonical_key(parts, infraspecific=False))
+            if target is not None:
+                return Match(name, target, "species", TIER_SCORES["species"])
+            return self._fuzzy(name, parts)
+        return None
+
+    def match_many(self, names):
+        """``{name: Match}`` for every name that matched."""
+        matches = {}
+        for name in names:
+            found = self.match(name)
+            if found is not None:
+                matches[name] = found
+        return matches
+
+    def _fuzzy(self, name, parts):
+        genera = self._genera.search(parts.genus, min(1, self.max_distance))
+        length = len(parts.genus) + len(parts.epithet)
+        best = None
+        for genus_distance, genus in genera:
+            budget = self.max_distance - genus_distance
+            for distance, epithet in self._epithets[genus].search(parts.epithet, budget):
+                score = 1 - (genus_distance + distance) / max(length, 1)
+                if score >= self.min_score and (best is None or score > best.score):
+                    best = Match(name, self._targets[genus][epithet], "fuzzy", round(score, 3))
+        return best
+
+
+def match_unique(matcher, names, suggestions=None):
+    """Match *names* so that each target goes to one name only: the best
+    scoring one, or the earliest on a tie. Returns ``{name: Match}``.
+
+    Only ``JOIN_TIERS`` matches are joined; species and fuzzy matches are
+    appended to *suggestions* (a list) when one is given, for the caller
+    to report."""
+    found = []
+    for position, name in enumerate(names):
+        match = matcher.match(name)
+        if match is None:
+            continue
+        if match.tier not in JOIN_TIERS:
+            if suggestions is not None:
+                suggestions.append(match)
+            continue
+        found.append((-match.score, position, match))
+    matches, claimed = {}, set()
+    for _, _, match in sorted(found, key=lambda f: f[:2]):
+        if match.target not in claimed:
+            claimed.add(match.target)
+            matches[match.name] = match
+    return matches
+
+
+def describe_suggestions(suggestions, limit=3):
+    """One log line's worth of suggestions: the count per tier and a few examples."""
+    tiers = Counter(m.tier for m in suggestions)
+    examples = ", ".join(f"{m.name} ~ {m.target} ({m.tier} {m.score})" for m in suggestions[:limit])
+    return (f"{len(suggestions)} suggestions not joined ({', '.join(f'{n} {t}' for t, n in tiers.most_common())})"
+            + (f", e.g. {examples}" if examples else ""))
@@ -0,0 +1,237 @@
+"""
+plant_table.py
+--------------
+Compact in-memory table for the merge scripts, in place of a ``list[dict]``
+with a string per cell.
+
+Each column is stored in whichever of four layouts is smallest:
+
+    dense          a list of strings, one per row
+    sparse         positions of the non-empty cells (``array('I')``) and
+                   their values; empty cells take no space
+    dictionary     each distinct value once, and a small integer code per
+                   row (``array('B'/'H'/'I')``), 0 meaning empty
+    sparse + dict  positions and codes of the non-empty cells only
+
+so categorical columns (``Family``, ``GrowthRate``, ``sources``,
+``kew_climate_description`` …) hold each value once, and mostly-empty
+columns cost next to nothing. Row keys and column names are interned.
+
+Rows are still available as dicts (``table[i]``, ``table.row(key)``,
+iterating ``table.items()``), built on demand; whole columns are decoded
+with ``column.decode()`` or ``column.take(positions)``.
+
+Usage:
+    table = PlantTable(["malus domestica", "mentha spicata"],
+                       {"Family": ["Rosaceae", "Lamiaceae"], "Height": ["4", ""]})
+    table.row("malus domestica")    # {'Family': 'Rosaceae', 'Height': '4'}
+    table.column("Family").decode()
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import compress
+
+POSITION_BYTES = 4    # array('I')
+POINTER_BYTES  = 8    # a list slot
+
+
+def _code_type(distinct):
+    """Smallest array typecode holding codes 0 … *distinct*."""
+    if distinct < 1 << 8:
+        return "B"
+    if distinct < 1 << 16:
+        return "H"
+    return "I"
+
+
+class Column:
+    """One column of ``size`` rows, in the smallest of the four layouts."""
+
+    __slots__ = ("size", "positions", "codes", "values")
+
+    def __init__(self, values):
+        values = list(values)
+        if None in values:
+            values = ["" if v is None else v for v in values]
+        self.size = len(values)
+        # Counted and encoded with C-level passes (dict.fromkeys, count,
+        # compress, map) rather than a Python loop per cell
+        distinct = [value for value in dict.fromkeys(values) if value != ""]
+        filled = self.size - values.count("")
+        width = array(_code_type(len(distinct))).itemsize
+        cost = {
+            "dense":         POINTER_BYTES * self.size,
+            "sparse":        (POSITION_BYTES + POINTER_BYTES) * filled,
+            # The dictionary itself is one pointer per distinct value
+            "dictionary":    width * self.size + POINTER_BYTES * len(distinct),
+            "sparse+dict":   (POSITION_BYTES + width) * filled + POINTER_BYTES * len(distinct),
+        }
+        layout = min(cost, key=cost.get)
+        self.positions = None
+        cells = values
+        if layout.startswith("sparse"):
+            self.positions = array("I", compress(range(self.size), map("".__ne__, values)))
+            cells = compress(values, map("".__ne__, values))
+        if layout in ("dictionary", "sparse+dict"):
+            self.values = [""] + [sys.intern(v) if isinstance(v, str) else v for v in distinct]
+            code = {value: i for i, value in enumerate(self.values)}
+            self.codes = array(_code_type(len(distinct)), map(code.__getitem__, cells))
+        else:
+            self.values = list(cells) if cells is not values else values
+            self.codes = None
+
+    @property
+    def layout(self):
+        sparse = self.positions is not None
+        if self.codes is None:
+            return "sparse" if sparse else "dense"
+        return "sparse+dict" if sparse else "dictionary"
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if self.positions is not None:
+            j = bisect_left(self.positions, i)
+            if j == len(self.positions) or self.positions[j] != i:
+                return ""
+            i = j
+        return self.values[self.codes[i]] if self.codes is not None else self.values[i]
+
+    def __iter__(self):
+        """Every value in row order, decoded as it goes."""
+        if self.positions is None:
+            yield from self._cells()
+            return
+        i = 0
+        for position, value in zip(self.positions, self._cells()):
+            while i < position:
+                yield ""
+                i += 1
+            yield value
+            i += 1
+        for _ in range(i, self.size):
+            yield ""
+
+    def _cells(self):
+        """The stored cells as values, in storage order."""
+        if self.codes is None:
+            return self.values
+        return map(self.values.__getitem__, self.codes)
+
+    def decode(self):
+        """Every value of the column as a list, ``""`` for empty cells."""
+        if self.positions is None:
+            return list(self._cells())
+        decoded = [""] * self.size
+        for i, value in zip(self.positions, self._cells()):
+            decoded[i] = value
+        return decoded
+
+    def take(self, positions):
+        """Values at *positions* (None gives ``""``) as a list."""
+        decoded = self.decode()
+        return [decoded[i] if i is not None else "" for i in positions]
+
+    def items(self):
+        """``(position, value)`` of every non-empty cell."""
+        if self.positions is not None:
+            return zip(self.positions, self._cells())
+        return ((i, value) for i, value in enumerate(self._cells()) if value != "")
+
+    def nbytes(self):
+        """Bytes of the encoding itself (not counting the strings)."""
+        size = sys.getsizeof(self.values)
+        for part in (self.positions, self.codes):
+            if part is not None:
+                size += sys.getsizeof(part)
+        return size
+
+
+class PlantTable:
+    """Rows keyed by ``keys``, with columns held as ``Column``."""
+
+    def __init__(self, keys, columns):
+        self.keys = [sys.intern(key) for key in keys]
+        self._columns = {}
+        for name, values in columns.items():
+            self.add_column(name, values)
+        self._index = None
+
+    @classmethod
+    def from_rows(cls, rows, columns=()):
+        """Table of ``(key, record)`` *rows*, consumed one at a time. Columns
+        come in the order of *columns*, then as first seen in the records."""
+        keys, cells = [], {name: [] for name in columns}
+        for n, (key, record) in enumerate(rows):
+            keys.append(key)
+            for name, value in record.items():
+                column = cells.get(name)
+                if column is None:
+                    column = cells[name] = [""] * n
+                column.append(value)
+            for column in cells.values():
+                if len(column) == n:
+                    column.append("")
+        return cls(keys, cells)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._key_index()
+
+    def __getitem__(self, i):
+        """Row *i* as a dict of every column."""
+        return {name: column[i] for name, column in self._columns.items()}
+
+    @property
+    def names(self):
+        return list(self._columns)
+
+    def add_column(self, name, values):
+        column = values if isinstance(values, Column) else Column(values)
+        if len(column) != len(self.keys):
+            raise ValueError(f"column {name!r} has {len(column)} values for {len(self.keys)} rows")
+        self._columns[sys.intern(name)] = column
+
+    def column(self, name):
+        """The ``Column`` *name*, or an all-empty one when there is none."""
+        column = self._columns.get(name)
+        return column if column is not None else Column([""] * len(self.keys))
+
+    def columns(self):
+        """``{name: Column}`` in column order."""
+        return dict(self._columns)
+
+    def row(self, key, default=None):
+        """The first row with *key*, as a dict."""
+        i = self._key_index().get(key)
+        return self[i] if i is not None else default
+
+    def items(self):
+        """``(key, row dict)`` for every row, in one pass over all columns
+        (nothing is decoded ahead of the row being built)."""
+        names = list(self._columns)
+        for key, *cells in zip(self.keys, *self._columns.values()):
+            yield key, dict(zip(names, cells))
+
+    def __iter__(self):
+        for _, row in self.items():
+            yield row
+
+    def layouts(self):
+        """``{layout: number of columns}``, for logging."""
+        counts = {}
+        for column in self._columns.values():
+            counts[column.layout] = counts.get(column.layout, 0) + 1
+        return counts
+
+    def _key_index(self):
+        if self._index is None:
+            self._index = {}
+            for i, key in enumerate(self.keys):
+                self._index.setdefault(key, i)
+        return self._index
@@ -0,0 +1,312 @@
+"""
+publish_plant_data.py
+---------------------
+Publishes the dataset for the static site as compact column artifacts, one
+per page, holding only the columns that page uses, so a page no longer
+downloads and Papa.parse-s all of docs/plant_data.csv with every ``pp_`` /
+``zn_`` / ``kew_`` column.
+
+Each page declares its columns in its ``<head>``:
+
+    <meta name="plant-data-columns" content="Genus,Species,CommonName,…">
+
+and gets ``docs/data/<page>.<hash>.json``: the row count and those columns,
+each in the smallest layout of plant_table.Column:
+
+    {"values": [...]}                              one value per row
+    {"at": [...], "values": [...]}                 non-empty cells only
+    {"dict": [...], "codes": [...]}                distinct values, a code per row
+    {"at": [...], "dict": [...], "codes": [...]}   both
+
+``at`` holds the gaps between the positions of the non-empty cells, and
+``dict[0]`` is the empty value. The typed columns of
+normalise_plant_data.py hold numbers, with null for empty cells.
+
+Columns a page only shows for one plant at a time (the explorer's detail
+panel, the index page's CSV export) are declared apart:
+
+    <meta name="plant-data-detail" content="kew_native_range,zn_watering,…">
+
+They stay out of the page's artifact. The detail columns of all pages go
+into shards of about ``DETAIL_SHARD_KB`` each, ``docs/data/detail-<n>.<hash>.json``,
+holding the rows from ``start`` on in the same layouts, so a plant's detail
+is found from its row number alone. Smaller shards mean less to fetch per
+plant opened, larger ones fewer requests when browsing; the shard sizes
+are logged and kept in the manifest.
+
+``docs/data/manifest.json`` maps each page to its artifact and lists the
+shards. It also lists every column of the dataset and how many plants
+fill it, which the insights page charts without loading the columns
+themselves. Artifact names carry a content hash, so browsers can cache
+them for good, and artifacts no longer in the manifest are removed.
+
+docs/plant_data.js loads them (``loadPlantData``, ``loadPlantDetail``),
+and falls back to plant_data.csv when there is no manifest. Since pages
+prefer the artifacts, anything that rewrites plant_data.csv has to publish
+again: the scheduled workflow has no dataset store, so it publishes from
+the CSV itself (``--csv``). A CSV without the typed columns gets them
+parsed from its text columns (normalise_plant_data.typed_row).
+
+A page that declares a typed column the dataset lacks fails the publish
+(``MissingColumnsError``, exit status 1): the pages filter and chart on
+those columns, so artifacts without them would ship an empty site.
+
+Run:
+    python publish_plant_data.py
+    python publish_plant_data.py --csv docs/plant_data.csv   # from the export
+    DETAIL_SHARD_KB=64 python publish_plant_data.py     # larger detail shards
+
+The shard size is not part of the build fingerprint: after changing it, run
+``python build_plant_data.py --force publish``.
+"""
+
+import argparse
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+from html.parser import HTMLParser
+
+from normalise_plant_data import TYPED_COLUMNS, typed_row
+from plant_dataset import EXPORT_CSV, PlantDataset
+from plant_table import Column
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCS_DIR   = os.path.join(SCRIPT_DIR, "docs")
+DATA_DIR   = os.path.join(DOCS_DIR, "data")
+MANIFEST   = os.path.join(DATA_DIR, "manifest.json")
+PAGES      = [os.path.join(DOCS_DIR, f"{page}.html")
+              for page in ("index", "dashboard", "explorer", "insights", "distributions")]
+
+COLUMNS_META = "plant-data-columns"
+DETAIL_META  = "plant-data-detail"
+NAME_COLUMN  = "Genus"   # the pages only show plants with a genus
+
+DETAIL_SHARD_KB = int(os.environ.get("DETAIL_SHARD_KB", "32"))   # target raw size of a detail shard
+
+_ARTIFACT_RE = re.compile(r"^[\w-]+\.[0-9a-f]{12}\.json$")
+
+
+class _ColumnsMeta(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.lists = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and attrs.get("name") in (COLUMNS_META, DETAIL_META):
+            self.lists[attrs["name"]] = [c.strip() for c in (attrs.get("content") or "").split(",") if c.strip()]
+
+
+def _page_meta(path):
+    parser = _ColumnsMeta()
+    with open(path, encoding="utf-8") as f:
+        parser.feed(f.read())
+    return parser.lists
+
+
+def page_columns(path):
+    """The columns *path* declares, or None when it declares none."""
+    return _page_meta(path).get(COLUMNS_META)
+
+
+def page_detail_columns(path):
+    """The detail columns *path* declares (possibly none)."""
+    return _page_meta(path).get(DETAIL_META, [])
+
+
+def _typed(value):
+    if value == "":
+        return None
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def encode_column(column, typed=False):
+    """A plant_table.Column as the JSON layout the pages decode."""
+    values = [_typed(v) for v in column.values] if typed else column.values
+    encoded = {}
+    if column.positions is not None:
+        previous = 0
+        gaps = []
+        for position in column.positions:
+            gaps.append(position - previous)
+            previous = position
+        encoded["at"] = gaps
+    if column.codes is not None:
+        encoded["dict"] = values
+        encoded["codes"] = list(column.codes)
+    else:
+        encoded["values"] = values
+    return encoded
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write(path, payload):
+    with open(path + ".tmp", "wb") as f:
+        f.write(payload)
+    os.replace(path + ".tmp", path)
+
+
+def shard_starts(sizes, target):
+    """First row of each shard, cutting after about *target* bytes given
+    each row's *sizes* (a row is never split, so a shard holds one at least)."""
+    starts, total = [], 0
+    for i, size in enumerate(sizes):
+        if not starts or total + size > target:
+            starts.append(i)
+            total = 0
+        total += size
+    return starts
+
+
+def _row_sizes(columns, rows):
+    """Rough JSON bytes of each row's non-empty cells in *columns*."""
+    sizes = [2] * rows
+    for values in columns:
+        for i, value in enumerate(values):
+            if value:
+                sizes[i] += len(value.encode("utf-8")) + 4
+    return sizes
+
+
+def _artifact(folder, stem, data):
+    """Write *data* as ``<stem>.<hash>.json``; its manifest entry."""
+    payload = _dumps(data)
+    name = f"{stem}.{hashlib.sha1(payload).hexdigest()[:12]}.json"
+    _write(os.path.join(folder, name), payload)
+    return {"artifact": f"{os.path.basename(folder)}/{name}", "bytes": len(payload),
+            "gzip_bytes": len(gzip.compress(payload))}
+
+
+class MissingColumnsError(ValueError):
+    """A page declares typed columns the dataset does not have."""
+
+
+class CsvDataset:
+    """An exported CSV read like a PlantDataset (``columns``, ``read``).
+    Typed columns missing from the CSV are parsed from each row's text."""
+
+    def __init__(self, path=EXPORT_CSV):
+        self.path = path
+        with open(path, newline="", encoding="utf-8") as f:
+            self._header = next(csv.reader(f), [])
+        self._typed = [col for col in TYPED_COLUMNS if col not in self._header]
+
+    def columns(self):
+        return self._header + self._typed
+
+    def read(self, columns):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if self._typed:
+                    typed = typed_row(row)
+                    row.update((col, typed.get(col, "")) for col in self._typed)
+                yield i, {col: row[col] for col in columns if row.get(col)}
+
+
+def publish(dataset, pages=PAGES, folder=DATA_DIR, shard_kb=DETAIL_SHARD_KB):
+    """Write every page's artifact, the detail shards and the manifest.
+    Returns the manifest."""
+    declared, detail_declared = {}, {}
+    for path in pages:
+        meta = _page_meta(path) if os.path.exists(path) else {}
+        if meta.get(COLUMNS_META) is None:
+            print(f"[publish] {os.path.basename(path)} declares no {COLUMNS_META} – skipped")
+            continue
+        page = os.path.splitext(os.path.basename(path))[0]
+        declared[page] = meta[COLUMNS_META]
+        detail_declared[page] = meta.get(DETAIL_META, [])
+    fields = dataset.columns()
+    missing = sorted({c for columns in list(declared.values()) + list(detail_declared.values())
+                      for c in columns if c in TYPED_COLUMNS and c not in fields})
+    if missing:
+        raise MissingColumnsError(f"typed columns not in the dataset: {', '.join(missing)} "
+                                  f"(run the typed stage, normalise_plant_data.py)")
+    hot = list(dict.fromkeys(c for columns in declared.values() for c in columns if c in fields))
+    detail = list(dict.fromkeys(c for columns in detail_declared.values() for c in columns if c in fields))
+
+    # One pass over the store: the declared columns as lists, and how many
+    # named plants fill each column
+    cells = {col: [] for col in dict.fromkeys(hot + detail)}
+    filled = dict.fromkeys(fields, 0)
+    rows = 0
+    for _, record in dataset.read(fields):
+        rows += 1
+        for col, values in cells.items():
+            values.append(record.get(col, ""))
+        if record.get(NAME_COLUMN, "").strip():
+            for col, value in record.items():
+                if value.strip():
+                    filled[col] += 1
+    encoded = {col: encode_column(Column(cells[col]), col in TYPED_COLUMNS) for col in hot}
+
+    os.makedirs(folder, exist_ok=True)
+    manifest = {"rows": rows, "fields": fields, "filled": filled, "pages": {}, "detail": None}
+    for page, columns in declared.items():
+        missing = [c for c in columns + detail_declared[page] if c not in fields]
+        if missing:
+            print(f"[publish] {page}: not in the dataset: {', '.join(missing)}")
+        present = [c for c in columns if c in fields]
+        entry = _artifact(folder, page, {"rows": rows, "typed": [c for c in present if c in TYPED_COLUMNS],
+                                         "columns": {c: encoded[c] for c in present}})
+        entry.update(columns=present, detail=[c for c in detail_declared[page] if c in fields])
+        manifest["pages"][page] = entry
+        print(f"[publish] {page}: {len(present)} columns, {entry['bytes'] / 1024:.0f} KB "
+              f"({entry['gzip_bytes'] / 1024:.0f} KB gzipped)"
+              + (f", {len(entry['detail'])} more on demand" if entry["detail"] else ""))
+    encoded = None
+
+    if detail and rows:
+        typed = [c for c in detail if c in TYPED_COLUMNS]
+        starts = shard_starts(_row_sizes([cells[c] for c in detail if c not in TYPED_COLUMNS], rows),
+                              shard_kb * 1024)
+        shards = []
+        for n, (start, end) in enumerate(zip(starts, starts[1:] + [rows])):
+            columns = {c: encode_column(Column(cells[c][start:end]), c in TYPED_COLUMNS) for c in detail}
+            shard = _artifact(folder, f"detail-{n}", {"rows": end - start, "typed": typed, "columns": columns})
+            shards.append(dict(start=start, rows=end - start, **shard))
+        manifest["detail"] = {"columns": detail, "shard_kb": shard_kb, "shards": shards}
+        sizes = [shard["bytes"] for shard in shards]
+        print(f"[publish] detail: {len(detail)} columns in {len(shards)} shards of ~{shard_kb} KB "
+              f"(median {statistics.median(sizes) / 1024:.0f} KB, largest {max(sizes) / 1024:.0f} KB, "
+              f"median {statistics.median(s['gzip_bytes'] for s in shards) / 1024:.1f} KB gzipped; "
+              f"{statistics.median(s['rows'] for s in shards):.0f} plants each)")
+    cells = None
+    _write(os.path.join(folder, os.path.basename(MANIFEST)), _dumps(manifest))
+
+    current = {os.path.basename(entry["artifact"])
+               for entry in list(manifest["pages"].values()) + (manifest["detail"] or {}).get("shards", [])}
+    for path in glob.glob(os.path.join(folder, "*.json")):
+        name = os.path.basename(path)
+        if _ARTIFACT_RE.match(name) and name not in current:
+            os.remove(path)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish the per-page column artifacts for the site")
+    parser.add_argument("--csv", metavar="PATH", nargs="?", const=EXPORT_CSV,
+                        help="Publish from an exported CSV instead of the dataset store (default docs/plant_data.csv)")
+    args = parser.parse_args(argv)
+    try:
+        if args.csv:
+            publish(CsvDataset(args.csv))
+            return
+        with PlantDataset() as dataset:
+            publish(dataset)
+    except MissingColumnsError as e:
+        print(f"[publish] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+sort_join.py
+------------
+Out-of-core sorting and name joins, for sources too large to hold in memory
+as rows.
+
+``external_sort`` buffers items up to a memory budget, sorts the buffer and
+spills it to a run file on disk (one JSON array per line), then streams
+the runs back in order with a k-way merge. When there are more runs than
+``FAN_IN``, they are merged in passes first, so only ``FAN_IN`` files are
+open at a time.
+
+``name_join`` sorts two keyed sources that way by scientific name and joins
+them in one streaming pass. Names are grouped by their canonical form
+without the rank word (plant_names.rankless_key), and paired within a
+group with the rules ``match_unique`` applies to the tiers it joins:
+
+- a name pairs with the same normalised name on the other side;
+- otherwise it pairs with the first-seen name of its canonical group,
+  unless an exact pair or an earlier name took it;
+- a key repeated within one source keeps its last values and first position.
+
+Those are the only tiers joined either way, so both merges join the same
+rows; the species and fuzzy suggestions need every name of the other side
+at hand, so only the in-memory matcher reports them.
+
+Usage:
+    for left, right, tier in name_join(pfaf_rows, pp_rows, budget=256 << 20):
+        # left / right: (key, seq, values) or None, tier: "exact", "canonical" or None
+        ...
+"""
+
+import heapq
+import itertools
+import json
+import operator
+import os
+import shutil
+import tempfile
+
+from plant_names import parse_name, rankless_key
+
+MEMORY_BUDGET = 256 << 20   # bytes of buffered items before a run is spilled
+FAN_IN        = 64          # runs merged at once
+ITEM_OVERHEAD = 120         # rough per-item cost on top of its JSON length
+
+
+def _spill(buffer, folder):
+    buffer.sort(key=lambda entry: entry[0])
+    fd, path = tempfile.mkstemp(suffix=".jsonl", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(line for _, line in buffer)
+    return path
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _merge_runs(paths, folder):
+    """Merge *paths* ``FAN_IN`` at a time until one pass can stream them all."""
+    while len(paths) > FAN_IN:
+        merged = []
+        for i in range(0, len(paths), FAN_IN):
+            group = paths[i:i + FAN_IN]
+            fd, path = tempfile.mkstemp(suffix=".jsonl", dir=folder)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for entry in heapq.merge(*map(_read_run, group), key=lambda entry: entry[0]):
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            for done in group:
+                os.remove(done)
+            merged.append(path)
+        paths = merged
+    return heapq.merge(*map(_read_run, paths), key=lambda entry: entry[0])
+
+
+def external_sort(items, key, budget=MEMORY_BUDGET, folder=None, label="sort"):
+    """Yield *items* (JSON-serialisable lists) ordered by ``key(item)``,
+    holding about *budget* bytes of them in memory at a time. Items come
+    back as decoded JSON, so tuples become lists."""
+    tmp = tempfile.mkdtemp(prefix="sort_runs_", dir=folder)
+    try:
+        runs, buffer, size, count = [], [], 0, 0
+        for item in items:
+            sort_key = key(item)
+            line = json.dumps([sort_key, item], ensure_ascii=False, separators=(",", ":")) + "\n"
+            buffer.append((sort_key, line))
+            size += len(line) + ITEM_OVERHEAD
+            count += 1
+            if size >= budget:
+                runs.append(_spill(buffer, tmp))
+                buffer, size = [], 0
+        if buffer and not runs:
+            # Everything fit: no need to go through the disk
+            print(f"[{label}] {count} items sorted in memory")
+            buffer.sort(key=lambda entry: entry[0])
+            for i, (_, line) in enumerate(buffer):
+                buffer[i] = None
+                yield json.loads(line)[1]
+            return
+        if buffer:
+            runs.append(_spill(buffer, tmp))
+        buffer = None
+        print(f"[{label}] {count} items spilled to {len(runs)} sorted runs "
+              f"({sum(os.path.getsize(p) for p in runs) / 1_048_576:.1f} MB)")
+        for _, item in _merge_runs(runs, tmp):
+            yield item
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def name_group(key):
+    """Sort and join key of a normalised name: its canonical form without
+    the rank word, as ``NameMatcher`` falls back to, or the name itself
+    (kept apart by a prefix) when it has no genus to parse."""
+    return rankless_key(parse_name(key)) or f"\x00{key}"
+
+
+def _sorted_names(rows, budget, folder, label):
+    """``(key, values)`` → ``[group, key, seq, values]`` sorted by name group."""
+    entries = ([name_group(key), key, seq, values] for seq, (key, values) in enumerate(rows))
+    return external_sort(entries, lambda entry: entry[:3], budget, folder, label)
+
+
+def _deduplicated(group):
+    """Entries of one name group, one per key: last values, first position."""
+    by_key = {}
+    for _, key, seq, values in group:
+        first = by_key.get(key)
+        by_key[key] = (key, first[1] if first else seq, values)
+    return list(by_key.values())
+
+
+def _pair(lefts, rights):
+    """Join one name group: yield ``(left, right, tier)``."""
+    right_by_key = {entry[0]: entry for entry in rights}
+    claimed = set()
+    loose = []
+    for left in lefts:
+        right = right_by_key.get(left[0])
+        if right is not None:
+            claimed.add(right[0])
+            yield left, right, "exact"
+        else:
+            loose.append(left)
+    loose.sort(key=lambda entry: entry[1])
+    first = min(rights, key=lambda entry: entry[1]) if rights else None
+    if loose and first is not None and first[0] not in claimed:
+        claimed.add(first[0])
+        yield loose.pop(0), first, "canonical"
+    for left in loose:
+        yield left, None, None
+    for right in rights:
+        if right[0] not in claimed:
+            yield None, right, None
+
+
+def name_join(left, right, budget=MEMORY_BUDGET, folder=None):
+    """Full outer join of two ``(key, values)`` sources on scientific name.
+    Yields ``(left, right, tier)`` in name order, where *left* and *right*
+    are ``(key, seq, values)`` (``seq``: position in its source) or None.
+    Both sides are sorted at once, so each gets half of *budget*."""
+    by_group = operator.itemgetter(0)
+    lefts = itertools.groupby(_sorted_names(left, budget // 2, folder, "sort-left"), by_group)
+    rights = itertools.groupby(_sorted_names(right, budget // 2, folder, "sort-right"), by_group)
+    lgroup, lentries = next(lefts, (None, None))
+    rgroup, rentries = next(rights, (None, None))
+    while lgroup is not None or rgroup is not None:
+        if rgroup is None or (lgroup is not None and lgroup < rgroup):
+            yield from _pair(_deduplicated(lentries), [])
+            lgroup, lentries = next(lefts, (None, None))
+        elif lgroup is None or rgroup < lgroup:
+            yield from _pair([], _deduplicated(rentries))
+            rgroup, rentries = next(rights, (None, None))
+        else:
+            yield from _pair(_deduplicated(lentries), _deduplicated(rentries))
+            lgroup, lentries = next(lefts, (None, None))
+            rgroup, rentries = next(rights, (None, None))
@@ -0,0 +1,26 @@
+"""permapeople_data.flatten_plant on the value types the API returns."""
+
+from permapeople_data import flatten_plant
+
+
+def test_ranges_are_split():
+    row = flatten_plant({"id": 1, "data": [{"key": "Soil pH", "value": "6.0-6.5"},
+                                           {"key": "Height", "value": "-2"}]})
+    assert row == {"id": 1, "soil_ph_min": 6.0, "soil_ph_max": 6.5, "height_min": None, "height_max": 2.0}
+
+
+def test_non_string_values_are_kept():
+    row = flatten_plant({"id": 2, "data": [{"key": "Height", "value": 3},
+                                           {"key": "Edible", "value": True},
+                                           {"key": "Uses", "value": ["food", "fodder"]},
+                                           {"key": "Width", "value": None}]})
+    assert row == {"id": 2, "height": 3, "edible": True, "uses": ["food", "fodder"], "width": None}
+
+
+def test_unparsed_range_is_kept_as_text():
+    row = flatten_plant({"id": 3, "data": [{"key": "Width", "value": "1m - 2m"}]})
+    assert row == {"id": 3, "width": "1m - 2m"}
+
+
+def test_plant_without_data():
+    assert flatten_plant({"id": 4, "data": None}) == {"id": 4}
@@ -0,0 +1,35 @@
+"""pfaf_extract.parse_plant_info against the original parser on the fixtures."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_pfaf_extract import legacy_description, legacy_plant_info, load_fixtures  # noqa: E402
+from pfaf_extract import extract_description  # noqa: E402
+from pfaf_generator import attributes, parse_plant_info  # noqa: E402
+
+PAGES = load_fixtures()
+
+
+@pytest.mark.parametrize("genus, species, content, description", PAGES, ids=[f"{g} {s}" for g, s, _, _ in PAGES])
+def test_row_matches_original_parser(genus, species, content, description):
+    url = f"https://pfaf.org/user/Plant.aspx?LatinName={genus}+{species}"
+    row = parse_plant_info(content, genus, species, url)
+    assert len(row) == len(attributes)
+    try:
+        expected = legacy_plant_info(content, genus, species, url)
+    except Exception:
+        pytest.skip("the original parser cannot read this page")
+    assert dict(zip(attributes, row)) == dict(zip(attributes, expected))
+
+
+@pytest.mark.parametrize("description", [d for *_, d in PAGES])
+def test_description_matches_original_parser(description):
+    new = extract_description(description)
+    old = legacy_description(description)
+    assert (new.plant_type, new.foliage, new.height, new.width, new.growth_rate, new.leaf, new.flower,
+            new.ripen, new.reproduction, new.ph, new.preferences, new.tolerances) == \
+        old[:5] + old[6:10] + (old[11], old[13], old[14])
@@ -0,0 +1,58 @@
+"""pfaf_pipeline: Checkpoint resume and run_crawl."""
+
+import pytest
+
+from pfaf_pipeline import Checkpoint, run_crawl
+
+
+class Rows:
+    """RowWriter stand-in that keeps the rows, and fails on *fail_on*."""
+
+    def __init__(self, fail_on=None):
+        self.rows = []
+        self.fail_on = fail_on
+
+    def write(self, row):
+        if row[0] == self.fail_on:
+            raise OSError("disk full")
+        self.rows.append(row)
+
+
+def walk(prefix):
+    for i in range(20):
+        yield prefix, f"species{i}"
+
+
+def crawl(checkpoint, writer, fetched):
+    def fetch_row(genus, species):
+        fetched.append(f"{genus} {species}")
+        return [f"{genus} {species}"]
+    return run_crawl(["Alpha", "Beta"], walk, fetch_row, writer, checkpoint, workers=4, listing_workers=2)
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "out.csv.done")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark("Alpha species0")
+    checkpoint.mark("Beta species3")
+    checkpoint.close()
+
+    resumed = Checkpoint(path, resume=True)
+    assert resumed.done == {"Alpha species0", "Beta species3"}
+    fetched = []
+    counts = crawl(resumed, Rows(), fetched)
+    resumed.close()
+    assert counts["skipped"] == 2 and counts["written"] == 38
+    assert "Alpha species0" not in fetched and len(fetched) == 38
+
+    assert len(Checkpoint(path, resume=True).done) == 40
+    assert Checkpoint(path).done == set()   # a fresh crawl starts over
+
+
+def test_writer_failure_stops_the_crawl(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "out.csv.done"))
+    fetched = []
+    with pytest.raises(OSError, match="disk full"):
+        crawl(checkpoint, Rows(fail_on="Alpha species2"), fetched)
+    checkpoint.close()
+    assert "Alpha species2" not in checkpoint.done
@@ -0,0 +1,65 @@
+"""pfaf_queue.WorkQueue leases, expiry and attempts."""
+
+import pfaf_queue
+from pfaf_queue import WorkQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def make_queue(tmp_path, monkeypatch, max_attempts=3):
+    clock = Clock()
+    monkeypatch.setattr(pfaf_queue, "time", clock)
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=60, max_attempts=max_attempts)
+    queue.add([("Malus", "domestica"), ("Mentha", "spicata"), ("Urtica", "dioica")])
+    return queue, clock
+
+
+def test_expired_lease_goes_to_another_worker(tmp_path, monkeypatch):
+    queue, clock = make_queue(tmp_path, monkeypatch)
+    assert queue.lease("a", batch=2) == [("Malus", "domestica"), ("Mentha", "spicata")]
+    assert queue.lease("b", batch=2) == [("Urtica", "dioica")]
+
+    clock.now += 61
+    assert queue.lease("b", batch=2) == [("Malus", "domestica"), ("Mentha", "spicata")]
+    # b stopped heartbeating its own lease too, so Urtica is pending again
+    assert queue.counts() == {"pending": 1, "leased": 2, "done": 0, "failed": 0}
+    queue.close()
+
+
+def test_heartbeat_keeps_the_lease(tmp_path, monkeypatch):
+    queue, clock = make_queue(tmp_path, monkeypatch)
+    queue.lease("a", batch=3)
+    clock.now += 50
+    queue.heartbeat("a")
+    clock.now += 50
+    assert queue.requeue_expired() == 0
+    clock.now += 11
+    assert queue.requeue_expired() == 3
+    queue.close()
+
+
+def test_late_result_still_completes(tmp_path, monkeypatch):
+    queue, clock = make_queue(tmp_path, monkeypatch)
+    queue.lease("a", batch=1)
+    clock.now += 61
+    queue.lease("b", batch=1)
+    queue.complete([("Malus domestica", ["Rosaceae", "Malus", "domestica"])])
+    assert queue.counts()["done"] == 1
+    assert list(queue.results()) == [("Malus domestica", ["Rosaceae", "Malus", "domestica"])]
+    queue.close()
+
+
+def test_out_of_attempts_is_failed(tmp_path, monkeypatch):
+    queue, clock = make_queue(tmp_path, monkeypatch, max_attempts=2)
+    for _ in range(2):
+        assert ("Malus", "domestica") in queue.lease("a", batch=3)
+        clock.now += 61
+    assert queue.requeue_expired() == 3   # second lease expired, out of attempts
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 3}
+    queue.close()
@@ -0,0 +1,58 @@
+"""plant_names: parsing, canonical keys and which tiers join."""
+
+from plant_names import NameMatcher, canonical_key, match_unique, parse_name
+
+
+def test_bare_infraspecific_name():
+    parts = parse_name("Brassica oleracea capitata")
+    assert (parts.genus, parts.epithet, parts.rank, parts.infra) == ("brassica", "oleracea", "", "capitata")
+    assert canonical_key(parts) == "brassica oleracea capitata"
+    assert parse_name("Lonicera caerulea edulis").infra == "edulis"
+
+
+def test_author_particles_are_not_infraspecific():
+    assert parse_name("Rosa canina de Candolle").infra == ""
+    assert parse_name("Malus domestica Borkh.").infra == ""
+
+
+def test_variety_is_not_its_species():
+    matcher = NameMatcher(["brassica oleracea", "lonicera caerulea"])
+    for name in ("Brassica oleracea capitata", "Brassica oleracea var. capitata", "Lonicera caerulea edulis"):
+        assert matcher.match(name).tier == "species"
+
+
+def test_missing_rank_matches_canonically():
+    matcher = NameMatcher(["lonicera caerulea var. edulis"])
+    assert matcher.match("Lonicera caerulea edulis").tier == "canonical"
+    assert matcher.match("Lonicera caerulea subsp. edulis").tier == "canonical"
+
+
+def test_hybrid_sign_is_part_of_the_key():
+    assert canonical_key(parse_name("Salix x alba")) == "× salix alba"
+    matcher = NameMatcher(["salix alba", "mentha × piperita"])
+    assert matcher.match("Salix x alba").tier == "species"
+    assert matcher.match("Mentha x piperita L.").tier == "canonical"
+
+
+def test_hybrid_formula_is_kept_apart():
+    parts = parse_name("Salix alba × fragilis")
+    assert canonical_key(parts) == "salix alba × fragilis"
+    assert NameMatcher(["salix alba", "salix × alba"]).match("Salix alba × fragilis").tier == "species"
+
+
+def test_match_unique_joins_exact_and_canonical_only():
+    suggestions = []
+    joined = match_unique(
+        NameMatcher(["brassica oleracea", "carex flava", "mentha × piperita"]),
+        ["Brassica oleracea capitata", "Brassica oleracea italica", "Carex flacca", "Carex flavo",
+         "Mentha x piperita", "Brassica oleracea"],
+        suggestions)
+    assert {name: m.target for name, m in joined.items()} == {
+        "Mentha x piperita": "mentha × piperita",
+        "Brassica oleracea": "brassica oleracea",
+    }
+    assert sorted((m.name, m.tier) for m in suggestions) == [
+        ("Brassica oleracea capitata", "species"),
+        ("Brassica oleracea italica", "species"),
+        ("Carex flavo", "fuzzy"),
+    ]
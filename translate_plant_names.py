@@ -2,7 +2,8 @@
 """
 translate_plant_names.py  —  Fetch multilingual plant common names from Wikidata
 
-Reads plant_data.csv, extracts unique scientific names (Genus + Species),
+Reads Genus, Species and CommonName from the dataset store (plant_dataset.py)
+in one projected pass, extracts unique scientific names (Genus + Species),
 queries the Wikidata SPARQL endpoint for common names in all PLANTalytics
 target languages, and outputs docs/plant_names_i18n.json.
 
@@ -11,13 +12,18 @@ Wikidata property used:
 
 Fallback: Wikipedia article titles via sitelinks (e.g., de.wikipedia label)
 
+The store is a local build artefact (.cache/ is not committed): on a fresh
+checkout it is empty, so the run stops with an error instead of replacing
+docs/plant_names_i18n.json with an empty file. Build the dataset first
+(build_plant_data.py or merge_plant_data.py).
+
 Usage:
     python translate_plant_names.py                 # full run, all plants
     python translate_plant_names.py --sample 50     # test with 50 plants
     python translate_plant_names.py --resume        # resume from checkpoint
 """
 
-import csv, json, sys, time, argparse, os
+import json, sys, time, argparse, os
 from pathlib import Path
 
 try:
@@ -28,6 +34,8 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "requests"])
     import requests
 
+from plant_dataset import DATASET_DB, PlantDataset
+
 # ── Config ──
 LANGUAGES = ["en", "es", "fr", "de", "pt", "ja", "zh", "hi", "te"]
 WIKIDATA_SPARQL = "https://query.wikidata.org/sparql"
@@ -35,7 +43,7 @@ BATCH_SIZE = 80           # scientific names per SPARQL query (Wikidata limit-fr
 DELAY_BETWEEN_BATCHES = 2  # seconds, be polite to Wikidata
 CHECKPOINT_FILE = "plant_names_checkpoint.json"
 
-CSV_PATH = Path(__file__).parent / "docs" / "plant_data.csv"
+NAME_COLUMNS = ["Genus", "Species", "CommonName"]
 OUTPUT_PATH = Path(__file__).parent / "docs" / "plant_names_i18n.json"
 
 HEADERS = {
@@ -44,16 +52,20 @@ HEADERS = {
 }
 
 
-def load_scientific_names(csv_path: Path) -> list[str]:
-    """Extract unique 'Genus Species' strings from the CSV."""
+def load_name_rows(dataset_path=DATASET_DB) -> list[dict]:
+    """Genus, Species and CommonName of every plant, read once."""
+    with PlantDataset(dataset_path) as dataset:
+        return [row for _, row in dataset.read(NAME_COLUMNS)]
+
+
+def load_scientific_names(rows: list[dict]) -> list[str]:
+    """Extract unique 'Genus Species' strings from the name rows."""
     names = set()
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            genus = (row.get("Genus") or "").strip()
-            species = (row.get("Species") or "").strip()
-            if genus and species:
-                names.add(f"{genus} {species}")
+    for row in rows:
+        genus = (row.get("Genus") or "").strip()
+        species = (row.get("Species") or "").strip()
+        if genus and species:
+            names.add(f"{genus} {species}")
     return sorted(names)
 
 
@@ -166,6 +178,8 @@ def save_output(translations: dict, sci_name_to_common: dict):
       ...
     }
     Also includes the English CommonName from the CSV as the 'en' entry.
+    Nothing is written when no plant has a translation, so a failed run
+    never replaces the committed file with an empty one.
     """
     # Merge CSV English names as authoritative 'en' values
     for sci_name, en_common in sci_name_to_common.items():
@@ -182,6 +196,10 @@ def save_output(translations: dict, sci_name_to_common: dict):
         if non_en:
             useful[sci_name] = langs
 
+    if not useful:
+        print(f"\n⚠️  No translated plants – {OUTPUT_PATH} left unchanged")
+        return
+
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
         json.dump(useful, f, ensure_ascii=False, indent=1)
 
@@ -193,19 +211,17 @@ def save_output(translations: dict, sci_name_to_common: dict):
         print(f"     {lang}: {count:>5} ({pct:.1f}%)")
 
 
-def build_common_name_map(csv_path: Path) -> dict:
-    """Map 'Genus Species' → CommonName from CSV."""
+def build_common_name_map(rows: list[dict]) -> dict:
+    """Map 'Genus Species' → CommonName from the name rows."""
     mapping = {}
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            genus = (row.get("Genus") or "").strip()
-            species = (row.get("Species") or "").strip()
-            common = (row.get("CommonName") or "").strip()
-            if genus and species:
-                key = f"{genus} {species}"
-                if key not in mapping or (common and not mapping[key]):
-                    mapping[key] = common
+    for row in rows:
+        genus = (row.get("Genus") or "").strip()
+        species = (row.get("Species") or "").strip()
+        common = (row.get("CommonName") or "").strip()
+        if genus and species:
+            key = f"{genus} {species}"
+            if key not in mapping or (common and not mapping[key]):
+                mapping[key] = common
     return mapping
 
 
@@ -214,27 +230,38 @@ def main():
     parser.add_argument("--sample", type=int, default=0, help="Only process N plants (for testing)")
     parser.add_argument("--resume", action="store_true", help="Resume from checkpoint")
     args = parser.parse_args()
+    try:
+        run(args.sample, args.resume)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
 
+def run(sample=0, resume=False):
     print("🌱 PLANTalytics Plant Name Translator")
     print(f"   Languages: {', '.join(LANGUAGES)}")
-    print(f"   Source: {CSV_PATH}")
+    print(f"   Source: {DATASET_DB}")
     print()
 
     # Load scientific names
-    sci_names = load_scientific_names(CSV_PATH)
+    name_rows = load_name_rows()
+    sci_names = load_scientific_names(name_rows)
     print(f"📋 Found {len(sci_names)} unique scientific names")
+    if not sci_names:
+        raise RuntimeError(f"No plants with a Genus and Species in {DATASET_DB} – build the dataset first "
+                           f"(build_plant_data.py); {OUTPUT_PATH} left unchanged")
 
     # Build English common name map
-    common_map = build_common_name_map(CSV_PATH)
+    common_map = build_common_name_map(name_rows)
 
-    if args.sample > 0:
-        sci_names = sci_names[:args.sample]
-        print(f"   (sampling {args.sample} for testing)")
+    if sample > 0:
+        sci_names = sci_names[:sample]
+        print(f"   (sampling {sample} for testing)")
 
     # Resume from checkpoint?
     translations = {}
     start_idx = 0
-    if args.resume:
+    if resume:
         translations, start_idx = load_checkpoint()
         if start_idx > 0:
             print(f"♻️  Resuming from checkpoint: {start_idx} already processed, {len(translations)} translations")
@@ -0,0 +1,306 @@
+"""
+wcvp_index.py
+-------------
+Prebuilt lookup index over a WCVP release, so enriching the dataset is a few
+thousand indexed lookups instead of a scan of ~1.4M names and the whole
+distribution file on every run.
+
+One SQLite file (``.cache/wcvp_index.sqlite``):
+
+    names         normalised "genus species" → plant_name_id, status and
+                  accepted_plant_name_id, for every species-rank name
+    taxa          the NAME_FIELDS of every accepted taxon, by plant_name_id
+    distribution  per accepted plant_name_id: native and introduced areas,
+                  already grouped into sorted "; "-joined lists
+    genera        every genus in names, for fuzzy matching
+    meta          size, mtime and SHA-1 of the two source files, and the
+                  index version
+
+Both files are scanned in parallel byte ranges (wcvp_scan.py), reading only
+the columns the index keeps.
+
+``open_index`` rebuilds the index only when a source file's hash changed
+(a changed mtime alone is re-hashed, not rebuilt). A build writes a new
+file and swaps it in, so a half-built index is never used.
+
+``WcvpIndex.lookup`` prefers an accepted species. Failing that, it follows
+a synonym (or orthographic variant) to its accepted taxon, so species that
+were renamed still match. ``WcvpIndex.match`` does the same for names with
+authors, a spelled-out hybrid sign or a missing rank, through
+plant_names.py; a variety matched only to its species, and names only a
+typo away, are returned as suggestions, not hits.
+
+Usage:
+    index = open_index()
+    hits = index.lookup(["malus domestica", "mentha spicata"])
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import defaultdict
+
+from plant_names import JOIN_TIERS, NameMatcher, TrigramIndex, parse_name
+from wcvp_scan import scan
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WCVP_NAMES = os.path.join(SCRIPT_DIR, "docs", "wcvp_names.csv")
+WCVP_DIST  = os.path.join(SCRIPT_DIR, "docs", "wcvp_distribution.csv")
+WCVP_INDEX = os.path.join(SCRIPT_DIR, ".cache", "wcvp_index.sqlite")
+
+# Columns we pull from WCVP Names
+NAME_FIELDS = [
+    "lifeform_description",
+    "climate_description",
+    "geographic_area",
+    "taxon_authors",
+    "first_published",
+    "powo_id",
+]
+
+# Statuses whose accepted_plant_name_id is followed to the accepted taxon
+SYNONYM_STATUSES = {"Synonym", "Orthographic"}
+
+# Columns the index build reads (wcvp_scan.py skips the rest)
+NAMES_COLUMNS = ["plant_name_id", "taxon_rank", "taxon_status", "genus", "species",
+                 "accepted_plant_name_id", "taxon_name", *NAME_FIELDS]
+DIST_COLUMNS = ["plant_name_id", "area", "introduced", "extinct"]
+
+LOOKUP_BATCH = 500
+INDEX_VERSION = 2   # bump when the tables change, to rebuild existing indexes
+
+
+def make_key(genus, species):
+    return re.sub(r"\s+", " ", f"{genus} {species}".strip()).lower()
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class WcvpIndex:
+    def __init__(self, path=WCVP_INDEX):
+        self.path = path
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._genera = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def meta(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def lookup(self, keys):
+        """Match normalised "genus species" *keys*. Returns key → dict with
+        ``plant_name_id`` (the accepted taxon), ``accepted_name``, ``match``
+        (``"accepted"`` or ``"synonym"``), ``tier`` (``"exact"``), the
+        NAME_FIELDS, and the
+        ``native_range`` / ``introduced_range`` lists."""
+        keys = list(dict.fromkeys(keys))
+        candidates = defaultdict(list)
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[i:i + LOOKUP_BATCH]
+            for key, status, accepted_id in self._db.execute(
+                    f"SELECT key, status, accepted_id FROM names WHERE key IN ({','.join('?' * len(batch))}) "
+                    "ORDER BY seq", batch):
+                candidates[key].append((status, accepted_id))
+
+        chosen = {}
+        for key, rows in candidates.items():
+            accepted = [a for status, a in rows if status == "Accepted"]
+            synonyms = [a for status, a in rows if status in SYNONYM_STATUSES and a]
+            if accepted:
+                chosen[key] = (accepted[0], "accepted")
+            elif synonyms:
+                chosen[key] = (synonyms[0], "synonym")
+
+        ids = list({pid for pid, _ in chosen.values()})
+        taxa = {}
+        for i in range(0, len(ids), LOOKUP_BATCH):
+            batch = ids[i:i + LOOKUP_BATCH]
+            marks = ",".join("?" * len(batch))
+            for row in self._db.execute(
+                    f"SELECT t.plant_name_id, t.name, {', '.join('t.' + f for f in NAME_FIELDS)}, "
+                    f"d.native, d.introduced FROM taxa t LEFT JOIN distribution d "
+                    f"ON d.plant_name_id = t.plant_name_id WHERE t.plant_name_id IN ({marks})", batch):
+                taxa[row[0]] = row
+
+        hits = {}
+        for key, (pid, match) in chosen.items():
+            row = taxa.get(pid)
+            if row is None:   # synonym of a taxon that is not accepted itself
+                continue
+            hit = {"plant_name_id": pid, "accepted_name": row[1], "match": match, "tier": "exact"}
+            hit.update(zip(NAME_FIELDS, row[2:2 + len(NAME_FIELDS)]))
+            hit["native_range"] = row[-2] or ""
+            hit["introduced_range"] = row[-1] or ""
+            hits[key] = hit
+        return hits
+
+    def match(self, keys, suggestions=None):
+        """``lookup`` for names that are not spelled exactly as in WCVP: each
+        key is matched (plant_names.NameMatcher) against the names of its
+        genus, or of a genus one edit away, and the match is looked up.
+        Hits also carry ``tier``, ``score`` and ``matched_name``. Only
+        ``JOIN_TIERS`` matches are looked up; species and fuzzy matches go
+        to *suggestions* (a list) if one is given."""
+        if self._genera is None:
+            self._genera = TrigramIndex(genus for (genus,) in self._db.execute("SELECT genus FROM genera"))
+        wanted = set()
+        for key in keys:
+            genus = parse_name(key).genus
+            if genus:
+                wanted.update(g for _, g in self._genera.search(genus, 1))
+
+        names = []
+        for genus in wanted:
+            names += [key for (key,) in self._db.execute(
+                "SELECT DISTINCT key FROM names WHERE key >= ? AND key < ?", (genus + " ", genus + "!"))]
+        matches = NameMatcher(names).match_many(keys)
+        for key in [key for key, m in matches.items() if m.tier not in JOIN_TIERS]:
+            if suggestions is not None:
+                suggestions.append(matches[key])
+            del matches[key]
+        found = self.lookup({m.target for m in matches.values()})
+        hits = {}
+        for key, m in matches.items():
+            if m.target in found:
+                hits[key] = dict(found[m.target], tier=m.tier, score=m.score, matched_name=m.target)
+        return hits
+
+
+def _reduce_names(rows):
+    """One chunk of the names file → ``(names, taxa)`` rows."""
+    names, taxa = [], []
+    for pid, rank, status, genus, species, accepted, name, *fields in rows:
+        if rank == "Species" and (status == "Accepted" or status in SYNONYM_STATUSES):
+            names.append((make_key(genus, species), pid, status,
+                          pid if status == "Accepted" else accepted or None))
+        if status == "Accepted":
+            taxa.append((pid, name, *fields))
+    return names, taxa
+
+
+def _reduce_distribution(rows):
+    """One chunk of the distribution file → plant_name_id → (native, introduced)."""
+    grouped = {}
+    for pid, area, introduced, extinct in rows:
+        area = area.strip()
+        if not area or extinct == "1":
+            continue
+        ranges = grouped.get(pid)
+        if ranges is None:
+            ranges = grouped[pid] = (set(), set())
+        ranges[introduced == "1"].add(area)
+    return grouped
+
+
+def build_index(names_path=WCVP_NAMES, dist_path=WCVP_DIST, path=WCVP_INDEX, sources=None, workers=None):
+    """Build the index from both files into *path* (replacing it), scanning
+    them on *workers* cores (all of them by default)."""
+    started = time.time()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".building"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.executescript(f"""
+        CREATE TABLE names (key TEXT NOT NULL, seq INTEGER NOT NULL, plant_name_id TEXT NOT NULL,
+                            status TEXT NOT NULL, accepted_id TEXT);
+        CREATE TABLE taxa (plant_name_id TEXT PRIMARY KEY, name TEXT,
+                           {', '.join(f + ' TEXT' for f in NAME_FIELDS)});
+        CREATE TABLE distribution (plant_name_id TEXT PRIMARY KEY, native TEXT, introduced TEXT);
+        CREATE TABLE genera (genus TEXT PRIMARY KEY) WITHOUT ROWID;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+
+    # 1. Names: species-rank names for matching, accepted taxa for their fields
+    name_rows, taxa_rows = [], []
+    for names_part, taxa_part in scan(names_path, NAMES_COLUMNS, _reduce_names, workers, "wcvp-index"):
+        name_rows += names_part
+        taxa_rows += taxa_part
+    db.executemany("INSERT INTO names VALUES (?, ?, ?, ?, ?)",
+                   ((key, seq, pid, status, accepted_id)
+                    for seq, (key, pid, status, accepted_id) in enumerate(name_rows)))
+    db.executemany(f"INSERT OR IGNORE INTO taxa VALUES ({','.join('?' * (2 + len(NAME_FIELDS)))})", taxa_rows)
+    db.executemany("INSERT OR IGNORE INTO genera VALUES (?)",
+                   ((genus,) for genus in {key.split(" ", 1)[0] for key, _, _, _ in name_rows}))
+    accepted_ids = {row[0] for row in taxa_rows}
+    print(f"[wcvp-index] {len(name_rows)} species names, {len(accepted_ids)} accepted taxa "
+          f"({time.time() - started:.1f}s)")
+    del name_rows, taxa_rows
+
+    # 2. Distribution, grouped by accepted plant_name_id (extinct areas skipped)
+    native, introduced = defaultdict(set), defaultdict(set)
+    for part in scan(dist_path, DIST_COLUMNS, _reduce_distribution, workers, "wcvp-index"):
+        for pid, (native_part, introduced_part) in part.items():
+            if pid in accepted_ids:
+                native[pid].update(native_part)
+                introduced[pid].update(introduced_part)
+    grouped = native.keys() | introduced.keys()
+    db.executemany("INSERT INTO distribution VALUES (?, ?, ?)",
+                   ((pid, "; ".join(sorted(native[pid])), "; ".join(sorted(introduced[pid])))
+                    for pid in grouped))
+
+    db.execute("CREATE INDEX names_key ON names (key, seq)")
+    db.execute("INSERT INTO meta VALUES ('sources', ?)", (json.dumps(sources or {}),))
+    db.execute("INSERT INTO meta VALUES ('built_at', ?)", (json.dumps(time.time()),))
+    db.execute("INSERT INTO meta VALUES ('version', ?)", (json.dumps(INDEX_VERSION),))
+    db.commit()
+    db.close()
+    os.replace(tmp, path)
+    print(f"[wcvp-index] {len(grouped)} taxa with distribution → {path} "
+          f"({os.path.getsize(path) / 1_048_576:.1f} MB, {time.time() - started:.1f}s)")
+
+
+def _source_state(paths, known):
+    """``{path: [size, mtime_ns, sha1]}``, re-hashing only files whose size or
+    mtime differ from *known*."""
+    state = {}
+    for path in paths:
+        st = os.stat(path)
+        old = known.get(path)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            state[path] = old
+        else:
+            state[path] = [st.st_size, st.st_mtime_ns, file_hash(path)]
+    return state
+
+
+def open_index(names_path=WCVP_NAMES, dist_path=WCVP_DIST, path=WCVP_INDEX, rebuild=False, workers=None):
+    """Open the index, building it first if it is missing or the WCVP files'
+    contents changed since it was built."""
+    known, version = {}, None
+    if os.path.exists(path) and not rebuild:
+        with WcvpIndex(path) as index:
+            known, version = index.meta("sources", {}), index.meta("version")
+    sources = _source_state([names_path, dist_path], known)
+    stale = rebuild or version != INDEX_VERSION or \
+        any(known.get(p, [None] * 3)[2] != state[2] for p, state in sources.items())
+    if stale:
+        print(f"[wcvp-index] Building index from {os.path.basename(names_path)} and "
+              f"{os.path.basename(dist_path)} …")
+        build_index(names_path, dist_path, path, sources, workers)
+    elif sources != known:
+        # Same contents, new mtime: remember it so the files aren't hashed again
+        db = sqlite3.connect(path)
+        db.execute("UPDATE meta SET value = ? WHERE key = 'sources'", (json.dumps(sources),))
+        db.commit()
+        db.close()
+    return WcvpIndex(path)